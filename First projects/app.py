@@ -1,13 +1,72 @@
 # Import necessary modules and libraries
-from flask import Flask, request, render_template
+import asyncio
+import io
+from flask import Flask, Response, g, request, render_template, jsonify
 import numpy as np
-import pandas as pd
-from src.pipeline.predict_pipeline import CustomData, PredictPipeline
+from src.exception import CustomException
+from src.logger import request_logger
+from src.pipeline.drift_monitor import get_drift_monitor
+from src.pipeline.micro_batcher import MicroBatcher
+from src.pipeline.prediction_cache import PredictionCache
+from src.pipeline.prediction_table import PredictionTableLookup
+from src.pipeline.predict_pipeline import CustomData, InvalidBatchError, PredictPipeline
+from src.pipeline.request_tracing import get_request_tracer, span
 
 # Initialize Flask application
 application = Flask(__name__)
 app = application  # Create an alias
 
+# One pipeline per process: artifacts are loaded once and shared by every request
+predict_pipeline = PredictPipeline()
+# Concurrent single predictions are coalesced into small vectorized batches
+micro_batcher = MicroBatcher(predict_pipeline)
+# Repeated feature combinations are answered from memory; cleared when the model is reloaded
+prediction_cache = PredictionCache(predict_pipeline.registry)
+# Every valid input precomputed at training time, when the table was built for the current model
+prediction_table = PredictionTableLookup(predict_pipeline.registry)
+# Per-request spans and rolling latency percentiles, reported on /metrics
+request_tracer = get_request_tracer()
+# Category counts and score histograms of the validated inputs, compared with the training data
+drift_monitor = get_drift_monitor()
+
+
+## Every request is traced: the spans opened while handling it (here and in
+## PredictPipeline) are attached to it and feed the latency histograms
+@app.before_request
+def start_request_trace():
+    g.request_trace = request_tracer.start_trace(request.endpoint or "unmatched", request.method, request.path)
+
+@app.after_request
+def record_response_status(response):
+    trace = g.get('request_trace')
+    if trace is not None:
+        trace.status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    trace = g.pop('request_trace', None)
+    request_tracer.finish_trace(trace, error=error)
+    # One structured record per request, sampled (LOG_REQUEST_SAMPLE_RATE) and queued, not written here
+    if trace is not None:
+        request_logger.info("request", extra={
+            "endpoint": trace.name, "method": trace.method, "path": trace.url_path,
+            "status": trace.status, "duration_ms": round(trace.duration_ms, 3), "error": trace.error,
+        })
+
+
+def known_prediction(record):
+    """
+    Answers a record without running the model when possible: precomputed table first,
+    then the prediction cache. Returns (prediction or None, cache key for storing the result).
+    """
+    prediction = prediction_table.lookup(record)
+    if prediction is not None:
+        return prediction, None
+    cache_key = prediction_cache.make_key(record)
+    return prediction_cache.get(cache_key), cache_key
+
+
 ## Route for the home page
 @app.route('/')
 def index():
@@ -17,39 +76,194 @@ def index():
 @app.route('/predictdata', methods=['GET', 'POST'])
 def predict_datapoint():
     if request.method == 'GET':
-        return render_template('home.html')
+        with span("render_template"):
+            return render_template('home.html')
     else:
         # Create a CustomData object with form data
-        data = CustomData(
-            gender=request.form.get('gender'),
-            race_ethnicity=request.form.get('ethnicity'),
-            parental_level_of_education=request.form.get('parental_level_of_education'),
-            lunch=request.form.get('lunch'),
-            test_preparation_course=request.form.get('test_preparation_course'),
-            reading_score=float(request.form.get('reading_score')),
-            writing_score=float(request.form.get('writing_score'))
-        )
-        
-        # Convert the custom data object to a pandas DataFrame
-        pred_df = data.get_data_as_data_frame()
-        
-        # Create an instance of the prediction pipeline
-        predict_pipeline = PredictPipeline()
-        
-        # Make prediction using the pipeline
-        results = predict_pipeline.predict(pred_df)
+        with span("parse_form"):
+            data = CustomData(
+                gender=request.form.get('gender'),
+                race_ethnicity=request.form.get('ethnicity'),
+                parental_level_of_education=request.form.get('parental_level_of_education'),
+                lunch=request.form.get('lunch'),
+                test_preparation_course=request.form.get('test_preparation_course'),
+                reading_score=request.form.get('reading_score'),
+                writing_score=request.form.get('writing_score')
+            )
+
+        # Check the fields against the model's schema; the scores come back as floats
+        validation = predict_pipeline.validate([data.get_data_as_dict()])
+        if not validation.valid[0]:
+            with span("render_template"):
+                return render_template('home.html', error=validation.error_message()), 400
+        record = validation.records()[0]
         
-        # Get the prediction value
-        if hasattr(results, '__iter__'):  # If it's a list/array
-            prediction_value = float(results[0])
-        else:  # If it's a single value
-            prediction_value = float(results)
+        # Make prediction: from the table / cache if possible, otherwise through
+        # the micro-batcher (concurrent requests share one vectorized batch)
+        with span("lookup"):
+            prediction_value, cache_key = known_prediction(record)
+        if prediction_value is None:
+            # Queue wait + the batch's encode/predict (the batch itself is traced as "micro_batch")
+            try:
+                with span("predict"):
+                    prediction_value = micro_batcher.predict_one(record, timeout=micro_batcher.config.request_timeout_s)
+            except TimeoutError:
+                with span("render_template"):
+                    return render_template('home.html', error="Prediction timed out, please try again"), 503
+            except CustomException as e:
+                # The fields passed validation, so this is on our side (e.g. the model failed to load)
+                with span("render_template"):
+                    return render_template('home.html', error=f"Prediction failed: {e.__context__ or e}"), 500
+            prediction_cache.put(cache_key, prediction_value)
         
         # Format to 2 decimal places
         prediction_value = round(prediction_value, 2)
         
         # Render the home.html template with prediction results
-        return render_template('home.html', results=prediction_value)
+        with span("render_template"):
+            return render_template('home.html', results=prediction_value)
+
+## Route for scoring many students in one call (JSON array or CSV upload)
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    # 1. Read the records: a CSV file upload, a raw CSV body, or a JSON array
+    try:
+        with span("parse_body"):
+            if 'file' in request.files or request.mimetype == 'text/csv':
+                # pandas is imported on first CSV upload, not at worker start-up
+                import pandas as pd
+                source = request.files['file'] if 'file' in request.files else io.BytesIO(request.get_data())
+                records = pd.read_csv(source)
+            else:
+                payload = request.get_json(silent=True)
+                # Accept both a bare array and {"records": [...]}
+                if isinstance(payload, dict):
+                    payload = payload.get('records')
+                if not isinstance(payload, list):
+                    return jsonify(error="Expected a JSON array of records or a CSV upload"), 400
+                records = payload
+    except Exception as e:
+        return jsonify(error=f"Could not parse request body: {e}"), 400
+
+    # 2. Score them with one model snapshot; a missing column fails the whole batch (400),
+    #    bad rows only fail themselves, and a failure on our side is a 500
+    try:
+        artifacts = predict_pipeline.registry.get()
+        with span("predict_batch"):
+            results = predict_pipeline.predict_batch(records, artifacts=artifacts)
+    except InvalidBatchError as e:
+        return jsonify(error=str(e)), 400
+    except CustomException as e:
+        return jsonify(error=str(e.__context__ or e)), 500
+
+    n_errors = sum(1 for result in results if 'error' in result)
+    with span("serialize"):
+        return jsonify(
+            model_version=artifacts.version,
+            count=len(results),
+            errors=n_errors,
+            results=results,
+        )
+
+
+## Async JSON scoring: {record} -> one prediction, [records] or {"records": [...]} -> a batch.
+## The model runs in the micro-batcher / a worker thread. Flask runs an async view through asgiref's
+## async_to_sync in the request's worker thread, so that thread is held until the response is ready,
+## exactly like /predictdata: size the server's threads for the concurrent requests either way.
+@app.route('/predict/json', methods=['POST'])
+async def predict_json():
+    payload = request.get_json(silent=True)
+    try:
+        if isinstance(payload, dict) and 'records' not in payload:
+            # Same rules as the batch path: required fields, known categories, scores in range
+            validation = predict_pipeline.validate([payload])
+            if not validation.valid[0]:
+                return jsonify(error=validation.error_message()), 400
+            record = validation.records()[0]
+            with span("lookup"):
+                prediction, cache_key = known_prediction(record)
+            if prediction is None:
+                # The request's thread waits (in async_to_sync) while the batch fills up and runs
+                with span("predict"):
+                    prediction = await asyncio.wait_for(
+                        asyncio.wrap_future(micro_batcher.submit(record)), micro_batcher.config.request_timeout_s
+                    )
+                prediction_cache.put(cache_key, prediction)
+            return jsonify(model_version=predict_pipeline.registry.get().version, prediction=prediction)
+
+        records = payload.get('records') if isinstance(payload, dict) else payload
+        if not isinstance(records, list):
+            return jsonify(error="Expected a JSON record, a JSON array of records or {\"records\": [...]}"), 400
+        artifacts = predict_pipeline.registry.get()
+        with span("predict_batch"):
+            results = await asyncio.to_thread(predict_pipeline.predict_batch, records, artifacts=artifacts)
+
+    except InvalidBatchError as e:
+        return jsonify(error=str(e)), 400
+    except TimeoutError:
+        return jsonify(error="Prediction timed out, please try again"), 503
+    except CustomException as e:
+        return jsonify(error=str(e.__context__ or e)), 500
+
+    return jsonify(
+        model_version=artifacts.version,
+        count=len(results),
+        errors=sum(1 for result in results if 'error' in result),
+        results=results,
+    )
+
+## Liveness: the process is up and serving requests
+@app.route('/health/live')
+def health_live():
+    return jsonify(status="alive")
+
+## Readiness: the model artifacts are loaded (loading them now if needed)
+@app.route('/health/ready')
+def health_ready():
+    registry = predict_pipeline.registry
+    try:
+        artifacts = registry.get()
+    except CustomException as e:
+        return jsonify(status="not ready", artifacts=registry.artifact_paths(), error=str(e.__context__ or e)), 503
+
+    return jsonify(
+        status="ready",
+        artifacts=registry.artifact_paths(),
+        model=type(artifacts.model).__name__,
+        model_version=artifacts.version,
+        loaded_at=artifacts.loaded_at,
+    )
+
+## Rolling latency percentiles of every route and span (this worker), with the
+## micro-batcher, prediction cache, prediction table and drift counters.
+## ?format=prometheus returns the same numbers in the Prometheus text format.
+@app.route('/metrics')
+def metrics():
+    stats = {
+        "micro_batcher": micro_batcher.stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "prediction_table": prediction_table.stats(),
+        "drift": drift_monitor.stats(),
+    }
+    if request.args.get('format') == 'prometheus':
+        return Response(request_tracer.prometheus_text(stats), mimetype='text/plain; version=0.0.4')
+    return jsonify(**request_tracer.snapshot(), **stats)
+
+## The most recent slow requests with their spans (and sampled profile, if any)
+@app.route('/metrics/slow')
+def metrics_slow():
+    return jsonify(
+        slow_request_ms=request_tracer.config.slow_request_ms,
+        requests=[trace.to_dict() for trace in reversed(request_tracer.slow_requests)],
+    )
+
+## Input drift of this worker's traffic: per feature, the PSI against the training data
+## and the bin proportions of both (the sketches hold counts only, never requests)
+@app.route('/metrics/drift')
+def metrics_drift():
+    return jsonify(**drift_monitor.report())
+
 
 if __name__ == "__main__":
+    # Development server only; in production use gunicorn (see application.py / gunicorn.conf.py)
     app.run(host="0.0.0.0", debug=True)
\ No newline at end of file
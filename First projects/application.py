@@ -0,0 +1,25 @@
+"""
+Production WSGI entry point (the WSGIPATH in .ebextensions/python.config):
+
+    gunicorn --config gunicorn.conf.py application:application
+
+The model artifacts are loaded when this module is imported. With preload_app = True
+(see gunicorn.conf.py) that happens once in the master process, before the workers are
+forked, so every worker shares the same copy-on-write pages instead of loading its own copy.
+"""
+from app import application, predict_pipeline, prediction_table
+from src.logger import logging
+
+
+def preload_artifacts():
+    try:
+        artifacts = predict_pipeline.registry.get()
+        logging.info(f"Preloaded model artifacts version {artifacts.version} before forking workers")
+        # Map the prediction table too, so its pages are shared by every worker
+        prediction_table.refresh()
+    except Exception as e:
+        # Start anyway: /health/ready answers 503 until the artifacts can be loaded
+        logging.error(f"Could not preload model artifacts: {e}")
+
+
+preload_artifacts()
@@ -0,0 +1,202 @@
+"""
+Machine-readable benchmark baselines, and the comparison of two of them.
+
+A baseline is one JSON file:
+    {
+      "created_at": "...",
+      "environment": {"git_commit": ..., "python": ..., "cpu_count": ..., "packages": {...}},
+      "results": [
+        {"benchmark": "data_ingestion", "params": {"rows": 1000}, "metrics": {"wall_seconds": 0.02, ...}},
+        ...
+      ]
+    }
+A result is identified by its benchmark name and params. Only the metrics listed in
+METRIC_DIRECTIONS are compared; anything else (row counts, R2, ...) is informational.
+
+Compare the baseline of a previous commit with a new run (exit code 1 on a regression):
+    python -m benchmarks.baseline benchmarks/baselines/before.json benchmarks/baselines/after.json
+    python -m benchmarks.baseline before.json after.json --threshold 0.25 --output diff.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+# Metric -> which way is better. Timings and memory go down, throughputs go up
+METRIC_DIRECTIONS = {
+    "wall_seconds": "lower",
+    "cpu_seconds": "lower",
+    "peak_rss_mb": "lower",
+    "latency_p50_ms": "lower",
+    "latency_p95_ms": "lower",
+    "latency_p99_ms": "lower",
+    "error_rate": "lower",
+    "rows_per_second": "higher",
+    "requests_per_second": "higher",
+}
+# Relative change beyond which a metric counts as regressed (0.10 = 10% worse)
+DEFAULT_THRESHOLD = 0.10
+# Versions recorded with every baseline, so a difference can be traced to an upgrade
+PACKAGES = ["numpy", "pandas", "scikit-learn", "xgboost", "catboost", "flask", "gunicorn"]
+
+
+def git_output(*args):
+    try:
+        completed = subprocess.run(["git", *args], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return completed.stdout.strip() if completed.returncode == 0 else None
+
+
+def environment():
+    """
+    Where the numbers were measured: commit, interpreter, machine and library versions.
+    """
+    from importlib import metadata
+
+    packages = {}
+    for name in PACKAGES:
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+
+    status = git_output("status", "--porcelain", "--untracked-files=no")
+    return {
+        "git_commit": git_output("rev-parse", "HEAD"),
+        "git_dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def result(benchmark, params, metrics):
+    """
+    One baseline entry; None metrics are dropped.
+    """
+    return {
+        "benchmark": benchmark,
+        "params": params,
+        "metrics": {name: value for name, value in metrics.items() if value is not None},
+    }
+
+
+def write_baseline(file_path, results):
+    """
+    Writes the results with their environment atomically and returns the path.
+    """
+    baseline = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w") as file_obj:
+        json.dump(baseline, file_obj, indent=2)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def load_baseline(file_path):
+    with open(file_path) as file_obj:
+        return json.load(file_obj)
+
+
+def _key(entry):
+    return entry["benchmark"], json.dumps(entry["params"], sort_keys=True)
+
+
+def compare(old, new, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares every metric of every result present in both baselines.
+    Returns a list of rows {"benchmark", "params", "metric", "old", "new", "change", "status"},
+    where change is the relative change in the 'worse' direction (+0.2 = 20% worse) and
+    status is "regressed", "improved" or "ok".
+    """
+    old_results = {_key(entry): entry for entry in old["results"]}
+    rows = []
+    for entry in new["results"]:
+        previous = old_results.get(_key(entry))
+        if previous is None:
+            continue
+        for metric, direction in METRIC_DIRECTIONS.items():
+            if metric not in entry["metrics"] or metric not in previous["metrics"]:
+                continue
+            old_value, new_value = previous["metrics"][metric], entry["metrics"][metric]
+
+            if old_value == 0:
+                # e.g. error_rate 0 -> 0.01: any increase of a 'lower' metric from zero is a regression
+                worse = new_value > 0 if direction == "lower" else new_value < 0
+                change = float("inf") if worse else 0.0
+            else:
+                change = (new_value - old_value) / abs(old_value)
+                if direction == "higher":
+                    change = -change
+
+            if change > threshold:
+                status = "regressed"
+            elif change < -threshold:
+                status = "improved"
+            else:
+                status = "ok"
+            rows.append({
+                "benchmark": entry["benchmark"],
+                "params": entry["params"],
+                "metric": metric,
+                "old": old_value,
+                "new": new_value,
+                "change": change,
+                "status": status,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old", help="baseline to compare against")
+    parser.add_argument("new", help="baseline of the run under test")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change counted as a regression (default 0.10)")
+    parser.add_argument("--output", default=None, help="optional JSON file with every compared metric")
+    parser.add_argument("--all", action="store_true", help="print unchanged metrics too")
+    args = parser.parse_args()
+
+    old, new = load_baseline(args.old), load_baseline(args.new)
+    rows = compare(old, new, args.threshold)
+
+    for label, baseline in (("old", old), ("new", new)):
+        env = baseline["environment"]
+        print(f"{label}: commit {(env['git_commit'] or '?')[:12]}{' (dirty)' if env['git_dirty'] else ''}, "
+              f"python {env['python']}, {env['cpu_count']} CPUs, {baseline['created_at']}")
+    if old["environment"]["machine"] != new["environment"]["machine"] or \
+            old["environment"]["cpu_count"] != new["environment"]["cpu_count"]:
+        print("!! the baselines were measured on different machines")
+
+    for row in rows:
+        if row["status"] == "ok" and not args.all:
+            continue
+        params = ", ".join(f"{name}={value}" for name, value in row["params"].items())
+        print(f"[{row['status']:>9}] {row['benchmark']}({params}) {row['metric']}: "
+              f"{row['old']:.4g} -> {row['new']:.4g} "
+              f"({abs(row['change']):.1%} {'worse' if row['change'] > 0 else 'better'})")
+
+    regressions = [row for row in rows if row["status"] == "regressed"]
+    print(f"{len(rows)} metrics compared, {len(regressions)} regressed, "
+          f"{sum(row['status'] == 'improved' for row in rows)} improved (threshold {args.threshold:.0%})")
+
+    if args.output:
+        with open(args.output, "w") as file_obj:
+            json.dump(rows, file_obj, indent=2)
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Parity check of the compiled FastFeatureEncoder against the fitted preprocessor in
+artifacts/preprocessor.pkl: encode (row by row) and encode_batch must be exactly equal
+(np.array_equal) to preprocessor.transform, on the category/missing-value grid that
+FastFeatureEncoder.from_preprocessor checks at load time and on --rows synthetic students.
+The repo has no test suite; this is the runnable form of that check. Exits with status 1
+on any mismatch.
+
+Run from the project root:
+    python -m benchmarks.encoder_parity --rows 10000
+"""
+import argparse
+import os
+import sys
+
+os.environ.setdefault("INSTRUMENTATION", "0")
+
+from benchmarks.synthetic_data import StudentGenerator
+from src.pipeline.fast_encoder import FastFeatureEncoder, check_parity
+from src.pipeline.predict_pipeline import FEATURE_COLUMNS
+from src.utils import load_object
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="synthetic rows to compare")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--preprocessor", default=os.path.join("artifacts", "preprocessor.pkl"))
+    args = parser.parse_args()
+
+    preprocessor = load_object(args.preprocessor)
+    fast_encoder = FastFeatureEncoder.from_preprocessor(preprocessor, verify=False)
+
+    rows = StudentGenerator().generate(args.rows, seed=args.seed)[FEATURE_COLUMNS]
+    # Floats, as the serving path passes them after validation
+    rows = rows.astype({column: "float64" for column in rows.columns if rows[column].dtype.kind in "iu"})
+    checks = {
+        "category grid": check_parity(fast_encoder, preprocessor),
+        f"{args.rows} synthetic rows": check_parity(fast_encoder, preprocessor, rows.to_dict("records")),
+    }
+
+    failed = False
+    for name, max_error in checks.items():
+        print(f"{name:<24} {'exact' if max_error == 0.0 else f'MISMATCH (max error {max_error:.3g})'}")
+        failed |= max_error != 0.0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Import-time budget for the serving entry point.
+
+Imports each target in a fresh interpreter with `python -X importtime`, from an empty
+working directory, and fails (exit code 1) when:
+- the best cumulative import time over --repeat runs exceeds the target's budget,
+- a training-only module (pandas, sklearn, catboost, ...) gets imported,
+- the import writes anything to the working directory (e.g. a logs/ folder).
+
+Run from the project root:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 500 --repeat 10 --output import_time.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Target module -> cumulative import budget (ms) and modules it must not import
+BUDGETS = {
+    "app": {
+        "budget_ms": 1000,
+        "forbidden": ["pandas", "sklearn", "scipy", "dill", "xgboost", "catboost", "lightgbm"],
+    },
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output into {module: (self_us, cumulative_us)}.
+    Lines look like: 'import time:       123 |       4567 |   package.module'
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure(target, project_root):
+    # Empty cwd: the import must not create files (logger) and must not rely on the cwd
+    with tempfile.TemporaryDirectory() as cwd:
+        env = dict(os.environ, PYTHONPATH=project_root)
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+            cwd=cwd, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"import {target} failed:\n{completed.stderr[-2000:]}")
+        created = sorted(os.listdir(cwd))
+    return parse_importtime(completed.stderr), created
+
+
+def check_target(target, budget, repeat, project_root):
+    runs = [measure(target, project_root) for _ in range(repeat)]
+    timings, created = min(runs, key=lambda run: run[0][target][1])
+    cumulative_ms = timings[target][1] / 1000
+
+    failures = []
+    if cumulative_ms > budget["budget_ms"]:
+        failures.append(f"import took {cumulative_ms:.0f} ms, budget is {budget['budget_ms']} ms")
+
+    imported = [module for module in budget["forbidden"] if module in timings]
+    if imported:
+        failures.append(f"imports training-only modules: {imported}")
+
+    if created:
+        failures.append(f"import created files in the working directory: {created}")
+
+    slowest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:10]
+    return {
+        "target": target,
+        "cumulative_ms": round(cumulative_ms, 1),
+        "budget_ms": budget["budget_ms"],
+        "slowest_self_ms": {name: round(self_us / 1000, 1) for name, (self_us, _) in slowest},
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per target, the fastest one is kept")
+    parser.add_argument("--budget-ms", type=float, default=None, help="override the budget of every target")
+    parser.add_argument("--output", default=None, help="optional JSON report path")
+    args = parser.parse_args()
+
+    project_root = os.getcwd()
+    results = []
+    for target, budget in BUDGETS.items():
+        if args.budget_ms is not None:
+            budget = dict(budget, budget_ms=args.budget_ms)
+        result = check_target(target, budget, args.repeat, project_root)
+        results.append(result)
+
+        status = "FAIL" if result["failures"] else "ok"
+        print(f"[{status}] import {target}: {result['cumulative_ms']} ms (budget {result['budget_ms']} ms)")
+        for name, self_ms in result["slowest_self_ms"].items():
+            print(f"    {self_ms:8.1f} ms  {name}")
+        for failure in result["failures"]:
+            print(f"    !! {failure}")
+
+    if args.output:
+        with open(args.output, "w") as file_obj:
+            json.dump(results, file_obj, indent=2)
+
+    sys.exit(1 if any(result["failures"] for result in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
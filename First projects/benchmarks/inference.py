@@ -0,0 +1,98 @@
+"""
+Inference benchmarks on the artifacts in artifacts/ (model.pkl + preprocessor.pkl):
+- predict: PredictPipeline.predict on a DataFrame (preprocessor.transform + model.predict),
+- predict_many: PredictPipeline.predict_many on a list of dicts (the compiled encoder path
+  used by the micro-batcher),
+at batch sizes 1, 32, 1024 and 65536 by default. The rows come from the synthetic
+generator, so every batch looks like real traffic.
+
+Each batch size is called repeatedly for at least --min-seconds (and at least 5 times);
+per-call latency percentiles and rows/second are reported.
+
+Run from the project root:
+    python -m benchmarks.inference --output inference.json
+    python -m benchmarks.inference --batch-sizes 1 32 --min-seconds 5
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("INSTRUMENTATION", "0")
+
+import numpy as np
+
+from benchmarks.baseline import result, write_baseline
+from benchmarks.synthetic_data import StudentGenerator
+
+DEFAULT_BATCH_SIZES = [1, 32, 1024, 65536]
+MIN_CALLS = 5
+
+
+def measure_calls(func, min_seconds):
+    """
+    Calls func() until min_seconds have passed (after one warm-up call) and returns
+    the latency of every call in seconds.
+    """
+    func()
+    latencies = []
+    deadline = time.perf_counter() + min_seconds
+    while len(latencies) < MIN_CALLS or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    return np.array(latencies)
+
+
+def _metrics(latencies, batch_size):
+    return {
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "rows_per_second": float(batch_size * len(latencies) / latencies.sum()),
+        "calls": len(latencies),
+    }
+
+
+def run(batch_sizes=None, min_seconds=1.0, log=print):
+    from src.pipeline.predict_pipeline import FEATURE_COLUMNS, PredictPipeline
+
+    batch_sizes = batch_sizes or DEFAULT_BATCH_SIZES
+    pipeline = PredictPipeline()
+    artifacts = pipeline.registry.get()
+    log(f"Model version {artifacts.version} ({type(artifacts.model).__name__})")
+
+    rows = StudentGenerator().generate(max(batch_sizes))[FEATURE_COLUMNS]
+    records = rows.to_dict(orient="records")
+
+    results = []
+    for batch_size in batch_sizes:
+        frame, batch_records = rows.iloc[:batch_size], records[:batch_size]
+        for name, func in (
+            ("predict", lambda: pipeline.predict(frame)),
+            ("predict_many", lambda: pipeline.predict_many(batch_records)),
+        ):
+            metrics = _metrics(measure_calls(func, min_seconds), batch_size)
+            results.append(result(
+                f"predict_pipeline.{name}",
+                {"batch_size": batch_size, "model": type(artifacts.model).__name__},
+                metrics,
+            ))
+            log(f"{name:<13} batch {batch_size:>6}  p50 {metrics['latency_p50_ms']:9.3f} ms  "
+                f"p99 {metrics['latency_p99_ms']:9.3f} ms  {metrics['rows_per_second']:>12,.0f} rows/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="time spent on each batch size and path")
+    parser.add_argument("--output", default=None, help="write the results as a baseline JSON file")
+    args = parser.parse_args()
+
+    results = run(args.batch_sizes, args.min_seconds)
+    if args.output:
+        print(f"Baseline written to {write_baseline(args.output, results)}")
+
+
+if __name__ == "__main__":
+    main()
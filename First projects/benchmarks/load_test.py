@@ -0,0 +1,218 @@
+"""
+Closed-loop load test of the Flask /predictdata route (the HTML form post).
+
+Starts the production server (gunicorn with gunicorn.conf.py, serving artifacts/) on a free
+port, or targets a running one with --url. For each concurrency level, that many clients
+each send a request, wait for the response and immediately send the next one (closed loop:
+the offered load adapts to the server's speed) for --seconds, after --warmup seconds that
+are not counted. Reports requests/second, latency percentiles and the error rate.
+
+The spawned server has the prediction cache and the prediction table turned off, so every
+request reaches the model; --allow-shortcuts keeps them. The clients are Python threads
+in this process: on a small machine they compete with the server for the CPU, so for
+absolute numbers run the server elsewhere and point --url at it.
+
+Run from the project root:
+    python -m benchmarks.load_test --concurrency 1 8 32 --seconds 20 --output load_test.json
+    python -m benchmarks.load_test --url http://10.0.0.5:8000 --concurrency 64
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+from benchmarks.baseline import result, write_baseline
+from benchmarks.synthetic_data import StudentGenerator
+
+DEFAULT_CONCURRENCY = [1, 8, 32]
+# CustomData field -> name of the form input in templates/home.html
+FORM_FIELDS = {
+    "gender": "gender",
+    "race_ethnicity": "ethnicity",
+    "parental_level_of_education": "parental_level_of_education",
+    "lunch": "lunch",
+    "test_preparation_course": "test_preparation_course",
+    "reading_score": "reading_score",
+    "writing_score": "writing_score",
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers=None, threads=None, allow_shortcuts=False, timeout=120):
+    """
+    Starts gunicorn on a free local port and waits until /health/ready answers 200.
+    Returns (process, base url).
+    """
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), INSTRUMENTATION="0")
+    if workers:
+        env["WEB_CONCURRENCY"] = str(workers)
+    if threads:
+        env["GUNICORN_THREADS"] = str(threads)
+    if not allow_shortcuts:
+        env.update(PREDICTION_CACHE_SIZE="0", PREDICTION_TABLE="0")
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py",
+         "--access-logfile", "/dev/null", "application:application"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}:\n{process.stderr.read().decode()[-2000:]}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            connection.request("GET", "/health/ready")
+            if connection.getresponse().status == 200:
+                return process, url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"gunicorn was not ready after {timeout}s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def form_bodies(n_bodies, seed=42):
+    # Pre-encoded request bodies, so the clients spend no time building them
+    rows = StudentGenerator().generate(n_bodies, seed=seed)
+    return [
+        urllib.parse.urlencode({form_name: row[field] for field, form_name in FORM_FIELDS.items()}).encode()
+        for row in rows.to_dict(orient="records")
+    ]
+
+
+def _client(url, bodies, offset, start_at, stop_at, latencies, errors):
+    parsed = urllib.parse.urlsplit(url)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+    i = offset
+    while True:
+        started = time.perf_counter()
+        if started >= stop_at:
+            break
+        try:
+            # Keep-alive connection; reconnect after an error
+            connection.request("POST", "/predictdata", body=bodies[i % len(bodies)], headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            ok = False
+        finished = time.perf_counter()
+        # Only requests started after the warm-up are counted
+        if started >= start_at:
+            if ok:
+                latencies.append(finished - started)
+            else:
+                errors.append(finished - started)
+        i += 1
+    connection.close()
+
+
+def run_level(url, concurrency, seconds, warmup, bodies):
+    """
+    One closed-loop run with `concurrency` clients; returns the metrics.
+    """
+    latencies, errors = [], []
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + seconds
+    clients = [
+        threading.Thread(
+            target=_client,
+            args=(url, bodies, i * len(bodies) // concurrency, start_at, stop_at, latencies, errors),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    n_requests = len(latencies) + len(errors)
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+    return {
+        "requests_per_second": len(latencies) / seconds,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "error_rate": len(errors) / n_requests if n_requests else 0.0,
+        "requests": n_requests,
+    }
+
+
+def run(concurrency_levels=None, seconds=10.0, warmup=2.0, url=None, workers=None, threads=None,
+        allow_shortcuts=False, log=print):
+    bodies = form_bodies(10_000)
+    process = None
+    if url is None:
+        process, url = start_server(workers, threads, allow_shortcuts)
+        log(f"Started gunicorn at {url}")
+
+    server = {
+        "workers": workers or os.environ.get("WEB_CONCURRENCY") or os.cpu_count(),
+        "threads": threads or os.environ.get("GUNICORN_THREADS") or 4,
+        "shortcuts": allow_shortcuts,
+    } if process is not None else {"url": url}
+
+    results = []
+    try:
+        for concurrency in concurrency_levels or DEFAULT_CONCURRENCY:
+            metrics = run_level(url, concurrency, seconds, warmup, bodies)
+            results.append(result("load_test.predictdata", {"concurrency": concurrency, **server}, metrics))
+            log(f"concurrency {concurrency:>4}  {metrics['requests_per_second']:8.1f} req/s  "
+                f"p50 {metrics['latency_p50_ms']:8.2f} ms  p95 {metrics['latency_p95_ms']:8.2f} ms  "
+                f"p99 {metrics['latency_p99_ms']:8.2f} ms  errors {metrics['error_rate']:.2%}")
+    finally:
+        if process is not None:
+            stop_server(process)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=DEFAULT_CONCURRENCY,
+                        help="numbers of concurrent clients, one run each")
+    parser.add_argument("--seconds", type=float, default=10.0, help="measured duration of each run")
+    parser.add_argument("--warmup", type=float, default=2.0, help="uncounted seconds at the start of each run")
+    parser.add_argument("--url", default=None, help="target a running server instead of starting gunicorn")
+    parser.add_argument("--workers", type=int, default=None, help="gunicorn workers (WEB_CONCURRENCY)")
+    parser.add_argument("--threads", type=int, default=None, help="threads per worker (GUNICORN_THREADS)")
+    parser.add_argument("--allow-shortcuts", action="store_true",
+                        help="keep the prediction cache and table on in the spawned server")
+    parser.add_argument("--output", default=None, help="write the results as a baseline JSON file")
+    args = parser.parse_args()
+
+    results = run(args.concurrency, args.seconds, args.warmup, args.url, args.workers, args.threads,
+                  args.allow_shortcuts)
+    if args.output:
+        print(f"Baseline written to {write_baseline(args.output, results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Runs the training, inference and load-test benchmarks and writes one baseline file,
+named after the current commit and profile by default:
+benchmarks/baselines/<commit>-<profile>.json.
+
+Profiles:
+    quick  1k and 10k rows, short runs; a couple of minutes, for checking a change
+    full   1k to 10M rows (model fits up to 100k), 3 repeats, longer load runs
+
+Run from the project root, then compare two commits' baselines:
+    python -m benchmarks.suite --profile quick
+    python -m benchmarks.suite --profile full --skip load_test --output after.json
+    python -m benchmarks.baseline benchmarks/baselines/<old>-quick.json benchmarks/baselines/<new>-quick.json
+"""
+import argparse
+import os
+
+os.environ.setdefault("INSTRUMENTATION", "0")
+
+from benchmarks import inference, load_test, training
+from benchmarks.baseline import git_output, write_baseline
+
+PROFILES = {
+    "quick": {
+        "training": {"sizes": [1_000, 10_000], "max_fit_rows": 10_000, "repeat": 1},
+        "inference": {"min_seconds": 0.5},
+        "load_test": {"concurrency_levels": [1, 8], "seconds": 5.0, "warmup": 1.0},
+    },
+    "full": {
+        "training": {"sizes": [1_000, 10_000, 100_000, 1_000_000, 10_000_000], "max_fit_rows": 100_000, "repeat": 3},
+        "inference": {"min_seconds": 3.0},
+        "load_test": {"concurrency_levels": [1, 8, 32, 64], "seconds": 30.0, "warmup": 5.0},
+    },
+}
+BENCHMARKS = {"training": training.run, "inference": inference.run, "load_test": load_test.run}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--skip", nargs="+", choices=sorted(BENCHMARKS), default=[], help="benchmarks not to run")
+    parser.add_argument("--output", default=None, help="baseline file (default: benchmarks/baselines/<commit>-<profile>.json)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(
+        "benchmarks", "baselines", f"{(git_output('rev-parse', '--short=12', 'HEAD') or 'unknown')}-{args.profile}.json"
+    )
+
+    results = []
+    for name, run in BENCHMARKS.items():
+        if name in args.skip:
+            continue
+        print(f"== {name} ({args.profile})")
+        results.extend(run(**PROFILES[args.profile][name]))
+
+    print(f"Baseline written to {write_baseline(output, results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Synthetic student datasets with the schema of notebook/data/stud.csv, at any size.
+
+The categorical columns are drawn from their frequencies in stud.csv. The three scores
+are a least-squares fit on those categories plus correlated Gaussian noise with the
+residual covariance of the real data, clipped to 0-100 and rounded. So the models see a
+similar signal (R2 ~ 0.87 on math_score) at 1k rows or at 10M rows.
+
+Rows are generated in fixed-size chunks, each from its own seed, so a dataset is the same
+for a given (seed, rows) however it is consumed, and 10M rows never sit in memory at once.
+
+Run from the project root:
+    python -m benchmarks.synthetic_data --rows 1000000 --output students_1m.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+SOURCE_PATH = os.path.join("notebook", "data", "stud.csv")
+CATEGORICAL_COLUMNS = [
+    "gender",
+    "race_ethnicity",
+    "parental_level_of_education",
+    "lunch",
+    "test_preparation_course",
+]
+SCORE_COLUMNS = ["math_score", "reading_score", "writing_score"]
+# Same column order as stud.csv
+COLUMNS = CATEGORICAL_COLUMNS + SCORE_COLUMNS
+# Rows per generated chunk; part of what makes a seed reproducible, so don't change it lightly
+CHUNK_ROWS = 250_000
+
+
+class StudentGenerator:
+    """
+    Learns the category frequencies and the score model from the source CSV once,
+    then generates any number of rows.
+    """
+    def __init__(self, source_path=SOURCE_PATH):
+        source = pd.read_csv(source_path)
+
+        # 1. Category values and their frequencies, per column
+        self.categories = {}
+        for col in CATEGORICAL_COLUMNS:
+            frequencies = source[col].value_counts(normalize=True).sort_index()
+            self.categories[col] = (frequencies.index.to_numpy(dtype=object), frequencies.to_numpy())
+
+        # 2. Scores ~ intercept + one-hot(categories) @ coef + N(0, residual covariance)
+        design = self._design_matrix({col: source[col].to_numpy(dtype=object) for col in CATEGORICAL_COLUMNS})
+        scores = source[SCORE_COLUMNS].to_numpy(dtype=np.float64)
+        self.coef, *_ = np.linalg.lstsq(design, scores, rcond=None)
+        residuals = scores - design @ self.coef
+        self.noise_cholesky = np.linalg.cholesky(np.cov(residuals, rowvar=False))
+
+    def _design_matrix(self, columns):
+        # Intercept + one indicator per category value (first value of each column dropped)
+        n_rows = len(next(iter(columns.values())))
+        blocks = [np.ones((n_rows, 1))]
+        for col in CATEGORICAL_COLUMNS:
+            values = self.categories[col][0]
+            blocks.append((columns[col][:, None] == values[None, 1:]).astype(np.float64))
+        return np.hstack(blocks)
+
+    def _chunk(self, n_rows, rng):
+        columns = {}
+        for col in CATEGORICAL_COLUMNS:
+            values, probabilities = self.categories[col]
+            columns[col] = values[rng.choice(len(values), size=n_rows, p=probabilities)]
+
+        noise = rng.standard_normal((n_rows, len(SCORE_COLUMNS))) @ self.noise_cholesky.T
+        scores = np.clip(np.rint(self._design_matrix(columns) @ self.coef + noise), 0, 100).astype(np.int64)
+        for i, col in enumerate(SCORE_COLUMNS):
+            columns[col] = scores[:, i]
+        return pd.DataFrame(columns, columns=COLUMNS)
+
+    def iter_chunks(self, n_rows, seed=42):
+        """
+        Yields DataFrames of at most CHUNK_ROWS rows, n_rows in total.
+        """
+        for i, start in enumerate(range(0, n_rows, CHUNK_ROWS)):
+            rng = np.random.default_rng([seed, i])
+            yield self._chunk(min(CHUNK_ROWS, n_rows - start), rng)
+
+    def generate(self, n_rows, seed=42):
+        return pd.concat(list(self.iter_chunks(n_rows, seed)), ignore_index=True)
+
+    def write_csv(self, file_path, n_rows, seed=42):
+        """
+        Writes n_rows to file_path chunk by chunk and returns the path.
+        """
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        for i, chunk in enumerate(self.iter_chunks(n_rows, seed)):
+            chunk.to_csv(file_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        return file_path
+
+
+def parse_rows(value):
+    # Accepts 1000, 1_000, 1k, 10M
+    value = value.strip().lower().replace("_", "")
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=parse_rows, default=1000, help="number of rows, e.g. 1000, 100k, 10M")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    args = parser.parse_args()
+
+    StudentGenerator().write_csv(args.output, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Training-side benchmarks on synthetic datasets (see benchmarks/synthetic_data.py):
+- data_ingestion: DataIngestion.initiate_data_ingestion on an N-row source CSV,
+- data_transformation: DataTransformation.initiate_data_transformation on its split,
+- evaluate_models: evaluate_models for each default ModelTrainer candidate on its own
+  (fit on the train split + predict on the test split, no hyperparameter search).
+
+Each size runs in a scratch directory with the stage caches off, so every run does the
+full work. Every measurement is repeated --repeat times and the fastest run is kept.
+Model fits are skipped above --max-fit-rows (at 10M rows some candidates, e.g.
+K-Neighbors, would take hours).
+
+Run from the project root:
+    python -m benchmarks.training --sizes 1k 10k 100k --output training.json
+    python -m benchmarks.training --sizes 10M --max-fit-rows 0
+"""
+import argparse
+import os
+import tempfile
+
+# The stage decorators would write a run report into the scratch directory after every
+# measured call; the benchmark takes its own measurements
+os.environ.setdefault("INSTRUMENTATION", "0")
+
+from benchmarks.baseline import result, write_baseline
+from benchmarks.synthetic_data import StudentGenerator, parse_rows
+from src.instrumentation import StageTimer
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_MAX_FIT_ROWS = 100_000
+
+
+def default_models():
+    """
+    The candidates ModelTrainer compares, with their default hyperparameters.
+    """
+    from catboost import CatBoostRegressor
+    from sklearn.ensemble import AdaBoostRegressor, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression, Lasso, Ridge
+    from sklearn.neighbors import KNeighborsRegressor
+    from sklearn.tree import DecisionTreeRegressor
+    from xgboost import XGBRegressor
+
+    return {
+        "Linear Regression": LinearRegression(),
+        "Lasso": Lasso(),
+        "Ridge": Ridge(),
+        "K-Neighbors Regressor": KNeighborsRegressor(),
+        "Decision Tree": DecisionTreeRegressor(),
+        "Random Forest Regressor": RandomForestRegressor(),
+        "XGBRegressor": XGBRegressor(),
+        # No catboost_info/ folder in the working directory
+        "CatBoosting Regressor": CatBoostRegressor(verbose=False, allow_writing_files=False),
+        "AdaBoost Regressor": AdaBoostRegressor(),
+    }
+
+
+def timed(func, rows, repeat):
+    """
+    Runs func() repeat times and returns (output of the fastest run, its StageTimer result).
+    """
+    best_output, best = None, None
+    for _ in range(repeat):
+        with StageTimer() as timer:
+            timer.rows = rows
+            output = func()
+        if best is None or timer.result["wall_seconds"] < best["wall_seconds"]:
+            best_output, best = output, timer.result
+    return best_output, best
+
+
+def _metrics(measured, **extra):
+    return {
+        "wall_seconds": measured["wall_seconds"],
+        "cpu_seconds": measured["cpu_seconds"],
+        "peak_rss_mb": measured["peak_rss_mb"],
+        "rows_per_second": measured["rows_per_second"],
+        **extra,
+    }
+
+
+def benchmark_size(n_rows, generator, max_fit_rows, repeat, models=None, log=print):
+    """
+    Benchmarks the three training stages on an n_rows dataset; returns baseline results.
+    """
+    from src.components.data_ingestion import DataIngestion
+    from src.components.data_transformation import DataTransformation
+    from src.utils import evaluate_models
+
+    results = []
+    project_root = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # The components write to artifacts/ relative to the working directory
+        os.chdir(work_dir)
+        try:
+            source_path = generator.write_csv(os.path.join(work_dir, "source", "stud.csv"), n_rows)
+
+            # 1. Ingestion: read + split + write train/test
+            def ingest():
+                ingestion = DataIngestion()
+                ingestion.stage_cache = None
+                ingestion.ingestion_config.source_data_path = source_path
+                return ingestion.initiate_data_ingestion()
+
+            (train_path, test_path), measured = timed(ingest, n_rows, repeat)
+            results.append(result("data_ingestion", {"rows": n_rows}, _metrics(measured)))
+            log(f"{n_rows:>10} rows  {'data_ingestion':<24} {measured['wall_seconds']:8.3f} s")
+
+            # 2. Transformation: fit the preprocessor, encode both splits
+            def transform():
+                transformation = DataTransformation()
+                transformation.stage_cache = None
+                return transformation.initiate_data_transformation(train_path, test_path)
+
+            (X_train, y_train, X_test, y_test, _), measured = timed(transform, n_rows, repeat)
+            results.append(result("data_transformation", {"rows": n_rows}, _metrics(measured)))
+            log(f"{n_rows:>10} rows  {'data_transformation':<24} {measured['wall_seconds']:8.3f} s")
+
+            # 3. One evaluate_models call per candidate, serially, so each gets the whole machine
+            if n_rows > max_fit_rows:
+                log(f"{n_rows:>10} rows  evaluate_models          skipped (--max-fit-rows {max_fit_rows})")
+                return results
+            for model_name in default_models():
+                if models and model_name not in models:
+                    continue
+
+                def fit():
+                    candidates = {model_name: default_models()[model_name]}
+                    return evaluate_models(X_train, y_train, X_test, y_test, candidates, n_jobs=1)
+
+                report, measured = timed(fit, len(y_train), repeat)
+                results.append(result(
+                    "evaluate_models", {"rows": n_rows, "model": model_name},
+                    _metrics(measured, r2=report[model_name]),
+                ))
+                log(f"{n_rows:>10} rows  {model_name:<24} {measured['wall_seconds']:8.3f} s  "
+                    f"R2 {report[model_name]:.3f}")
+        finally:
+            os.chdir(project_root)
+    return results
+
+
+def run(sizes=None, max_fit_rows=DEFAULT_MAX_FIT_ROWS, repeat=1, models=None, log=print):
+    generator = StudentGenerator()
+    # Untimed warm-up: the first call in a process pays for lazy imports and first-use setup
+    benchmark_size(1_000, generator, max_fit_rows=0, repeat=1, log=lambda message: None)
+
+    results = []
+    for n_rows in sizes or DEFAULT_SIZES:
+        results.extend(benchmark_size(n_rows, generator, max_fit_rows, repeat, models, log))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=parse_rows, default=DEFAULT_SIZES,
+                        help="dataset sizes, e.g. 1k 10k 100k 1M 10M")
+    parser.add_argument("--max-fit-rows", type=parse_rows, default=DEFAULT_MAX_FIT_ROWS,
+                        help="largest size evaluate_models is run on")
+    parser.add_argument("--models", nargs="+", default=None, help="only these candidates (ModelTrainer names)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per measurement, the fastest one is kept")
+    parser.add_argument("--output", default=None, help="write the results as a baseline JSON file")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.max_fit_rows, args.repeat, args.models)
+    if args.output:
+        print(f"Baseline written to {write_baseline(args.output, results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Memory of the transformation -> trainer hand-off, before and after features and
+target were split apart (float32 / CSR features instead of an np.c_ float64 matrix
+that the trainer slices back into non-contiguous views).
+
+For each mode, in its own subprocess, reports:
+- the process peak RSS,
+- the traced allocation peak (tracemalloc) of the transformation phase,
+- the traced allocation peak of the training phase (hand-off + LinearRegression + RandomForest).
+The ColumnTransformer fit itself is the same in both modes and usually sets the process
+peak, so the per-phase numbers are where the difference shows.
+
+Run from the project root:
+    python -m benchmarks.transformation_memory --rows 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux (bytes on macOS)
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 ** 2
+
+
+def traced_peak_mb(func):
+    # Peak of the memory allocated while func runs, above what was allocated before it
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    return result, (tracemalloc.get_traced_memory()[1] - before) / 1024 ** 2
+
+
+def make_dataset(n_rows, out_dir, seed=42):
+    # Resample the real dataset up to n_rows and split it 80/20
+    source = pd.read_csv(os.path.join("notebook", "data", "stud.csv"))
+    rng = np.random.default_rng(seed)
+    df = source.iloc[rng.integers(0, len(source), size=n_rows)].reset_index(drop=True)
+    n_train = int(n_rows * 0.8)
+    train_path = os.path.join(out_dir, "train.csv")
+    test_path = os.path.join(out_dir, "test.csv")
+    df.iloc[:n_train].to_csv(train_path, index=False)
+    df.iloc[n_train:].to_csv(test_path, index=False)
+    return train_path, test_path
+
+
+def fit_models(X_train, y_train, X_test):
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+
+    for model in (LinearRegression(), RandomForestRegressor(n_estimators=5, max_depth=8, random_state=42)):
+        model.fit(X_train, y_train).predict(X_test)
+
+
+def run_legacy(train_path, test_path):
+    # The pre-change contract: np.c_ into one float64 matrix, then sliced back apart
+    from src.components.data_transformation import DataTransformation
+
+    def transform():
+        train_df, test_df = pd.read_csv(train_path), pd.read_csv(test_path)
+        preprocessor = DataTransformation().get_data_transformer_objects()
+        train_arr = np.c_[preprocessor.fit_transform(train_df.drop(columns=["math_score"])), np.array(train_df["math_score"])]
+        test_arr = np.c_[preprocessor.transform(test_df.drop(columns=["math_score"])), np.array(test_df["math_score"])]
+        return train_arr, test_arr
+
+    (train_arr, test_arr), transform_mb = traced_peak_mb(transform)
+    _, train_mb = traced_peak_mb(lambda: fit_models(train_arr[:, :-1], train_arr[:, -1], test_arr[:, :-1]))
+    return transform_mb, train_mb
+
+
+def run_current(train_path, test_path):
+    from src.components.data_transformation import DataTransformation
+
+    def transform():
+        transformation = DataTransformation()
+        transformation.stage_cache = None
+        transformation.data_transformation_config.preprocessor_obj_file_path = os.path.join(
+            os.path.dirname(train_path), "preprocessor.pkl"
+        )
+        return transformation.initiate_data_transformation(train_path, test_path)
+
+    (X_train, y_train, X_test, _, _), transform_mb = traced_peak_mb(transform)
+    _, train_mb = traced_peak_mb(lambda: fit_models(X_train, y_train, X_test))
+    return transform_mb, train_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--mode", choices=["legacy", "current"], help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.mode:
+        # Child process: run one mode and report its numbers
+        train_path, test_path = (os.path.join(args.data_dir, name) for name in ("train.csv", "test.csv"))
+        tracemalloc.start()
+        transform_mb, train_mb = (run_legacy if args.mode == "legacy" else run_current)(train_path, test_path)
+        print(json.dumps({
+            "peak_rss_mb": peak_rss_mb(),
+            "transformation_peak_mb": transform_mb,
+            "training_peak_mb": train_mb,
+        }))
+        return
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        make_dataset(args.rows, data_dir)
+        results = {"rows": args.rows}
+        for mode in ("legacy", "current"):
+            completed = subprocess.run(
+                [sys.executable, "-W", "ignore", "-m", "benchmarks.transformation_memory",
+                 "--mode", mode, "--data-dir", data_dir],
+                check=True, capture_output=True, text=True,
+            )
+            results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print(f"rows: {args.rows}")
+    for mode in ("legacy", "current"):
+        print(f"{mode:>8}: peak RSS {results[mode]['peak_rss_mb']:8.1f} MB | "
+              f"transformation {results[mode]['transformation_peak_mb']:8.1f} MB | "
+              f"training {results[mode]['training_peak_mb']:8.1f} MB")
+
+    if args.output:
+        with open(args.output, "w") as file_obj:
+            json.dump(results, file_obj, indent=2)
+
+
+if __name__ == "__main__":
+    main()
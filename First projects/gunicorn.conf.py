@@ -0,0 +1,33 @@
+"""
+Gunicorn settings for production serving:
+
+    gunicorn --config gunicorn.conf.py application:application
+
+Sizing comes from the environment:
+    PORT               port to bind (default 8000)
+    WEB_CONCURRENCY    number of worker processes (default: one per core)
+    GUNICORN_THREADS   threads per worker (default 4)
+    GUNICORN_TIMEOUT   seconds before a silent worker is restarted (default 60)
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+
+# Import application.py (and load the artifacts) in the master, then fork the workers
+preload_app = True
+
+accesslog = "-"
+
+
+def when_ready(server):
+    # Everything allocated so far (model, preprocessor, imported modules) moves to a permanent
+    # GC generation: the workers' collector no longer touches those objects, so their pages
+    # stay shared with the master instead of being copied on write
+    gc.freeze()
+    server.log.info(f"Froze {gc.get_freeze_count()} preloaded objects before forking workers")
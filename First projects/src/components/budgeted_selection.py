@@ -0,0 +1,288 @@
+import math
+import os
+import sys
+from dataclasses import dataclass
+
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import stage
+from src.utils import evaluate_models
+
+
+@dataclass
+class BudgetedSelectionConfig:
+    """
+    Settings for the budgeted model selection.
+    MODEL_TIME_BUDGET_SECONDS caps the fitting time of each candidate, learning curve included.
+    """
+    # Slices of the fitting rows the learning curve is measured on, before the full fit
+    curve_fractions: tuple = (0.1, 0.3)
+    # Seconds of fitting (and validation predictions) each candidate may use
+    time_budget_seconds: float = float(os.environ.get("MODEL_TIME_BUDGET_SECONDS", "60"))
+    # Most boosting rounds a booster may use; early stopping usually ends it sooner
+    max_boosting_rounds: int = 1000
+    # Rounds without a better validation score before a booster stops
+    early_stopping_rounds: int = 20
+    # Slack added to a candidate's extrapolated R2 before it is compared with the best
+    prune_tolerance: float = 0.01
+    # An ensemble is not cut below this many trees/rounds to fit in its budget (it is dropped instead)
+    min_estimators: int = 8
+    # Part of the training data held out for early stopping and the learning curve
+    validation_size: float = 0.2
+    random_state: int = 42
+    # Forwarded to evaluate_models
+    n_jobs: int = -1
+    parallel_backend: str = "process"
+
+
+# Boosters that support early stopping on an eval_set, and their rounds parameter (with its default)
+BOOSTERS = {"XGBRegressor": ("n_estimators", 100), "CatBoostRegressor": ("iterations", 1000)}
+
+
+def _rounds_param(model_obj):
+    """
+    (parameter, value) of the number of trees/rounds for ensembles, None for other estimators.
+    """
+    model_class = type(model_obj).__name__
+    if model_class == "CatBoostRegressor":
+        # CatBoost only lists explicitly set params
+        return "iterations", model_obj.get_param("iterations") or BOOSTERS[model_class][1]
+    params = model_obj.get_params()
+    if "n_estimators" in params:
+        return "n_estimators", params["n_estimators"] or BOOSTERS.get(model_class, (None, 100))[1]
+    return None
+
+
+def _best_rounds(model_obj):
+    # Number of rounds up to and including the best validation score
+    if type(model_obj).__name__ == "CatBoostRegressor":
+        return model_obj.get_best_iteration() + 1
+    return model_obj.best_iteration + 1
+
+
+class BudgetedModelSelection:
+    """
+    Cheaper alternative to fitting every candidate on all rows with evaluate_models:
+    - each candidate is first fitted on growing slices of the training data (10%, 30% of it)
+      and scored on a validation split: its learning curve,
+    - a candidate whose curve, extrapolated optimistically to the full data, stays below the
+      best validation R2 at that point is dropped without ever being fitted on every row,
+    - XGBoost / CatBoost stop early on the validation split, and their full fit uses the
+      number of rounds that was best on the largest slice,
+    - every candidate has a time budget: the cost of its next fit is predicted from the last
+      one, ensembles are given fewer trees to fit in what is left, other estimators are dropped,
+    - CatBoost does not write its catboost_info/ training files.
+    The survivors are then fitted on all training rows and scored on the test set.
+    """
+    def __init__(self, config: BudgetedSelectionConfig = None):
+        self.selection_config = config or BudgetedSelectionConfig()
+
+    def _prepare(self, model_obj, rounds=None, early_stopping=False):
+        """
+        Unfitted copy of a candidate, optionally with another number of rounds and with early stopping.
+        """
+        model_obj = clone(model_obj)
+        model_class = type(model_obj).__name__
+        if model_class == "CatBoostRegressor":
+            model_obj.set_params(allow_writing_files=False)
+        if rounds is not None:
+            model_obj.set_params(**{_rounds_param(model_obj)[0]: rounds})
+        if early_stopping:
+            model_obj.set_params(early_stopping_rounds=self.selection_config.early_stopping_rounds)
+        return model_obj
+
+    def _fit_params(self, model_obj, X_val, y_val):
+        # Validation split that boosters monitor for early stopping
+        if type(model_obj).__name__ == "XGBRegressor":
+            return {"eval_set": [(X_val, y_val)], "verbose": False}
+        return {"eval_set": (X_val, y_val)}
+
+    def _within_budget(self, model_name, model_obj, rounds, predicted_seconds, remaining_seconds):
+        """
+        Returns (estimator, rounds) fitting in the remaining budget, or (None, None) to drop it.
+        The cost of a fit is taken as proportional to its rows and its rounds.
+        """
+        if predicted_seconds is None or predicted_seconds <= remaining_seconds:
+            return model_obj, rounds
+        if rounds is not None:
+            budget_rounds = int(rounds * max(remaining_seconds, 0.0) / predicted_seconds)
+            if budget_rounds >= self.selection_config.min_estimators:
+                logging.info(
+                    f"{model_name}: {rounds} -> {budget_rounds} rounds to stay within its time budget"
+                )
+                return model_obj.set_params(**{_rounds_param(model_obj)[0]: budget_rounds}), budget_rounds
+        return None, None
+
+    def _upper_bound(self, curve, n_rows):
+        """
+        Optimistic R2 at n_rows: the last slope of the learning curve (per doubling of the data)
+        continued to n_rows. Learning curves flatten as data grows, so the true score is lower.
+        """
+        (n_prev, r2_prev), (n_last, r2_last) = curve[-2], curve[-1]
+        slope = max(0.0, (r2_last - r2_prev) / math.log2(n_last / n_prev))
+        return min(1.0, r2_last + slope * math.log2(n_rows / n_last) + self.selection_config.prune_tolerance)
+
+    @stage("budgeted_selection")
+    def initiate_budgeted_selection(self, models, X_train, y_train, X_test, y_test, cache=None):
+        """
+        Input: the {model_name: estimator} dictionary and the training / test data
+               cache: optional StageCache used for the final fits
+        Output: {model_name: test R2} of the candidates that were not dropped, in the order of
+                `models`; their fitted estimators are written back into `models`
+        """
+        try:
+            config = self.selection_config
+            X_fit, X_val, y_fit, y_val = train_test_split(
+                X_train, y_train, test_size=config.validation_size, random_state=config.random_state
+            )
+            n_final = len(y_train)
+
+            # Per candidate: rounds to use (None if not an ensemble), seconds spent,
+            # (rows, rounds, seconds) of the last fit, and learning curve points (rows, validation R2)
+            # Boosters also keep slice_rounds: the cap every slice starts from (early stopping
+            # ends it sooner), so a small slice's best iteration never limits a larger one
+            rounds, slice_rounds = {}, {}
+            for model_name, model_obj in models.items():
+                rounds_param = _rounds_param(model_obj)
+                rounds[model_name] = rounds_param[1] if rounds_param else None
+                if type(model_obj).__name__ in BOOSTERS:
+                    rounds[model_name] = min(rounds[model_name], config.max_boosting_rounds)
+                    slice_rounds[model_name] = rounds[model_name]
+            spent = {model_name: 0.0 for model_name in models}
+            last_fit = {}
+            curves = {model_name: [] for model_name in models}
+            dropped = {}
+
+            def predicted_seconds(model_name, n_rows, n_rounds):
+                if model_name not in last_fit:
+                    return None
+                last_rows, last_rounds, last_seconds = last_fit[model_name]
+                scale = n_rows / last_rows
+                if n_rounds is not None and last_rounds:
+                    scale *= n_rounds / last_rounds
+                return last_seconds * scale
+
+            # 1. Learning curve: fit the remaining candidates on growing slices of the fitting rows
+            for fraction in config.curve_fractions:
+                n_rows = max(2, int(len(y_fit) * fraction))
+                estimators, fit_params = {}, {}
+                for model_name, model_obj in models.items():
+                    if model_name in dropped:
+                        continue
+                    is_booster = type(model_obj).__name__ in BOOSTERS
+                    start_rounds = slice_rounds[model_name] if is_booster else rounds[model_name]
+                    # Cost estimate: a booster is expected to stop about where it stopped on the last slice
+                    expected_rounds = start_rounds
+                    if is_booster and model_name in last_fit:
+                        expected_rounds = min(start_rounds, rounds[model_name] + config.early_stopping_rounds)
+                    estimator, n_rounds = self._within_budget(
+                        model_name,
+                        self._prepare(model_obj, start_rounds, early_stopping=is_booster),
+                        expected_rounds,
+                        predicted_seconds(model_name, n_rows, expected_rounds),
+                        config.time_budget_seconds - spent[model_name],
+                    )
+                    if estimator is None:
+                        dropped[model_name] = "time budget"
+                        continue
+                    if n_rounds != expected_rounds:
+                        # Cut to fit the budget: the cap stays lowered, later slices cost more
+                        start_rounds = n_rounds
+                        if is_booster:
+                            slice_rounds[model_name] = n_rounds
+                    rounds[model_name] = start_rounds
+                    estimators[model_name] = estimator
+                    if is_booster:
+                        fit_params[model_name] = self._fit_params(estimator, X_val, y_val)
+
+                if not estimators:
+                    break
+
+                # Boosters are scored on the split they stopped on, which flatters them slightly;
+                # this only decides what gets a full fit, the final comparison is on the test set
+                timings = {}
+                scores = evaluate_models(
+                    X_train=X_fit[:n_rows], y_train=y_fit[:n_rows], X_test=X_val, y_test=y_val,
+                    models=estimators,
+                    n_jobs=config.n_jobs,
+                    backend=config.parallel_backend,
+                    fit_params=fit_params,
+                    timings=timings
+                )
+
+                for model_name, estimator in estimators.items():
+                    seconds = timings[model_name]["fit"]["wall_seconds"] + timings[model_name]["predict"]["wall_seconds"]
+                    spent[model_name] += seconds
+                    curves[model_name].append((n_rows, scores[model_name]))
+                    trained_rounds = rounds[model_name]
+                    if model_name in fit_params:
+                        # Only the last slice's best iteration is carried to the full fit;
+                        # the slice also trained the patience rounds after it
+                        rounds[model_name] = _best_rounds(estimator)
+                        trained_rounds = min(trained_rounds, rounds[model_name] + config.early_stopping_rounds)
+                    last_fit[model_name] = (n_rows, trained_rounds, seconds)
+
+                # 2. Drop the candidates whose extrapolated curve cannot reach the current best
+                best_score = max(scores.values())
+                for model_name in estimators:
+                    if len(curves[model_name]) < 2:
+                        continue
+                    upper_bound = self._upper_bound(curves[model_name], n_final)
+                    if upper_bound < best_score:
+                        dropped[model_name] = f"learning curve (at most {upper_bound:.4f} < {best_score:.4f})"
+
+                logging.info(
+                    f"Learning curve on {n_rows} rows: "
+                    + ", ".join(f"{model_name} {score:.4f}" for model_name, score in scores.items())
+                )
+
+            # 3. Fit the survivors on every training row, within what is left of their budget
+            finals = {}
+            for model_name, model_obj in models.items():
+                if model_name in dropped:
+                    continue
+                estimator, n_rounds = self._within_budget(
+                    model_name,
+                    self._prepare(model_obj, rounds[model_name]),
+                    rounds[model_name],
+                    predicted_seconds(model_name, n_final, rounds[model_name]),
+                    config.time_budget_seconds - spent[model_name],
+                )
+                if estimator is None:
+                    dropped[model_name] = "time budget"
+                    continue
+                finals[model_name] = estimator
+
+            if not finals:
+                # Every candidate ran out of budget: the best on the learning curve still gets its full fit
+                model_name = max(
+                    (name for name in models if curves[name]), key=lambda name: curves[name][-1][1]
+                )
+                logging.warning(f"No candidate fits in its time budget; fitting {model_name} anyway")
+                dropped.pop(model_name)
+                finals[model_name] = self._prepare(models[model_name], rounds[model_name])
+
+            for model_name, reason in dropped.items():
+                logging.info(f"Dropped {model_name}: {reason}")
+
+            scores = evaluate_models(
+                X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
+                models=finals,
+                n_jobs=config.n_jobs,
+                backend=config.parallel_backend,
+                cache=cache
+            )
+
+            # Same order as the input dictionary
+            report = {}
+            for model_name in models:
+                if model_name in finals:
+                    models[model_name] = finals[model_name]
+                    report[model_name] = scores[model_name]
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
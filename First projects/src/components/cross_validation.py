@@ -0,0 +1,203 @@
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.model_selection import KFold
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import record_measurements, stage
+from src.utils import _fit_and_score, _limit_estimator_threads, load_array, save_array
+
+
+@dataclass
+class CrossValidationConfig:
+    """
+    Settings for the k-fold cross-validated model selection.
+    CV_FOLDS sets the number of folds.
+    """
+    n_splits: int = int(os.environ.get("CV_FOLDS", "5"))
+    random_state: int = 42
+    # The training matrices are written here once per run (in a sub-directory named after
+    # the hash of the data) and memory-mapped by every fit; removed when the run is over
+    fold_dir: str = os.path.join("artifacts", "cv_folds")
+    # (model, fold) fits run at the same time (1 = serial, -1 = one per core)
+    n_jobs: int = -1
+    # "process" sidesteps the GIL for pure-Python estimators; "thread" shares the memory maps directly
+    parallel_backend: str = "process"
+
+
+def _score_fold(model_obj, data, fold, max_threads=None):
+    """
+    Fits one candidate on one fold and returns (validation R2, timings).
+    data holds the paths of the X / y .npy files (or the sparse matrix itself) and fold the
+    (fit rows, validation rows) index arrays: the files are opened memory-mapped, so the
+    parallel workers share the page cache and only the indices are pickled for each task.
+    Module-level so it can be sent to a worker process.
+    """
+    X, y = (load_array(data[name]) if isinstance(data[name], str) else data[name] for name in ("X", "y"))
+    fit_rows, val_rows = fold
+    _, score, timings = _fit_and_score(
+        model_obj, X[fit_rows], y[fit_rows], X[val_rows], y[val_rows], max_threads=max_threads
+    )
+    return score, timings
+
+
+class CrossValidation:
+    """
+    K-fold alternative to scoring every candidate on the single train/test split:
+    - the transformed training data is written once as .npy files and reopened memory-mapped
+      (read-only) by every fit; sparse matrices stay in memory,
+    - the fold indices are drawn once and each fit slices its rows out of the shared data,
+    - every (model, fold) pair is an independent fit, so all of them are spread over one
+      worker pool rather than fitting the folds of a model one after the other,
+    - each candidate gets its mean and standard deviation of R2 over the folds.
+    The test set is not used, so it stays an unbiased check of the model that is picked.
+    """
+    def __init__(self, config: CrossValidationConfig = None):
+        self.cv_config = config or CrossValidationConfig()
+
+    def data_dir(self, data_key):
+        return os.path.join(self.cv_config.fold_dir, data_key)
+
+    def make_folds(self, X_train, y_train, data_dir):
+        """
+        Input: the training data and the directory to write it to
+        Output: (data, folds)
+                data: {"X", "y"}, the path of the .npy file (dense) or the matrix itself (sparse)
+                folds: one (fit rows, validation rows) pair of index arrays per fold
+        """
+        try:
+            config = self.cv_config
+            data = {}
+            for name, array in (("X", X_train), ("y", y_train)):
+                if sparse.issparse(array):
+                    data[name] = array
+                else:
+                    file_path = os.path.join(data_dir, f"{name}_train.npy")
+                    save_array(file_path, np.ascontiguousarray(array))
+                    data[name] = file_path
+
+            splitter = KFold(n_splits=config.n_splits, shuffle=True, random_state=config.random_state)
+            # Rows in file order: slicing the memory-mapped data then reads it sequentially
+            folds = [
+                (np.sort(fit_rows), np.sort(val_rows))
+                for fit_rows, val_rows in splitter.split(np.zeros(len(y_train)))
+            ]
+
+            logging.info(f"Wrote {len(y_train)} training rows for {config.n_splits} cross-validation folds to {data_dir}")
+            return data, folds
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def cross_validate(self, models, data, folds):
+        """
+        Input: the {model_name: estimator} dictionary and the (data, folds) output of make_folds
+        Output: {model_name: {"mean_r2", "std_r2", "fold_r2"}}, in the order of `models`
+        The estimators in `models` are not fitted (each fold fits its own copy).
+        """
+        try:
+            config = self.cv_config
+            tasks = [(model_name, fold_index) for model_name in models for fold_index in range(len(folds))]
+
+            n_cpus = os.cpu_count() or 1
+            n_workers = min(len(tasks), n_cpus if config.n_jobs is None or config.n_jobs < 0 else config.n_jobs)
+            # Split the cores between the workers so that n_workers * threads_per_fit never exceeds the machine
+            threads_per_fit = max(1, n_cpus // n_workers) if n_workers > 1 else None
+
+            def candidate(model_name):
+                model_obj = clone(models[model_name])
+                if threads_per_fit is not None:
+                    _limit_estimator_threads(model_obj, threads_per_fit)
+                return model_obj
+
+            results = {}
+            if n_workers <= 1:
+                for model_name, fold_index in tasks:
+                    results[model_name, fold_index] = _score_fold(candidate(model_name), data, folds[fold_index])
+            else:
+                if config.parallel_backend == "process":
+                    executor_class = ProcessPoolExecutor
+                elif config.parallel_backend == "thread":
+                    executor_class = ThreadPoolExecutor
+                else:
+                    raise ValueError(
+                        f"Unknown backend '{config.parallel_backend}', expected 'process' or 'thread'"
+                    )
+                with executor_class(max_workers=n_workers) as executor:
+                    # Every fold of every model is queued at once: a slow model's folds run
+                    # next to the quick ones instead of after them
+                    futures = {
+                        task: executor.submit(_score_fold, candidate(task[0]), data, folds[task[1]], threads_per_fit)
+                        for task in tasks
+                    }
+                    results = {task: future.result() for task, future in futures.items()}
+
+            # Collect in the original order so the report is deterministic
+            report = {}
+            for model_name in models:
+                fold_scores = []
+                for fold_index in range(len(folds)):
+                    score, timings = results[model_name, fold_index]
+                    fold_scores.append(score)
+                    for name, measurements in timings.items():
+                        record_measurements(name, measurements, model=model_name, fold=fold_index)
+                report[model_name] = {
+                    "mean_r2": float(np.mean(fold_scores)),
+                    "std_r2": float(np.std(fold_scores)),
+                    "fold_r2": fold_scores,
+                }
+                logging.info(
+                    f"{model_name}: cross-validated R2 {report[model_name]['mean_r2']:.4f} "
+                    f"+/- {report[model_name]['std_r2']:.4f} over {len(folds)} folds"
+                )
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @stage("cross_validation")
+    def initiate_cross_validation(self, models, X_train, y_train, cache=None):
+        """
+        Input: the {model_name: estimator} dictionary and the training data
+               cache: optional StageCache; a model whose data, folds and hyperparameters are
+                      unchanged since a previous run is not cross-validated again
+        Output: {model_name: {"mean_r2", "std_r2", "fold_r2"}}, in the order of `models`
+        """
+        try:
+            from src.stage_cache import StageCache, hash_array, hash_estimator
+
+            config = self.cv_config
+            data_key = (hash_array(X_train), hash_array(y_train), config.n_splits, config.random_state)
+            cache_keys, cached = {}, {}
+            if cache is not None:
+                for model_name, model_obj in models.items():
+                    cache_keys[model_name] = StageCache.key(data_key, hash_estimator(model_obj))
+                    result = cache.get("cross_validation", cache_keys[model_name])
+                    if result is not None:
+                        cached[model_name] = result
+
+            to_validate = {model_name: model_obj for model_name, model_obj in models.items() if model_name not in cached}
+            report = {}
+            if to_validate:
+                # Keyed by the data, so two runs on different data never share (or delete) each other's files
+                data_dir = self.data_dir(StageCache.key(*data_key[:2])[:16])
+                try:
+                    report = self.cross_validate(to_validate, *self.make_folds(X_train, y_train, data_dir))
+                finally:
+                    shutil.rmtree(data_dir, ignore_errors=True)
+                for model_name in to_validate:
+                    if cache is not None:
+                        cache.put("cross_validation", cache_keys[model_name], report[model_name])
+
+            # Same order as the input dictionary
+            return {model_name: cached.get(model_name) or report[model_name] for model_name in models}
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -2,6 +2,9 @@ import os
 import sys
 from src.exception import CustomException
 from src.logger import logging
+from src.instrumentation import record_rows, stage
+from src.stage_cache import StageCache, hash_file
+from src.utils import save_dataframe
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
@@ -22,12 +25,31 @@ class DataIngestionConfig:
     train_data_path: str = os.path.join('artifacts', "train.csv")
     test_data_path: str = os.path.join('artifacts', "test.csv")
     raw_data_path: str = os.path.join('artifacts', "data.csv")
+    # Source dataset and split settings (part of the stage cache key)
+    source_data_path: str = os.path.join('notebook', 'data', 'stud.csv')
+    test_size: float = 0.2
+    random_state: int = 42
+    # Skip the stage when the source file and split settings are unchanged
+    use_cache: bool = True
+    # Format of the raw/train/test datasets: "csv", or the binary "parquet" / "feather"
+    # (binary formats keep the categorical columns as 'category' dtype)
+    artifact_format: str = "csv"
+
+    def __post_init__(self):
+        # Switch the file extensions to match the chosen format
+        if self.artifact_format != "csv":
+            extension = f".{self.artifact_format}"
+            self.train_data_path = os.path.splitext(self.train_data_path)[0] + extension
+            self.test_data_path = os.path.splitext(self.test_data_path)[0] + extension
+            self.raw_data_path = os.path.splitext(self.raw_data_path)[0] + extension
     
 class DataIngestion:
     def __init__(self):
         # When DataIngestion is initialized, it creates its own config object.
         self.ingestion_config = DataIngestionConfig()
+        self.stage_cache = StageCache() if self.ingestion_config.use_cache else None
         
+    @stage("data_ingestion")
     def initiate_data_ingestion(self):
         """
         Logic: 
@@ -35,30 +57,58 @@ class DataIngestion:
         """
         logging.info("Entered the data ingestion method or components")
         try:
+            config = self.ingestion_config
+            output_paths = (config.raw_data_path, config.train_data_path, config.test_data_path)
+
+            # Step 1. Stage cache: the outputs depend only on the source content and the split settings
+            if self.stage_cache is not None:
+                cache_key = StageCache.key(
+                    hash_file(config.source_data_path), config.test_size, config.random_state, output_paths
+                )
+                # The cache stores the hashes of the files we wrote; skip if they are still on disk unchanged
+                output_hashes = self.stage_cache.get("data_ingestion", cache_key)
+                if output_hashes is not None and all(
+                    os.path.exists(path) and hash_file(path) == file_hash
+                    for path, file_hash in output_hashes.items()
+                ):
+                    logging.info("Data ingestion inputs unchanged, reusing the existing split")
+                    return (
+                        config.train_data_path,
+                        config.test_data_path,
+                    )
+
             # Step 2. Reading the dataset
             # You can change this to read from a Database (MongoDB/SQL) or a Cloud URL.
-            df = pd.read_csv("notebook/data/stud.csv")
+            df = pd.read_csv(config.source_data_path)
             logging.info("Successfully read the dataset as a dataframe")
+            record_rows(len(df))
             
             # Step 3. Directory Creation
             # os.makedirs ensures the 'artifacts' folder exists before we try to save files into it.
             # exist_ok=True prevents errors if the folder already exists.
             os.makedirs(os.path.dirname(self.ingestion_config.train_data_path), exist_ok=True)
+
+            # Binary formats store the text columns as categories (smaller files, no re-parsing)
+            if config.artifact_format != "csv":
+                df = df.astype({col: "category" for col in df.select_dtypes(include="object").columns})
             
             # Save the full, unsplit data to the 'raw_data_path' (artifacts/data.csv)
-            df.to_csv(self.ingestion_config.raw_data_path, index=False, header=True)
+            save_dataframe(df, self.ingestion_config.raw_data_path)
             
             # Step 4. Train-Test Split
             # Splitting 80% for training and 20% for testing.
             logging.info("Train test split initiated")
-            train_set, test_set = train_test_split(df, test_size=0.2, random_state=42)
+            train_set, test_set = train_test_split(df, test_size=config.test_size, random_state=config.random_state)
             
             # Step 5. Exporting split datasets
             # Saving the processed splits so the 'Data Transformation' component can access them.
-            train_set.to_csv(self.ingestion_config.train_data_path, index=False, header=True)
-            test_set.to_csv(self.ingestion_config.test_data_path, index=False, header=True)
+            save_dataframe(train_set, self.ingestion_config.train_data_path)
+            save_dataframe(test_set, self.ingestion_config.test_data_path)
             
             logging.info("Ingestion of the data is completed")
+
+            if self.stage_cache is not None:
+                self.stage_cache.put("data_ingestion", cache_key, {path: hash_file(path) for path in output_paths})
             
             # Return the file paths to be used by the DataTransformation component
             return (
@@ -78,10 +128,10 @@ if __name__=="__main__":
     
     # STAGE 2: Data Transformation (Handling missing values, Scaling, Encoding)
     data_transformation = DataTransformation()
-    # This returns NumPy arrays (train_arr, test_arr) which are ready for Model Training
-    train_arr, test_arr, _ = data_transformation.initiate_data_transformation(train_data, test_data)
+    # This returns features and targets separately, ready for Model Training
+    X_train, y_train, X_test, y_test, _ = data_transformation.initiate_data_transformation(train_data, test_data)
     
     # STAGE 3: Model Training
     # Passing the arrays into the ModelTrainer class we defined earlier
     modeltrainer = ModelTrainer()
-    print(modeltrainer.initiate_model_trainer(train_arr, test_arr))
\ No newline at end of file
+    print(modeltrainer.initiate_model_trainer(X_train, y_train, X_test, y_test))
\ No newline at end of file
@@ -3,7 +3,7 @@ import sys
 from dataclasses import dataclass
 
 import numpy as np 
-import pandas as pd     
+from scipy import sparse
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
@@ -11,18 +11,39 @@ from sklearn.preprocessing import OneHotEncoder, StandardScaler
 
 from src.exception import CustomException
 from src.logger import logging
-from src.utils import save_object
+from src.instrumentation import record_rows, stage
+from src.pipeline.drift_monitor import DriftMonitorConfig, DriftReference
+from src.stage_cache import StageCache, hash_estimator, hash_file
+from src.utils import load_dataframe, save_array, save_object
 
 @dataclass
 class DataTransformationConfig:
-    # Path where the preprocessing pickle (.pkl) file will be saved
-    preprocessor_obj_file_path = os.path.join('artifacts', "preprocessor.pkl")
+    # Path where the preprocessing pickle (.pkl) file will be saved. It is staged: the served
+    # artifacts/preprocessor.pkl is only replaced, together with the model, by publish_artifacts
+    preprocessor_obj_file_path = os.path.join('artifacts', 'staging', "preprocessor.pkl")
+    # Bin counts of the training rows, compared with the served traffic by the drift monitor.
+    # Staged too: publish_artifacts stamps it with the version of the model it goes with
+    drift_reference_file_path = os.path.join('artifacts', 'staging', "drift_reference.json")
+    # Skip refitting when the train/test files and the transformer definition are unchanged
+    use_cache: bool = True
+    # Features are handed to the trainer as C-contiguous float32 (half the memory of float64)
+    feature_dtype: str = "float32"
+    # Keep the features as a sparse CSR matrix when their overall density is below this
+    # (i.e. when one-hot encoding makes the matrix wide); same meaning as ColumnTransformer.sparse_threshold
+    sparse_threshold: float = 0.3
+    # "npy": write features/targets as .npy files and hand them on memory-mapped; None: keep them in memory
+    array_format: str = None
+    X_train_file_path = os.path.join('artifacts', "X_train.npy")
+    y_train_file_path = os.path.join('artifacts', "y_train.npy")
+    X_test_file_path = os.path.join('artifacts', "X_test.npy")
+    y_test_file_path = os.path.join('artifacts', "y_test.npy")
     
 class DataTransformation:
     def __init__(self):
         # FIXED: Pointed to DataTransformationConfig instead of DataTransformation
         # (This avoids the infinite recursion loop error)
         self.data_transformation_config = DataTransformationConfig()
+        self.stage_cache = StageCache() if self.data_transformation_config.use_cache else None
         
     def get_data_transformer_objects(self):
         '''
@@ -70,53 +91,119 @@ class DataTransformation:
         except Exception as e:
             raise CustomException(e, sys)
         
+    def _persist_arrays(self, X_train, y_train, X_test, y_test):
+        """
+        With array_format="npy", writes the dense arrays to disk and returns read-only
+        memory-mapped views of them, so later stages open them without a copy.
+        Sparse feature matrices stay in memory (they are already compact).
+        """
+        config = self.data_transformation_config
+        if config.array_format is None:
+            return X_train, y_train, X_test, y_test
+        if config.array_format != "npy":
+            raise ValueError(f"Unsupported array format '{config.array_format}', expected 'npy' or None")
+
+        if not sparse.issparse(X_train):
+            X_train = save_array(config.X_train_file_path, X_train)
+            X_test = save_array(config.X_test_file_path, X_test)
+        return (
+            X_train,
+            save_array(config.y_train_file_path, y_train),
+            X_test,
+            save_array(config.y_test_file_path, y_test),
+        )
+
+    def _as_model_input(self, features):
+        """
+        Converts the preprocessor output to what the models train on:
+        a CSR matrix if the ColumnTransformer chose sparse output, otherwise a
+        C-contiguous array, both in feature_dtype. Done in place when possible.
+        """
+        dtype = self.data_transformation_config.feature_dtype
+        if sparse.issparse(features):
+            return features.tocsr().astype(dtype, copy=False)
+        return np.ascontiguousarray(features, dtype=dtype)
+
+    @stage("data_transformation")
     def initiate_data_transformation(self, train_path, test_path):
+        """
+        Output: (X_train, y_train, X_test, y_test, preprocessor_path)
+        Features and target are kept apart: the features are a C-contiguous float32 matrix
+        (or CSR when the one-hot block makes it wide and sparse), the target a 1-D float64 array,
+        so no [features | target] matrix is ever built and sliced back apart.
+        """
         try:
-            # Read the CSV files generated in the Ingestion stage
-            train_df = pd.read_csv(train_path)
-            test_df = pd.read_csv(test_path)
-            
-            logging.info("Reading of the train and test is completed")
+            config = self.data_transformation_config
             logging.info("Obtaining preprocessing objects")
             
             preprocessing_obj = self.get_data_transformer_objects()
+            preprocessing_obj.set_params(sparse_threshold=config.sparse_threshold)
             
             target_column_name = "math_score"
+
+            # Stage cache: the outputs depend on both input files, the (unfitted) transformer,
+            # the target and the output dtype
+            if self.stage_cache is not None:
+                cache_key = StageCache.key(
+                    hash_file(train_path), hash_file(test_path), hash_estimator(preprocessing_obj),
+                    target_column_name, config.feature_dtype, DriftMonitorConfig().n_bins
+                )
+                cached = self.stage_cache.get("data_transformation", cache_key)
+                if cached is not None:
+                    logging.info("Data transformation inputs unchanged, reusing the fitted preprocessor and arrays")
+                    X_train, y_train, X_test, y_test, preprocessing_obj, drift_reference = cached
+                    save_object(
+                        file_path = config.preprocessor_obj_file_path,
+                        obj = preprocessing_obj
+                    )
+                    drift_reference.save(config.drift_reference_file_path)
+                    return (
+                        *self._persist_arrays(X_train, y_train, X_test, y_test),
+                        config.preprocessor_obj_file_path,
+                    )
+
+            # Read the datasets generated in the Ingestion stage (CSV, Parquet or Feather)
+            train_df = load_dataframe(train_path)
+            test_df = load_dataframe(test_path)
+            record_rows(len(train_df) + len(test_df))
+            
+            logging.info("Reading of the train and test is completed")
             
             # Separate Features (X) and Target (y) for both train and test
             input_feature_train_df = train_df.drop(columns=[target_column_name], axis=1)
-            target_feature_train_df = train_df[target_column_name]
+            y_train = train_df[target_column_name].to_numpy(dtype=np.float64)
             
             input_feature_test_df = test_df.drop(columns=[target_column_name], axis=1)
-            target_feature_test_df = test_df[target_column_name]
+            y_test = test_df[target_column_name].to_numpy(dtype=np.float64)
             
             logging.info("Applying preprocessing on training and testing dataframes.")
             
             # Fit and transform the training data; only transform the test data
-            input_feature_train_arr = preprocessing_obj.fit_transform(input_feature_train_df)
-            input_feature_test_arr = preprocessing_obj.transform(input_feature_test_df)
-            
-            # Concatenate the input features and target into a single array using np.c_
-            train_arr = np.c_[
-                input_feature_train_arr, np.array(target_feature_train_df)
-            ]
-            test_arr = np.c_[
-                input_feature_test_arr, np.array(target_feature_test_df)
-            ]
+            X_train = self._as_model_input(preprocessing_obj.fit_transform(input_feature_train_df))
+            X_test = self._as_model_input(preprocessing_obj.transform(input_feature_test_df))
             
             logging.info("Saving preprocessing object")
             
             # Save the preprocessor object as a pickle file for future use in prediction
             save_object(
-                file_path = self.data_transformation_config.preprocessor_obj_file_path,
+                file_path = config.preprocessor_obj_file_path,
                 obj = preprocessing_obj
             )
+
+            # The serving drift monitor compares its traffic with these counts, not with train.csv
+            drift_reference = DriftReference.from_preprocessor(preprocessing_obj).partial_fit(input_feature_train_df)
+            drift_reference.save(config.drift_reference_file_path)
+
+            if self.stage_cache is not None:
+                self.stage_cache.put(
+                    "data_transformation", cache_key,
+                    (X_train, y_train, X_test, y_test, preprocessing_obj, drift_reference)
+                )
             
             return (
-                train_arr,
-                test_arr,
-                self.data_transformation_config.preprocessor_obj_file_path,
+                *self._persist_arrays(X_train, y_train, X_test, y_test),
+                config.preprocessor_obj_file_path,
             )
         except Exception as e:
             # Always raise CustomException instead of 'pass' to catch errors
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
@@ -0,0 +1,155 @@
+import math
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, ParameterSampler, train_test_split
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import stage
+from src.stage_cache import StageCache, hash_array, hash_estimator
+from src.utils import evaluate_models
+
+
+@dataclass
+class HyperparameterSearchConfig:
+    """
+    Settings for the successive halving search.
+    Every rung keeps the best 1/eta configurations and gives them eta times more training rows.
+    """
+    # Configurations sampled per model at the first rung (the whole grid if it is smaller)
+    n_candidates: int = 27
+    # Elimination rate between rungs
+    eta: int = 3
+    # Fraction of the training rows used at the first rung
+    min_resource_fraction: float = 0.1
+    # Part of the training data held out to score configurations (the test set is never used here)
+    validation_size: float = 0.2
+    random_state: int = 42
+    # Forwarded to evaluate_models for each rung
+    n_jobs: int = -1
+    parallel_backend: str = "process"
+
+
+class HyperparameterSearch:
+    """
+    Budget-aware hyperparameter search based on successive halving over the training data fraction:
+    all sampled configurations are fitted on a small slice of the data, only the best third
+    moves on to a three times larger slice, and so on until the survivors see every row.
+    Bad configurations are therefore dropped after a cheap fit instead of a full one.
+    """
+    def __init__(self, config: HyperparameterSearchConfig = None):
+        self.search_config = config or HyperparameterSearchConfig()
+
+    def _sample_candidates(self, param_space):
+        n_grid = len(ParameterGrid(param_space))
+        if n_grid <= self.search_config.n_candidates:
+            return list(ParameterGrid(param_space))
+        return list(ParameterSampler(
+            param_space,
+            n_iter=self.search_config.n_candidates,
+            random_state=self.search_config.random_state,
+        ))
+
+    def search(self, model, param_space, X_train, y_train):
+        """
+        Input: an unfitted estimator, its search space ({param: [values]}) and the training data
+        Output: (best_params, best validation R2)
+        """
+        try:
+            config = self.search_config
+            X_fit, X_val, y_fit, y_val = train_test_split(
+                X_train, y_train, test_size=config.validation_size, random_state=config.random_state
+            )
+
+            candidates = self._sample_candidates(param_space)
+
+            # Number of rungs needed to go from min_resource_fraction to the full data
+            # (capped so that at least eta configurations are still compared at the last rung)
+            n_rungs = 1 + max(0, math.ceil(math.log(1 / config.min_resource_fraction, config.eta) - 1e-9))
+            n_rungs = min(n_rungs, max(1, math.floor(math.log(len(candidates), config.eta) + 1e-9)))
+
+            scores = {}
+            for rung in range(n_rungs):
+                # Resource of this rung: the last rung always uses all fitting rows
+                fraction = min(1.0, config.min_resource_fraction * config.eta ** rung)
+                if rung == n_rungs - 1:
+                    fraction = 1.0
+                n_rows = max(2, int(len(y_fit) * fraction))
+
+                estimators = {
+                    str(i): clone(model).set_params(**params) for i, params in enumerate(candidates)
+                }
+                scores = evaluate_models(
+                    X_train=X_fit[:n_rows], y_train=y_fit[:n_rows], X_test=X_val, y_test=y_val,
+                    models=estimators,
+                    n_jobs=config.n_jobs,
+                    backend=config.parallel_backend
+                )
+                logging.info(
+                    f"Successive halving rung {rung}: {len(candidates)} configs on {n_rows} rows, "
+                    f"best validation R2 {max(scores.values()):.4f}"
+                )
+
+                if rung < n_rungs - 1:
+                    # Keep the best 1/eta configurations for the next, bigger rung
+                    n_keep = max(1, len(candidates) // config.eta)
+                    ranking = np.argsort([-scores[str(i)] for i in range(len(candidates))], kind="stable")
+                    candidates = [candidates[i] for i in ranking[:n_keep]]
+
+            best_index = max(range(len(candidates)), key=lambda i: scores[str(i)])
+            return candidates[best_index], scores[str(best_index)]
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def initiate_hyperparameter_search(self, models, params, X_train, y_train, cache=None):
+        """
+        Input: the {model_name: estimator} dictionary and {model_name: search space}
+               cache: optional StageCache; a search whose data, estimator and space are unchanged is skipped
+        Output: {model_name: best_params}; the estimators in `models` are replaced by
+                unfitted copies configured with their best parameters
+        """
+        try:
+            best_params = {}
+            data_key = (hash_array(X_train), hash_array(y_train)) if cache is not None else None
+
+            for model_name, model_obj in models.items():
+                param_space = params.get(model_name)
+                if not param_space:
+                    # Nothing to tune (e.g. Linear Regression): keep the defaults
+                    best_params[model_name] = {}
+                    continue
+
+                cached = None
+                if cache is not None:
+                    config = self.search_config
+                    # n_jobs / backend don't change the result, so they are not part of the key
+                    search_settings = (
+                        config.n_candidates, config.eta, config.min_resource_fraction,
+                        config.validation_size, config.random_state
+                    )
+                    cache_key = StageCache.key(
+                        data_key, hash_estimator(model_obj), sorted(param_space.items()), search_settings
+                    )
+                    cached = cache.get("hyperparameter_search", cache_key)
+
+                if cached is not None:
+                    model_params, model_score = cached
+                else:
+                    with stage("successive_halving", estimator=model_name):
+                        model_params, model_score = self.search(model_obj, param_space, X_train, y_train)
+                    if cache is not None:
+                        cache.put("hyperparameter_search", cache_key, (model_params, model_score))
+
+                logging.info(f"Best params for {model_name}: {model_params} (validation R2 {model_score:.4f})")
+
+                models[model_name] = clone(model_obj).set_params(**model_params)
+                best_params[model_name] = model_params
+
+            return best_params
+
+        except Exception as e:
+            raise CustomException(e, sys)
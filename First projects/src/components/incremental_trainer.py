@@ -0,0 +1,452 @@
+import hashlib
+import io
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import record_rows, stage
+from src.utils import load_dataframe, load_object, save_object
+
+from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+from src.components.data_transformation import DataTransformation
+from src.components.model_exporter import ModelExporter
+from src.components.model_trainer import ModelTrainer, ModelTrainerConfig
+from src.components.prediction_table import PredictionTableBuilder
+from src.components.streaming_ingestion import StreamingDataIngestion
+from src.components.streaming_transformation import StreamingStatistics
+from src.pipeline.artifact_registry import ArtifactRegistryConfig, publish_artifacts, published_version
+from src.pipeline.drift_monitor import DriftReference, population_stability_index
+
+
+@dataclass
+class IncrementalTrainingConfig:
+    """
+    When an incremental update is allowed, and how much a model is extended by one.
+    FULL_RETRAIN_INTERVAL_HOURS / MAX_INCREMENTAL_UPDATES set the full-retrain schedule.
+    """
+    state_file_path: str = os.path.join('artifacts', "incremental_state.pkl")
+    source_data_path: str = os.path.join('notebook', 'data', 'stud.csv')
+    trained_model_file_path: str = os.path.join('artifacts', "model.pkl")
+    preprocessor_obj_file_path: str = os.path.join('artifacts', "preprocessor.pkl")
+    # The updated model is staged here next to a copy of the (unchanged) preprocessor, so the
+    # bundle / table are built from the staged pair before it is published
+    staged_model_file_path: str = os.path.join('artifacts', 'staging', "model.pkl")
+    staged_preprocessor_obj_file_path: str = os.path.join('artifacts', 'staging', "preprocessor.pkl")
+    # The served drift reference extended with the new training rows, published with the model
+    staged_drift_reference_file_path: str = os.path.join('artifacts', 'staging', "drift_reference.json")
+    target_column_name: str = "math_score"
+    # Schedule: a full retrain at least this often, and after this many incremental updates
+    full_retrain_interval_hours: float = float(os.environ.get("FULL_RETRAIN_INTERVAL_HOURS", "168"))
+    max_incremental_updates: int = int(os.environ.get("MAX_INCREMENTAL_UPDATES", "50"))
+    # Drift: population stability index of any feature, rows appended since the last full
+    # retrain vs the rows the preprocessor was fitted on (0.2 is the usual 'significant shift')
+    psi_threshold: float = 0.2
+    # Performance: an update scoring this much R2 below the last full retrain is rejected
+    max_score_drop: float = 0.05
+    # Fewest test rows (held-out rows so far + appended ones) the updated model is checked on
+    # before it is published (fewer: full retrain)
+    min_eval_rows: int = 30
+    # Extra boosting rounds (XGBoost / CatBoost) and extra trees (warm_start ensembles) per update
+    boosting_rounds: int = 50
+    warm_start_estimators: int = 10
+
+
+def feature_psi(baseline: StreamingStatistics, current: StreamingStatistics, n_bins=10):
+    """
+    PSI per feature column: categories as they are, numbers in n_bins equal-width bins
+    over the baseline range (values outside it fall in the edge bins).
+    """
+    psi = {}
+    for col in baseline.categorical_columns:
+        categories = sorted(set(baseline.value_counts[col]) | set(current.value_counts[col]))
+        psi[col] = population_stability_index(
+            [baseline.value_counts[col][c] for c in categories],
+            [current.value_counts[col][c] for c in categories],
+        )
+    for col in baseline.numerical_columns:
+        values = list(baseline.value_counts[col])
+        edges = np.linspace(min(values), max(values), n_bins + 1)
+
+        def binned(counts):
+            keys = np.clip(np.fromiter(counts.keys(), dtype=np.float64), edges[0], edges[-1])
+            return np.histogram(keys, bins=edges, weights=np.fromiter(counts.values(), dtype=np.float64))[0]
+
+        psi[col] = population_stability_index(binned(baseline.value_counts[col]), binned(current.value_counts[col]))
+    return psi
+
+
+class LinearSufficientStatistics:
+    """
+    Running n, sums, X'X and X'y of the training rows. LinearRegression and Ridge only depend
+    on the data through these, so the model refitted on all rows seen so far is obtained from
+    them exactly, without rereading the data.
+    """
+    def __init__(self, n_features):
+        self.n = 0
+        self.sum_x = np.zeros(n_features)
+        self.sum_y = 0.0
+        self.xtx = np.zeros((n_features, n_features))
+        self.xty = np.zeros(n_features)
+
+    def update(self, X, y):
+        y = np.asarray(y, dtype=np.float64)
+        if sparse.issparse(X):
+            X = X.astype(np.float64)
+            self.xtx += (X.T @ X).toarray()
+            self.sum_x += np.asarray(X.sum(axis=0)).ravel()
+        else:
+            X = np.asarray(X, dtype=np.float64)
+            self.xtx += X.T @ X
+            self.sum_x += X.sum(axis=0)
+        self.xty += X.T @ y
+        self.sum_y += y.sum()
+        self.n += len(y)
+
+    def solve(self, model):
+        """
+        Sets model.coef_ / intercept_ to the fit on every row seen so far (alpha = 0 for
+        LinearRegression, with the minimum-norm solution when X'X is singular, as lstsq gives).
+        """
+        alpha = float(getattr(model, "alpha", 0.0))
+        if model.fit_intercept:
+            mean_x, mean_y = self.sum_x / self.n, self.sum_y / self.n
+            sxx = self.xtx - self.n * np.outer(mean_x, mean_x)
+            sxy = self.xty - self.n * mean_x * mean_y
+        else:
+            mean_x, mean_y = np.zeros_like(self.sum_x), 0.0
+            sxx, sxy = self.xtx, self.xty
+
+        coef = np.linalg.pinv(sxx + alpha * np.eye(len(sxx)), hermitian=True) @ sxy
+        model.coef_ = coef
+        model.intercept_ = float(mean_y - mean_x @ coef) if model.fit_intercept else 0.0
+        return model
+
+
+@dataclass
+class IncrementalState:
+    """
+    What the incremental trainer remembers between runs (artifacts/incremental_state.pkl).
+    """
+    # The part of the source already trained on: its size, SHA-256 and row count
+    source_size: int
+    source_sha256: str
+    source_rows: int
+    # Statistics of the training rows the preprocessor was fitted on (frozen until the next full retrain)
+    baseline_statistics: StreamingStatistics
+    # Same statistics for the training rows appended since, updated by every run
+    appended_statistics: StreamingStatistics
+    # Test R2 of the last full retrain
+    reference_r2: float
+    full_retrain_at: float
+    updates_since_full_retrain: int = 0
+    # Only for LinearRegression / Ridge best models
+    linear_statistics: LinearSufficientStatistics = None
+
+
+def _prefix_sha256(file_path, n_bytes):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        remaining = n_bytes
+        while remaining > 0:
+            block = file_obj.read(min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+class IncrementalTrainer:
+    """
+    Retrains on the rows appended to the source CSV since the last run, instead of rereading
+    everything and refitting every candidate:
+    - appended rows are found by comparing the size and prefix hash of the source with the state,
+    - they are split with the row-hash rule of StreamingDataIngestion and encoded with the
+      current (frozen) preprocessor; its statistics for the new rows are accumulated for drift,
+    - the best model is extended: XGBoost/CatBoost continue boosting from the saved model,
+      warm_start ensembles grow extra trees, partial_fit estimators take one more pass, and
+      LinearRegression/Ridge are re-solved exactly from running X'X / X'y.
+    A full retrain (DataIngestion -> DataTransformation -> ModelTrainer) runs instead when there
+    is no state yet, the source was rewritten, the schedule is due, the features drifted, the
+    model type can't be extended or the updated model scores too low.
+    The preprocessor itself only changes on a full retrain: the extended models were fitted on its
+    scaling, so updating it in between would shift every feature under them.
+    """
+    def __init__(self, config: IncrementalTrainingConfig = None):
+        self.incremental_training_config = config or IncrementalTrainingConfig()
+
+    # ------------------------------------------------------------------ full retrain
+
+    def _full_retrain(self, reason):
+        config = self.incremental_training_config
+        logging.info(f"Full retrain: {reason}")
+
+        ingestion = DataIngestion()
+        ingestion.ingestion_config.source_data_path = config.source_data_path
+        train_path, test_path = ingestion.initiate_data_ingestion()
+        X_train, y_train, X_test, y_test, _ = DataTransformation().initiate_data_transformation(train_path, test_path)
+        r2 = ModelTrainer().initiate_model_trainer(X_train, y_train, X_test, y_test)
+
+        # Baseline statistics: the training rows the new preprocessor was fitted on
+        train_df = load_dataframe(train_path)
+        baseline = self._new_statistics()
+        baseline.partial_fit(train_df.drop(columns=[config.target_column_name]))
+
+        linear_statistics = None
+        model = load_object(config.trained_model_file_path)
+        if self._update_strategy(model) == "normal_equations":
+            linear_statistics = LinearSufficientStatistics(X_train.shape[1])
+            linear_statistics.update(X_train, y_train)
+
+        source_size = os.path.getsize(config.source_data_path)
+        state = IncrementalState(
+            source_size=source_size,
+            source_sha256=_prefix_sha256(config.source_data_path, source_size),
+            source_rows=len(train_df) + len(load_dataframe(test_path)),
+            baseline_statistics=baseline,
+            appended_statistics=self._new_statistics(),
+            reference_r2=float(r2),
+            full_retrain_at=time.time(),
+            linear_statistics=linear_statistics,
+        )
+        save_object(config.state_file_path, state)
+        return {"mode": "full", "reason": reason, "r2": float(r2), "model": type(model).__name__}
+
+    @staticmethod
+    def _new_statistics():
+        # Same columns as the preprocessor (see StreamingDataTransformation)
+        template = DataTransformation().get_data_transformer_objects()
+        columns = {name: cols for name, _, cols in template.transformers}
+        return StreamingStatistics(columns["num_pipeline"], columns["cat_pipeline"])
+
+    # ------------------------------------------------------------------ appended rows
+
+    def _read_appended_rows(self, state):
+        """
+        Returns (rows appended after state.source_size, source size they end at), or
+        (None, None) if the trained part of the source was modified (different prefix,
+        shorter file, or the last line was extended).
+        """
+        path = self.incremental_training_config.source_data_path
+        size = os.path.getsize(path)
+        if size < state.source_size or _prefix_sha256(path, state.source_size) != state.source_sha256:
+            return None, None
+        if size == state.source_size:
+            return pd.DataFrame(), size
+
+        with open(path, "rb") as file_obj:
+            header = file_obj.readline()
+            file_obj.seek(state.source_size - 1)
+            if file_obj.read(1) != b"\n":
+                # The old last row had no line break: new bytes may continue it
+                return None, None
+            appended = file_obj.read(size - state.source_size)
+        # A row still being written (no line break yet) is left for the next run
+        complete = appended.rfind(b"\n") + 1
+        return pd.read_csv(io.BytesIO(header + appended[:complete])) if complete else pd.DataFrame(), state.source_size + complete
+
+    def _append_to_split_files(self, train_rows, test_rows):
+        # Keep artifacts/train.csv and test.csv describing all the data the model has seen
+        ingestion_config = DataIngestionConfig()
+        if ingestion_config.artifact_format != "csv":
+            return
+        for rows, path in ((train_rows, ingestion_config.train_data_path), (test_rows, ingestion_config.test_data_path)):
+            if len(rows) and os.path.exists(path):
+                rows.to_csv(path, mode="a", header=False, index=False)
+
+    # ------------------------------------------------------------------ model update
+
+    def _stage_drift_reference(self, preprocessor, train_rows):
+        """
+        The drift reference of the updated model: the one published with the model it extends,
+        plus the new training rows. None (published without one) if that one is missing or stale.
+        """
+        config = self.incremental_training_config
+        registry_config = ArtifactRegistryConfig()
+        try:
+            reference = DriftReference.from_file(
+                preprocessor, registry_config.drift_reference_file_path, version=published_version(registry_config)
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"No drift reference to extend, the update is published without one: {e}")
+            return None
+        reference.partial_fit(train_rows.drop(columns=[config.target_column_name]))
+        return reference.save(config.staged_drift_reference_file_path)
+
+    @staticmethod
+    def _update_strategy(model):
+        """
+        How a fitted model can be extended with new rows, or None if it can't.
+        """
+        model_class = type(model).__name__
+        if model_class in ("XGBRegressor", "CatBoostRegressor"):
+            return "continue_boosting"
+        if model_class in ("LinearRegression", "Ridge"):
+            return "normal_equations"
+        params = model.get_params()
+        if "warm_start" in params and "n_estimators" in params:
+            return "warm_start"
+        if hasattr(model, "partial_fit"):
+            return "partial_fit"
+        return None
+
+    def _update_model(self, model, strategy, X, y, state):
+        config = self.incremental_training_config
+        model_class = type(model).__name__
+
+        if strategy == "continue_boosting":
+            params = model.get_params()
+            if model_class == "XGBRegressor":
+                # A new estimator with the same settings, starting from the saved booster's trees
+                params["n_estimators"] = config.boosting_rounds
+                return type(model)(**params).fit(X, y, xgb_model=model.get_booster())
+            params.update(iterations=config.boosting_rounds, allow_writing_files=False)
+            return type(model)(**params).fit(X, y, init_model=model)
+
+        if strategy == "normal_equations":
+            state.linear_statistics.update(X, y)
+            return state.linear_statistics.solve(model)
+
+        if strategy == "warm_start":
+            # The extra trees are fitted on the appended rows; the existing ones are kept
+            model.set_params(warm_start=True, n_estimators=model.n_estimators + config.warm_start_estimators)
+            return model.fit(X, y)
+
+        model.partial_fit(X, y)
+        return model
+
+    # ------------------------------------------------------------------ entry point
+
+    @stage("incremental_training")
+    def initiate_incremental_training(self, force_full_retrain=False):
+        """
+        Output: a report dict, "mode" being "full", "incremental" or "unchanged"
+        """
+        try:
+            config = self.incremental_training_config
+
+            # Step 1. No state yet (first run): start from a full retrain
+            if force_full_retrain:
+                return self._full_retrain("requested")
+            if not os.path.exists(config.state_file_path):
+                return self._full_retrain("no incremental state yet")
+            state = load_object(config.state_file_path)
+            model = load_object(config.trained_model_file_path)
+            strategy = self._update_strategy(model)
+            if strategy == "normal_equations" and state.linear_statistics is None:
+                return self._full_retrain("no running statistics for the linear model")
+
+            # Step 2. Schedule
+            age_hours = (time.time() - state.full_retrain_at) / 3600
+            if age_hours >= config.full_retrain_interval_hours:
+                return self._full_retrain(f"last full retrain {age_hours:.0f} h ago")
+            if state.updates_since_full_retrain >= config.max_incremental_updates:
+                return self._full_retrain(f"{state.updates_since_full_retrain} incremental updates since the last one")
+
+            # Step 3. Appended rows only
+            new_rows, new_source_size = self._read_appended_rows(state)
+            if new_rows is None:
+                return self._full_retrain("the source was modified, not only appended to")
+            if len(new_rows) == 0:
+                logging.info("No rows appended since the last run, nothing to train")
+                return {"mode": "unchanged", "new_rows": 0}
+            record_rows(len(new_rows))
+
+            is_test = StreamingDataIngestion()._is_test_row(new_rows)
+            train_rows, test_rows = new_rows[~is_test], new_rows[is_test]
+            logging.info(f"{len(new_rows)} appended rows: {len(train_rows)} train, {len(test_rows)} test")
+
+            # Step 4. Drift of everything appended since the last full retrain
+            appended_statistics = state.appended_statistics
+            psi, worst_column = {}, None
+            if len(train_rows):
+                appended_statistics.partial_fit(train_rows.drop(columns=[config.target_column_name]))
+                psi = feature_psi(state.baseline_statistics, appended_statistics)
+                worst_column = max(psi, key=psi.get)
+                if psi[worst_column] > config.psi_threshold:
+                    return self._full_retrain(f"drift in {worst_column} (PSI {psi[worst_column]:.3f})")
+
+            # Step 5. Extend the current model with the new training rows
+            # (only test rows appended: the model is kept, the rows are still recorded below)
+            if len(train_rows) and strategy is None:
+                return self._full_retrain(f"{type(model).__name__} can't be updated incrementally")
+
+            r2 = None
+            X_check = None
+            if len(train_rows):
+                preprocessor = load_object(config.preprocessor_obj_file_path)
+                as_model_input = DataTransformation()._as_model_input
+                target = config.target_column_name
+                X_new = as_model_input(preprocessor.transform(train_rows.drop(columns=[target])))
+                y_new = train_rows[target].to_numpy(dtype=np.float64)
+                model = self._update_model(model, strategy, X_new, y_new, state)
+
+                # Step 6. Check it on the whole test set (the rows held out so far plus the
+                # appended ones) before publishing it
+                from sklearn.metrics import r2_score
+                test_path = DataIngestionConfig().test_data_path
+                check_rows = test_rows
+                if os.path.exists(test_path):
+                    check_rows = pd.concat([load_dataframe(test_path), test_rows], ignore_index=True)
+                if len(check_rows) < config.min_eval_rows:
+                    return self._full_retrain(f"only {len(check_rows)} test rows to check the updated model on")
+                X_check = as_model_input(preprocessor.transform(check_rows.drop(columns=[target])))
+                r2 = float(r2_score(check_rows[target].to_numpy(dtype=np.float64), model.predict(X_check)))
+                if r2 < state.reference_r2 - config.max_score_drop:
+                    return self._full_retrain(f"updated model R2 {r2:.3f} vs {state.reference_r2:.3f} at the last full retrain")
+
+            # Step 7. Publish: stage the pair, build the bundle (table) from it, publish it, then
+            # save the state that points past the new rows
+            if len(train_rows):
+                save_object(config.staged_model_file_path, model)
+                shutil.copyfile(config.preprocessor_obj_file_path, config.staged_preprocessor_obj_file_path)
+                staged_drift_reference_path = self._stage_drift_reference(preprocessor, train_rows)
+                model_trainer_config = ModelTrainerConfig()
+                if model_trainer_config.export_inference_bundle:
+                    ModelExporter().initiate_model_export(model, X_check=X_check)
+                if model_trainer_config.build_prediction_table:
+                    PredictionTableBuilder().initiate_prediction_table(model)
+                publish_artifacts(
+                    config.staged_model_file_path,
+                    config.staged_preprocessor_obj_file_path,
+                    staged_drift_reference_path,
+                )
+                state.updates_since_full_retrain += 1
+            self._append_to_split_files(train_rows, test_rows)
+
+            state.source_size = new_source_size
+            state.source_sha256 = _prefix_sha256(config.source_data_path, state.source_size)
+            state.source_rows += len(new_rows)
+            save_object(config.state_file_path, state)
+
+            if len(train_rows):
+                logging.info(f"Incremental update ({strategy}) of {type(model).__name__} with {len(train_rows)} rows, R2 {r2}")
+            else:
+                logging.info(f"{len(test_rows)} test rows appended, no training rows: the model is unchanged")
+            return {
+                "mode": "incremental",
+                "strategy": strategy if len(train_rows) else None,
+                "model": type(model).__name__,
+                "new_rows": len(new_rows),
+                "r2": r2,
+                "max_psi": psi[worst_column] if psi else None,
+            }
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+if __name__ == "__main__":
+    # Train on whatever was appended to the source since the last run (or retrain fully).
+    # Go through the importable module: the pickled state must reference its classes, not __main__'s
+    from src.components.incremental_trainer import IncrementalTrainer as Trainer
+    force = "--full" in sys.argv[1:]
+    print(Trainer().initiate_incremental_training(force_full_retrain=force))
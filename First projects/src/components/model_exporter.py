@@ -0,0 +1,268 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import stage
+from src.pipeline.artifact_registry import artifact_version
+from src.pipeline.fast_encoder import FastFeatureEncoder
+from src.pipeline.inference_bundle import BUNDLE_FORMAT_VERSION, InferenceBundle
+from src.utils import load_object
+
+
+@dataclass
+class ModelExporterConfig:
+    """
+    Where the fused inference bundle is written, and the files it is built from: the staged
+    pair, exported (and verified) before publish_artifacts makes it the served one. The
+    registry only serves a bundle whose version is the published one.
+    """
+    bundle_file_path = os.path.join('artifacts', "model_bundle.npz")
+    trained_model_file_path = os.path.join('artifacts', 'staging', "model.pkl")
+    preprocessor_obj_file_path = os.path.join('artifacts', 'staging', "preprocessor.pkl")
+    # Largest accepted |bundle prediction - model prediction| on the verification rows
+    tolerance: float = 1e-3
+
+
+def _flatten_sklearn_tree(tree):
+    # sklearn's Tree already stores nodes as arrays; leaves have feature == -2
+    feature = tree.feature.astype(np.int32)
+    feature[tree.children_left < 0] = -1
+    return {
+        "feature": feature,
+        "threshold": tree.threshold.astype(np.float64),
+        "left": tree.children_left.astype(np.int32),
+        "right": tree.children_right.astype(np.int32),
+        "value": tree.value[:, 0, 0].astype(np.float64),
+        "depth": int(tree.max_depth),
+    }
+
+
+def _flatten_xgboost_tree(tree_json):
+    # One tree from Booster.get_dump(dump_format="json"): nested nodes with "nodeid"
+    nodes = []
+
+    def walk(node):
+        nodes.append(node)
+        for child in node.get("children", []):
+            walk(child)
+    walk(tree_json)
+
+    n_nodes = max(node["nodeid"] for node in nodes) + 1
+    flat = {
+        "feature": np.full(n_nodes, -1, dtype=np.int32),
+        "threshold": np.zeros(n_nodes, dtype=np.float64),
+        "left": np.full(n_nodes, -1, dtype=np.int32),
+        "right": np.full(n_nodes, -1, dtype=np.int32),
+        "value": np.zeros(n_nodes, dtype=np.float64),
+        "depth": max(node.get("depth", 0) for node in nodes) + 1,
+    }
+    for node in nodes:
+        i = node["nodeid"]
+        if "leaf" in node:
+            flat["value"][i] = node["leaf"]
+        else:
+            # Features are named f0, f1, ... when the model was trained on a NumPy array
+            flat["feature"][i] = int(node["split"].lstrip("f"))
+            flat["threshold"][i] = np.float32(node["split_condition"])
+            flat["left"][i] = node["yes"]
+            flat["right"][i] = node["no"]
+    return flat
+
+
+def _flatten_oblivious_tree(tree_json):
+    """
+    CatBoost trees are oblivious: every level uses the same split, and split j sets bit j
+    of the leaf index when x > border. Unrolled here into an explicit binary tree where
+    level j tests split j, so it can share the generic traversal.
+    """
+    splits = tree_json["splits"]
+    leaf_values = tree_json["leaf_values"]
+    depth = len(splits)
+    flat = {key: [] for key in ("feature", "threshold", "left", "right", "value")}
+
+    def add_node(level, leaf_index):
+        i = len(flat["feature"])
+        for key in flat:
+            flat[key].append(0)
+        if level == depth:
+            flat["feature"][i], flat["left"][i], flat["right"][i] = -1, -1, -1
+            flat["value"][i] = leaf_values[leaf_index]
+            return i
+        flat["feature"][i] = splits[level]["float_feature_index"]
+        flat["threshold"][i] = np.float32(splits[level]["border"])
+        flat["left"][i] = add_node(level + 1, leaf_index)
+        flat["right"][i] = add_node(level + 1, leaf_index | (1 << level))
+        return i
+
+    add_node(0, 0)
+    return {
+        "feature": np.array(flat["feature"], dtype=np.int32),
+        "threshold": np.array(flat["threshold"], dtype=np.float64),
+        "left": np.array(flat["left"], dtype=np.int32),
+        "right": np.array(flat["right"], dtype=np.int32),
+        "value": np.array(flat["value"], dtype=np.float64),
+        "depth": depth + 1,
+    }
+
+
+def _concatenate_trees(trees):
+    # Shift every tree's child indices by the number of nodes before it
+    arrays = {key: [] for key in ("feature", "threshold", "left", "right", "value")}
+    roots, offset = [], 0
+    for tree in trees:
+        roots.append(offset)
+        arrays["feature"].append(tree["feature"])
+        arrays["threshold"].append(tree["threshold"])
+        arrays["left"].append(np.where(tree["left"] >= 0, tree["left"] + offset, -1).astype(np.int32))
+        arrays["right"].append(np.where(tree["right"] >= 0, tree["right"] + offset, -1).astype(np.int32))
+        arrays["value"].append(tree["value"])
+        offset += len(tree["feature"])
+
+    flat = {key: np.concatenate(parts) for key, parts in arrays.items()}
+    flat["roots"] = np.array(roots, dtype=np.int32)
+    return flat, max(tree["depth"] for tree in trees)
+
+
+class ModelExporter:
+    """
+    Fuses the fitted preprocessor and the best model into one versioned .npz inference bundle:
+    the preprocessor as a compiled FastFeatureEncoder, linear models as coefficient arrays and
+    tree ensembles as flattened node arrays (see src/pipeline/inference_bundle.py).
+    Models that can't be represented this way (e.g. K-Neighbors) are not exported.
+    """
+    def __init__(self):
+        self.model_exporter_config = ModelExporterConfig()
+
+    def _export_model(self, model):
+        """
+        Returns (meta, arrays) describing the model, or None if its type is not supported.
+        """
+        model_class = type(model).__name__
+
+        if model_class in ("LinearRegression", "Ridge", "Lasso"):
+            return (
+                {"model_type": "linear", "intercept": float(np.ravel(model.intercept_)[0])},
+                {"coef": np.ravel(model.coef_).astype(np.float64)},
+            )
+
+        if model_class == "DecisionTreeRegressor":
+            trees, meta = [_flatten_sklearn_tree(model.tree_)], {"aggregation": "mean"}
+        elif model_class == "RandomForestRegressor":
+            trees, meta = [_flatten_sklearn_tree(est.tree_) for est in model.estimators_], {"aggregation": "mean"}
+        elif model_class == "GradientBoostingRegressor":
+            if not hasattr(model.init_, "constant_"):
+                return None
+            trees = [_flatten_sklearn_tree(est.tree_) for est in model.estimators_[:, 0]]
+            meta = {
+                "aggregation": "sum",
+                "base_score": float(np.ravel(model.init_.constant_)[0]),
+                "scale": float(model.learning_rate),
+            }
+        elif model_class == "AdaBoostRegressor":
+            trees = [_flatten_sklearn_tree(est.tree_) for est in model.estimators_]
+            meta = {"aggregation": "weighted_median"}
+        elif model_class == "XGBRegressor":
+            booster = model.get_booster()
+            config = json.loads(booster.save_config())
+            if config["learner"]["objective"]["name"] != "reg:squarederror":
+                return None
+            # Trees beyond the early-stopping best iteration are not used by predict()
+            try:
+                best_iteration = model.best_iteration
+            except AttributeError:
+                best_iteration = None
+            if best_iteration is not None:
+                booster = booster[: best_iteration + 1]
+            trees = [_flatten_xgboost_tree(json.loads(tree)) for tree in booster.get_dump(dump_format="json")]
+            base_score = config["learner"]["learner_model_param"]["base_score"].strip("[]")
+            meta = {"aggregation": "sum", "base_score": float(base_score), "split_rule": "lt"}
+        elif model_class == "CatBoostRegressor":
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                json_path = os.path.join(tmp_dir, "model.json")
+                model.save_model(json_path, format="json")
+                with open(json_path) as file_obj:
+                    model_json = json.load(file_obj)
+            if "oblivious_trees" not in model_json:
+                return None
+            trees = [_flatten_oblivious_tree(tree) for tree in model_json["oblivious_trees"]]
+            scale, bias = model_json.get("scale_and_bias", [1.0, [0.0]])
+            meta = {"aggregation": "sum", "base_score": float(np.ravel(bias)[0]), "scale": float(scale)}
+        else:
+            return None
+
+        arrays, max_depth = _concatenate_trees(trees)
+        if model_class == "AdaBoostRegressor":
+            arrays["tree_weights"] = model.estimator_weights_[:len(trees)].astype(np.float64)
+        else:
+            arrays["tree_weights"] = np.ones(len(trees), dtype=np.float64)
+
+        meta = {"model_type": "trees", "split_rule": "le", "max_depth": max_depth, **meta}
+        return meta, arrays
+
+    @stage("model_export")
+    def initiate_model_export(self, model, X_check=None):
+        """
+        Input: the fitted best model and optionally some transformed rows to verify the export on
+        Output: path of the written bundle, or None if the model type can't be exported
+        """
+        try:
+            config = self.model_exporter_config
+            model_class = type(model).__name__
+
+            exported = self._export_model(model)
+            if exported is None:
+                # Don't leave a bundle of a previous model around next to the new model.pkl
+                if os.path.exists(config.bundle_file_path):
+                    os.remove(config.bundle_file_path)
+                logging.info(f"{model_class} can't be exported to an inference bundle, skipping")
+                return None
+            model_meta, model_arrays = exported
+
+            preprocessor = load_object(file_path=config.preprocessor_obj_file_path)
+            encoder = FastFeatureEncoder.from_preprocessor(preprocessor)
+            encoder_meta, encoder_arrays = encoder.to_dict()
+
+            # Same version string as publish_artifacts will give the pair (the copies have the same bytes)
+            source_version = artifact_version(config.trained_model_file_path, config.preprocessor_obj_file_path)
+
+            meta = {
+                "format_version": BUNDLE_FORMAT_VERSION,
+                "source_model": model_class,
+                "source_version": source_version,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "encoder": encoder_meta,
+                **model_meta,
+            }
+            arrays = {
+                "encoder_template": encoder_arrays["template"],
+                "encoder_hot_values": encoder_arrays["hot_values"],
+                **model_arrays,
+            }
+
+            # Check the bundle reproduces the model before publishing it
+            bundle = InferenceBundle(meta, arrays)
+            if X_check is not None:
+                max_error = float(np.max(np.abs(bundle.model.predict(X_check) - model.predict(X_check))))
+                if max_error > config.tolerance:
+                    raise ValueError(f"Exported {model_class} differs from the model by up to {max_error}")
+                logging.info(f"Exported {model_class} matches the model (max difference {max_error:.2e})")
+
+            # Write next to the target and swap in atomically, like save_object
+            os.makedirs(os.path.dirname(config.bundle_file_path), exist_ok=True)
+            tmp_path = f"{config.bundle_file_path}.tmp.npz"
+            meta_bytes = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+            np.savez(tmp_path, meta=meta_bytes, **arrays)
+            os.replace(tmp_path, config.bundle_file_path)
+
+            logging.info(f"Inference bundle written to {config.bundle_file_path}")
+            return config.bundle_file_path
+
+        except Exception as e:
+            raise CustomException(e, sys)
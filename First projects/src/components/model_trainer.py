@@ -2,23 +2,18 @@ import os
 import sys
 from dataclasses import dataclass
 
-# Importing various Regression algorithms
-from catboost import CatBoostRegressor
-from sklearn.ensemble import (
-    AdaBoostRegressor,
-    GradientBoostingRegressor,
-    RandomForestRegressor
-)
-from sklearn.linear_model import LinearRegression, Lasso, Ridge
-from sklearn.metrics import r2_score
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.tree import DecisionTreeRegressor
-from xgboost import XGBRegressor
-
 # Custom modules for logging, exception handling, and helper functions
 from src.exception import CustomException
 from src.logger import logging
+from src.instrumentation import record_rows, stage
+from src.stage_cache import StageCache
 from src.utils import save_object, evaluate_models
+from src.components.budgeted_selection import BudgetedModelSelection, BudgetedSelectionConfig
+from src.components.cross_validation import CrossValidation, CrossValidationConfig
+from src.components.hyperparameter_search import HyperparameterSearch, HyperparameterSearchConfig
+from src.components.model_exporter import ModelExporter
+from src.components.prediction_table import PredictionTableBuilder
+from src.pipeline.artifact_registry import publish_artifacts
 
 @dataclass
 class ModelTrainerConfig:
@@ -26,72 +21,244 @@ class ModelTrainerConfig:
     Configuration class to define file paths for saving the trained model.
     Using @dataclass provides a clean way to store configuration constants.
     """
-    trained_model_file_path = os.path.join('artifacts', "model.pkl")
+    # The new pair is staged (the preprocessor by DataTransformation) and only copied over the
+    # served artifacts/model.pkl + preprocessor.pkl by publish_artifacts once the model is saved
+    trained_model_file_path = os.path.join('artifacts', 'staging', "model.pkl")
+    preprocessor_obj_file_path = os.path.join('artifacts', 'staging', "preprocessor.pkl")
+    # Staged by DataTransformation from the same training rows, published with the pair
+    drift_reference_file_path = os.path.join('artifacts', 'staging', "drift_reference.json")
+    # Number of candidate models fitted at the same time (1 = serial, -1 = one per core)
+    n_jobs: int = -1
+    # "process" sidesteps the GIL for pure-Python estimators; "thread" avoids copying the data
+    parallel_backend: str = "process"
+    # "full" fits every candidate on all training rows; "budgeted" drops candidates on their
+    # learning curve, early-stops the boosters and caps each fit at MODEL_TIME_BUDGET_SECONDS;
+    # "cv" picks the best mean R2 over CV_FOLDS folds of the training rows and refits only it
+    model_selection: str = os.environ.get("MODEL_SELECTION", "full")
+    # HYPERPARAMETER_SEARCH=1 tunes each model with successive halving before the final comparison;
+    # off by default, so a plain training run fits the same default estimators as before
+    enable_hyperparameter_search: bool = os.environ.get("HYPERPARAMETER_SEARCH", "0") == "1"
+    # Reuse fitted candidates (and search results) whose data and hyperparameters are unchanged
+    use_cache: bool = True
+    # Also write the best model + preprocessor as a NumPy-only inference bundle (artifacts/model_bundle.npz)
+    export_inference_bundle: bool = True
+    # Also precompute the prediction of every valid input (artifacts/prediction_table.npy)
+    build_prediction_table: bool = False
 
 class ModelTrainer:
     def __init__(self):
         # Initialize the config to access the file path later
         self.model_trainer_config = ModelTrainerConfig()
+        self.stage_cache = StageCache() if self.model_trainer_config.use_cache else None
         
-    def initiate_model_trainer(self, train_array, test_array):
+    def get_models(self):
         """
-        Input: train_array and test_array (usually from the Data Transformation stage)
-        Output: R2 Score of the best performing model
+        Output: {model_name: unfitted estimator} of every candidate model
         """
-        try:
-            logging.info("Splitting training and test input data")
-            
-            # Splitting features (X) and target (y) from the input arrays
-            # Assumes the target variable is in the last column [:, -1]
-            X_train, y_train, X_test, y_test = (
-                train_array[:, :-1],
-                train_array[:, -1],
-                test_array[:, :-1],
-                test_array[:, -1]
-            )
+        # Importing various Regression algorithms here rather than at module level:
+        # catboost/xgboost are slow to import and only needed once training starts
+        from catboost import CatBoostRegressor
+        from sklearn.ensemble import AdaBoostRegressor, RandomForestRegressor
+        from sklearn.linear_model import LinearRegression, Lasso, Ridge
+        from sklearn.neighbors import KNeighborsRegressor
+        from sklearn.tree import DecisionTreeRegressor
+        from xgboost import XGBRegressor
 
-            # Define a dictionary of models to experiment with
-            models = {
-                "Linear Regression": LinearRegression(),
-                "Lasso": Lasso(),
-                "Ridge": Ridge(),
-                "K-Neighbors Regressor": KNeighborsRegressor(),
-                "Decision Tree": DecisionTreeRegressor(),
-                "Random Forest Regressor": RandomForestRegressor(),
-                "XGBRegressor": XGBRegressor(), 
-                "CatBoosting Regressor": CatBoostRegressor(verbose=False),
-                "AdaBoost Regressor": AdaBoostRegressor()
+        # Define a dictionary of models to experiment with
+        return {
+            "Linear Regression": LinearRegression(),
+            "Lasso": Lasso(),
+            "Ridge": Ridge(),
+            "K-Neighbors Regressor": KNeighborsRegressor(),
+            "Decision Tree": DecisionTreeRegressor(),
+            "Random Forest Regressor": RandomForestRegressor(),
+            "XGBRegressor": XGBRegressor(), 
+            "CatBoosting Regressor": CatBoostRegressor(verbose=False, allow_writing_files=False),
+            "AdaBoost Regressor": AdaBoostRegressor()
+        }
+
+    def get_params(self):
+        """
+        Output: {model_name: search space}; models without an entry keep their defaults
+        """
+        return {
+            "Lasso": {
+                "alpha": [0.001, 0.01, 0.1, 0.5, 1.0, 5.0]
+            },
+            "Ridge": {
+                "alpha": [0.01, 0.1, 1.0, 5.0, 10.0, 50.0]
+            },
+            "K-Neighbors Regressor": {
+                "n_neighbors": [3, 5, 7, 9, 11, 15],
+                "weights": ["uniform", "distance"]
+            },
+            "Decision Tree": {
+                "criterion": ["squared_error", "friedman_mse", "absolute_error"],
+                "max_depth": [None, 4, 6, 8, 12],
+                "min_samples_leaf": [1, 5, 10]
+            },
+            "Random Forest Regressor": {
+                "n_estimators": [8, 16, 32, 64, 128, 256],
+                "max_features": [1.0, "sqrt", "log2"],
+                "max_depth": [None, 8, 16]
+            },
+            "XGBRegressor": {
+                "learning_rate": [0.01, 0.05, 0.1, 0.2],
+                "n_estimators": [8, 16, 32, 64, 128, 256],
+                "max_depth": [3, 4, 6]
+            },
+            "CatBoosting Regressor": {
+                "depth": [4, 6, 8, 10],
+                "learning_rate": [0.01, 0.05, 0.1],
+                "iterations": [30, 50, 100, 200]
+            },
+            "AdaBoost Regressor": {
+                "learning_rate": [0.01, 0.05, 0.1, 0.5, 1.0],
+                "loss": ["linear", "square", "exponential"],
+                "n_estimators": [8, 16, 32, 64, 128, 256]
             }
-            
-            # evaluate_models is a helper function that fits each model 
-            # and returns a dictionary of {model_name: r2_score}
-            models_report: dict = evaluate_models(
-                X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
-                models=models
-            )
-            
+        }
+
+    def select_best_model(self, models_report, models, models_std=None):
+        """
+        Input: {model_name: test R2} (or mean cross-validated R2) and the {model_name: estimator}
+               models_std: optional {model_name: standard deviation of R2 over the folds}
+        Output: (best_model_name, best_model, best_model_score)
+        """
+        try:
             # Find the highest R2 score from the report
             best_model_score = max(models_report.values())
-            
+        
             # Find the name of the model that achieved that highest score
             best_model_name = list(models_report.keys())[
                 list(models_report.values()).index(best_model_score)
             ]
-            
+        
             # Select the actual model object based on the best name
             best_model = models[best_model_name]
 
             # Threshold check: If the best model is poor (R2 < 0.6), stop the process
             if best_model_score < 0.6:
-                raise CustomException("No best model found with acceptable accuracy")
+                raise ValueError("No best model found with acceptable accuracy")
+
+            if models_std is not None:
+                # A runner-up within one standard deviation is not reliably worse
+                close = [
+                    model_name for model_name, score in models_report.items()
+                    if model_name != best_model_name and best_model_score - score <= models_std[best_model_name]
+                ]
+                logging.info(
+                    f"Best model found: {best_model_name} with cross-validated score: {best_model_score} "
+                    f"+/- {models_std[best_model_name]}" + (f" (within one std: {close})" if close else "")
+                )
+            else:
+                logging.info(f"Best model found: {best_model_name} with score: {best_model_score}")
+            return best_model_name, best_model, best_model_score
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @stage("model_trainer")
+    def initiate_model_trainer(self, X_train, y_train, X_test, y_test):
+        """
+        Input: features and targets from the Data Transformation stage
+               (features are C-contiguous float32 or CSR; targets are 1-D)
+        Output: R2 Score of the best performing model
+        """
+        try:
+            record_rows(len(y_train) + len(y_test))
+
+            from sklearn.metrics import r2_score
 
-            logging.info(f"Best model found: {best_model_name} with score: {best_model_score}")
+            models = self.get_models()
+            params = self.get_params()
+
+            if self.model_trainer_config.enable_hyperparameter_search:
+                # Successive halving tunes every model on a validation split of the training data
+                # and replaces the default estimators with their best configuration
+                logging.info("Starting hyperparameter search")
+                hyperparameter_search = HyperparameterSearch(HyperparameterSearchConfig(
+                    n_jobs=self.model_trainer_config.n_jobs,
+                    parallel_backend=self.model_trainer_config.parallel_backend
+                ))
+                with stage("hyperparameter_search"):
+                    hyperparameter_search.initiate_hyperparameter_search(
+                        models=models, params=params, X_train=X_train, y_train=y_train,
+                        cache=self.stage_cache
+                    )
+            
+            # evaluate_models is a helper function that fits each model 
+            # and returns a dictionary of {model_name: r2_score}
+            models_std = None
+            with stage("evaluate_models"):
+                if self.model_trainer_config.model_selection == "cv":
+                    # Mean R2 over the folds; the estimators stay unfitted until one is picked
+                    cross_validation = CrossValidation(CrossValidationConfig(
+                        n_jobs=self.model_trainer_config.n_jobs,
+                        parallel_backend=self.model_trainer_config.parallel_backend
+                    ))
+                    cv_report = cross_validation.initiate_cross_validation(
+                        models=models, X_train=X_train, y_train=y_train, cache=self.stage_cache
+                    )
+                    models_report: dict = {model_name: result["mean_r2"] for model_name, result in cv_report.items()}
+                    models_std = {model_name: result["std_r2"] for model_name, result in cv_report.items()}
+                elif self.model_trainer_config.model_selection == "budgeted":
+                    # Only the candidates that survive their learning curve and budget are in the report
+                    budgeted_selection = BudgetedModelSelection(BudgetedSelectionConfig(
+                        n_jobs=self.model_trainer_config.n_jobs,
+                        parallel_backend=self.model_trainer_config.parallel_backend
+                    ))
+                    models_report: dict = budgeted_selection.initiate_budgeted_selection(
+                        models=models, X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
+                        cache=self.stage_cache
+                    )
+                elif self.model_trainer_config.model_selection == "full":
+                    models_report: dict = evaluate_models(
+                        X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
+                        models=models,
+                        n_jobs=self.model_trainer_config.n_jobs,
+                        backend=self.model_trainer_config.parallel_backend,
+                        cache=self.stage_cache
+                    )
+                else:
+                    raise ValueError(
+                        f"Unknown model_selection '{self.model_trainer_config.model_selection}', "
+                        "expected 'full', 'budgeted' or 'cv'"
+                    )
+            
+            best_model_name, best_model, best_model_score = self.select_best_model(models_report, models, models_std)
+
+            if self.model_trainer_config.model_selection == "cv":
+                # Only the winner is fitted on every training row
+                best = {best_model_name: best_model}
+                with stage("refit_best_model"):
+                    evaluate_models(
+                        X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
+                        models=best, cache=self.stage_cache
+                    )
+                # A cached fit comes back as another object
+                best_model = best[best_model_name]
 
             # Save the best performing model as a pickle (.pkl) file in the artifacts folder
             save_object(
                 file_path=self.model_trainer_config.trained_model_file_path,
                 obj=best_model
             )
+            if self.model_trainer_config.export_inference_bundle:
+                # Verified against the model on the test rows before it is written
+                ModelExporter().initiate_model_export(best_model, X_check=X_test)
+
+            if self.model_trainer_config.build_prediction_table:
+                # Serving answers in-domain requests with an array read instead of the model
+                PredictionTableBuilder().initiate_prediction_table(best_model)
+
+            # Everything derived from the staged pair is written and checked: make it the served pair.
+            # Any failure above leaves the previous version in service
+            publish_artifacts(
+                self.model_trainer_config.trained_model_file_path,
+                self.model_trainer_config.preprocessor_obj_file_path,
+                self.model_trainer_config.drift_reference_file_path,
+            )
             
             # Final verification: Predict on test data and calculate R2 score
             predicted = best_model.predict(X_test)
@@ -0,0 +1,117 @@
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import record_rows, stage
+from src.pipeline.artifact_registry import artifact_version
+from src.pipeline.fast_encoder import FastFeatureEncoder
+from src.pipeline.predict_pipeline import CATEGORICAL_COLUMNS, NUMERICAL_COLUMNS
+from src.utils import load_object
+
+
+@dataclass
+class PredictionTableConfig:
+    """
+    Where the precomputed predictions for the whole input domain are written, and the files
+    they are computed from: the staged pair, before it is published (serving only uses a
+    table whose model_version is the served one).
+    """
+    table_file_path = os.path.join('artifacts', "prediction_table.npy")
+    meta_file_path = os.path.join('artifacts', "prediction_table.json")
+    trained_model_file_path = os.path.join('artifacts', 'staging', "model.pkl")
+    preprocessor_obj_file_path = os.path.join('artifacts', 'staging', "preprocessor.pkl")
+    # Every integer score in [score_min, score_max] is precomputed
+    score_min: int = 0
+    score_max: int = 100
+    # float32 halves the table; scores are reported to 2 decimals
+    dtype: str = "float32"
+    # Grid cells encoded + predicted per model.predict call
+    batch_size: int = 262_144
+
+
+class PredictionTableBuilder:
+    """
+    Scores every valid CustomData input (each category of each categorical column x every
+    integer score) and stores the predictions in one flat .npy array. The position of a
+    record is its mixed-radix number: one digit per column, the radix being the number of
+    values of that column, in the order listed in the JSON metadata (last column fastest,
+    i.e. NumPy's C order, so np.unravel_index / np.ravel_multi_index map between the two).
+    """
+    def __init__(self):
+        self.prediction_table_config = PredictionTableConfig()
+
+    @stage("prediction_table")
+    def initiate_prediction_table(self, model=None):
+        """
+        Input: the fitted model (loaded from model.pkl when not given)
+        Output: path of the written table
+        """
+        try:
+            config = self.prediction_table_config
+            if model is None:
+                model = load_object(file_path=config.trained_model_file_path)
+            preprocessor = load_object(file_path=config.preprocessor_obj_file_path)
+            encoder = FastFeatureEncoder.from_preprocessor(preprocessor)
+
+            # 1. The domain: the categories the preprocessor knows, and the integer score range
+            categories = {column: sorted(lookup) for column, _, lookup in encoder.categorical}
+            columns = [{"name": col, "values": categories[col]} for col in CATEGORICAL_COLUMNS]
+            columns += [{"name": col, "min": config.score_min, "max": config.score_max} for col in NUMERICAL_COLUMNS]
+            grid_values = [np.array(categories[col], dtype=object) for col in CATEGORICAL_COLUMNS]
+            grid_values += [np.arange(config.score_min, config.score_max + 1, dtype=np.float64) for _ in NUMERICAL_COLUMNS]
+            shape = tuple(len(values) for values in grid_values)
+            n_cells = math.prod(shape)
+            logging.info(f"Building prediction table of {n_cells} cells, shape {shape}")
+            record_rows(n_cells)
+
+            # 2. Score the grid batch by batch straight into a memory-mapped file
+            started = time.perf_counter()
+            tmp_table_path = f"{config.table_file_path}.tmp"
+            table = np.lib.format.open_memmap(tmp_table_path, mode="w+", dtype=config.dtype, shape=(n_cells,))
+            for start in range(0, n_cells, config.batch_size):
+                stop = min(start + config.batch_size, n_cells)
+                digits = np.unravel_index(np.arange(start, stop), shape)
+                batch = {
+                    column["name"]: values[digit]
+                    for column, values, digit in zip(columns, grid_values, digits)
+                }
+                table[start:stop] = model.predict(encoder.encode_batch(batch))
+            table.flush()
+            del table
+            logging.info(f"Prediction table scored in {time.perf_counter() - started:.1f}s")
+
+            # 3. Publish the table, then the metadata that points serving at it
+            meta = {
+                "model_version": artifact_version(config.trained_model_file_path, config.preprocessor_obj_file_path),
+                "columns": columns,
+                "shape": list(shape),
+                "dtype": config.dtype,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            os.replace(tmp_table_path, config.table_file_path)
+            tmp_meta_path = f"{config.meta_file_path}.tmp"
+            with open(tmp_meta_path, "w") as file_obj:
+                json.dump(meta, file_obj, indent=2)
+            os.replace(tmp_meta_path, config.meta_file_path)
+
+            logging.info(f"Prediction table written to {config.table_file_path}")
+            return config.table_file_path
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+if __name__ == "__main__":
+    # Build the table for the artifacts already served from artifacts/
+    from src.pipeline.artifact_registry import ArtifactRegistryConfig
+    builder, registry_config = PredictionTableBuilder(), ArtifactRegistryConfig()
+    builder.prediction_table_config.trained_model_file_path = registry_config.model_file_path
+    builder.prediction_table_config.preprocessor_obj_file_path = registry_config.preprocessor_file_path
+    print(builder.initiate_prediction_table())
@@ -0,0 +1,109 @@
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import record_rows, stage
+
+from src.components.streaming_transformation import StreamingDataTransformation
+from src.components.model_trainer import ModelTrainer
+
+
+@dataclass
+class StreamingDataIngestionConfig:
+    """
+    Same outputs as DataIngestionConfig, but the source is read and split chunk by chunk,
+    so memory use depends on chunk_size and not on the size of the dataset.
+    """
+    train_data_path: str = os.path.join('artifacts', "train.csv")
+    test_data_path: str = os.path.join('artifacts', "test.csv")
+    source_data_path: str = os.path.join('notebook', 'data', 'stud.csv')
+    test_size: float = 0.2
+    random_state: int = 42
+    # Rows read from the source per chunk
+    chunk_size: int = 100_000
+
+
+class StreamingDataIngestion:
+    def __init__(self):
+        self.ingestion_config = StreamingDataIngestionConfig()
+
+    def _is_test_row(self, chunk):
+        """
+        Deterministic hash-based split: a row goes to the test set when the hash of its content
+        falls in the first test_size share of the hash space. The same row always lands in the
+        same split, whatever chunk it arrives in and however the file is ordered.
+        """
+        hash_key = f"{self.ingestion_config.random_state:016d}"[-16:]
+        # Hash numbers as float64: a chunk with a missing value would otherwise infer float
+        # where another chunk inferred int, and the same row would hash differently
+        numeric_columns = chunk.select_dtypes(include="number").columns
+        chunk = chunk.astype({col: "float64" for col in numeric_columns})
+        row_hashes = pd.util.hash_pandas_object(chunk, index=False, hash_key=hash_key).to_numpy()
+        return (row_hashes % np.uint64(10_000)) < np.uint64(round(self.ingestion_config.test_size * 10_000))
+
+    @stage("streaming_data_ingestion")
+    def initiate_data_ingestion(self, on_train_chunk=None):
+        """
+        Logic:
+        1. Read the source chunk by chunk -> 2. Split each chunk by row hash -> 3. Append to train/test files
+        on_train_chunk: optional callback receiving every train chunk (e.g. StreamingDataTransformation.partial_fit),
+                        so statistics are fitted during the same single pass over the data.
+        Output: (train_path, test_path, n_train_rows, n_test_rows)
+        """
+        logging.info("Entered the streaming data ingestion method")
+        try:
+            config = self.ingestion_config
+            os.makedirs(os.path.dirname(config.train_data_path), exist_ok=True)
+
+            n_train, n_test = 0, 0
+            reader = pd.read_csv(config.source_data_path, chunksize=config.chunk_size)
+            for i, chunk in enumerate(reader):
+                is_test = self._is_test_row(chunk)
+                train_chunk, test_chunk = chunk[~is_test], chunk[is_test]
+
+                # The first chunk creates the files (with header), later chunks are appended
+                mode, header = ("w", True) if i == 0 else ("a", False)
+                train_chunk.to_csv(config.train_data_path, mode=mode, header=header, index=False)
+                test_chunk.to_csv(config.test_data_path, mode=mode, header=header, index=False)
+
+                if on_train_chunk is not None and len(train_chunk):
+                    on_train_chunk(train_chunk)
+
+                n_train += len(train_chunk)
+                n_test += len(test_chunk)
+
+            logging.info(f"Streaming ingestion completed: {n_train} train rows, {n_test} test rows")
+            record_rows(n_train + n_test)
+
+            return (
+                config.train_data_path,
+                config.test_data_path,
+                n_train,
+                n_test,
+            )
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+# Execution block to run the full pipeline in streaming mode
+if __name__ == "__main__":
+    # STAGE 1 + statistics: one pass over the source splits it and fits the preprocessor statistics
+    data_transformation = StreamingDataTransformation()
+    ingestion = StreamingDataIngestion()
+    train_data, test_data, n_train, n_test = ingestion.initiate_data_ingestion(
+        on_train_chunk=data_transformation.partial_fit
+    )
+
+    # STAGE 2: transform chunk by chunk into memory-mapped .npy arrays
+    X_train, y_train, X_test, y_test, _ = data_transformation.initiate_data_transformation(
+        train_data, test_data, n_train, n_test
+    )
+
+    # STAGE 3: Model Training
+    modeltrainer = ModelTrainer()
+    print(modeltrainer.initiate_model_trainer(X_train, y_train, X_test, y_test))
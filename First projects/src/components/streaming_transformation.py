@@ -0,0 +1,285 @@
+import os
+import sys
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import record_rows, stage
+from src.pipeline.drift_monitor import DriftReference
+from src.utils import load_array, save_object
+
+from src.components.data_transformation import DataTransformation
+
+
+@dataclass
+class StreamingDataTransformationConfig:
+    # Staged, like DataTransformation's: published together with the model
+    preprocessor_obj_file_path = os.path.join('artifacts', 'staging', "preprocessor.pkl")
+    drift_reference_file_path = os.path.join('artifacts', 'staging', "drift_reference.json")
+    X_train_file_path = os.path.join('artifacts', "X_train.npy")
+    y_train_file_path = os.path.join('artifacts', "y_train.npy")
+    X_test_file_path = os.path.join('artifacts', "X_test.npy")
+    y_test_file_path = os.path.join('artifacts', "y_test.npy")
+    target_column_name: str = "math_score"
+    feature_dtype: str = "float32"
+    # Rows transformed and written per chunk
+    chunk_size: int = 100_000
+
+
+class StreamingStatistics:
+    """
+    Single-pass, constant-memory statistics for the DataTransformation preprocessor:
+    - numerical columns: count / mean / sum of squared deviations of the observed values
+      (merged chunk by chunk) and a value histogram for the median,
+    - categorical columns: a count per category (gives the categories and the most frequent value).
+    Missing values are only counted; their effect on the scaler is added exactly at the end,
+    once the median / most frequent value they will be imputed with is known.
+    The histograms grow with the number of distinct values, which is bounded for this data
+    (five small categoricals and two 0-100 scores), not with the number of rows.
+    """
+    def __init__(self, numerical_columns, categorical_columns):
+        self.numerical_columns = list(numerical_columns)
+        self.categorical_columns = list(categorical_columns)
+
+        self.n_rows = 0
+        self.n_missing = Counter()
+        self.num_count = {col: 0 for col in self.numerical_columns}
+        self.num_mean = {col: 0.0 for col in self.numerical_columns}
+        self.num_m2 = {col: 0.0 for col in self.numerical_columns}
+        self.value_counts = {col: Counter() for col in self.numerical_columns + self.categorical_columns}
+
+    def partial_fit(self, chunk):
+        self.n_rows += len(chunk)
+
+        for col in self.numerical_columns:
+            values = pd.to_numeric(chunk[col], errors="coerce")
+            observed = values.dropna().to_numpy(dtype=np.float64)
+            self.n_missing[col] += len(values) - len(observed)
+            if not len(observed):
+                continue
+
+            # Chan et al. parallel update of mean and M2 with this chunk
+            n_a, n_b = self.num_count[col], len(observed)
+            mean_b = observed.mean()
+            m2_b = ((observed - mean_b) ** 2).sum()
+            delta = mean_b - self.num_mean[col]
+            n = n_a + n_b
+            self.num_mean[col] += delta * n_b / n
+            self.num_m2[col] += m2_b + delta ** 2 * n_a * n_b / n
+            self.num_count[col] = n
+
+            self.value_counts[col].update(pd.Series(observed).value_counts().to_dict())
+
+        for col in self.categorical_columns:
+            values = chunk[col]
+            self.n_missing[col] += int(values.isna().sum())
+            self.value_counts[col].update(values.dropna().astype(str).value_counts().to_dict())
+
+    def median(self, col):
+        # Same definition as np.median: mean of the two middle values for an even count
+        counts = sorted(self.value_counts[col].items())
+        total = sum(count for _, count in counts)
+        lower_rank, upper_rank = (total - 1) // 2, total // 2
+        lower = upper = None
+        seen = 0
+        for value, count in counts:
+            if lower is None and seen + count > lower_rank:
+                lower = value
+            if seen + count > upper_rank:
+                upper = value
+                break
+            seen += count
+        return (lower + upper) / 2
+
+    def most_frequent(self, col):
+        # SimpleImputer(strategy="most_frequent") breaks ties with the smallest value
+        counts = self.value_counts[col]
+        top = max(counts.values())
+        return min(value for value, count in counts.items() if count == top)
+
+    def numerical_moments(self, col):
+        """
+        Mean and variance after median imputation: the missing rows are merged in as
+        n_missing copies of the median (zero spread), exactly as the batch pipeline sees them.
+        """
+        n_a, mean_a, m2_a = self.num_count[col], self.num_mean[col], self.num_m2[col]
+        n_b, mean_b = self.n_missing[col], self.median(col)
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        mean = mean_a + delta * n_b / n
+        m2 = m2_a + delta ** 2 * n_a * n_b / n
+        return mean, m2 / n
+
+    def category_frequencies(self, col):
+        """
+        Sorted categories (the OneHotEncoder's order) and their frequency after imputation.
+        """
+        counts = Counter(self.value_counts[col])
+        counts[self.most_frequent(col)] += self.n_missing[col]
+        categories = sorted(counts)
+        return categories, np.array([counts[c] / self.n_rows for c in categories])
+
+
+def _set_scaler_statistics(scaler, mean, var, n_samples):
+    # Fill in the attributes StandardScaler.partial_fit would have computed
+    scaler.mean_ = np.asarray(mean, dtype=np.float64)
+    scaler.var_ = np.asarray(var, dtype=np.float64)
+    scale = np.sqrt(scaler.var_)
+    # StandardScaler leaves constant features unscaled
+    scale[scale < 10 * np.finfo(np.float64).eps] = 1.0
+    scaler.scale_ = scale
+    scaler.n_samples_seen_ = n_samples
+
+
+class StreamingDataTransformation:
+    """
+    Out-of-core variant of DataTransformation:
+    statistics are accumulated chunk by chunk (partial_fit), then train/test are transformed
+    chunk by chunk into preallocated memory-mapped .npy files. Produces the same preprocessor.pkl
+    and the same (X_train, y_train, X_test, y_test) outputs as DataTransformation.
+    """
+    def __init__(self):
+        self.data_transformation_config = StreamingDataTransformationConfig()
+
+        # Reuse the exact preprocessor definition (columns and steps) of the batch pipeline
+        template = DataTransformation().get_data_transformer_objects()
+        columns = {name: cols for name, _, cols in template.transformers}
+        self.statistics = StreamingStatistics(columns["num_pipeline"], columns["cat_pipeline"])
+
+    def partial_fit(self, chunk):
+        """
+        Updates the preprocessor statistics with one chunk of training rows.
+        """
+        try:
+            self.statistics.partial_fit(chunk)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def build_preprocessor(self):
+        """
+        Turns the accumulated statistics into a fitted ColumnTransformer with the same
+        structure as DataTransformation.get_data_transformer_objects().
+        """
+        try:
+            stats = self.statistics
+            preprocessor = DataTransformation().get_data_transformer_objects()
+
+            # 1. Give the encoder the full category lists seen in the stream
+            category_lists = [stats.category_frequencies(col)[0] for col in stats.categorical_columns]
+            preprocessor.set_params(cat_pipeline__one_hot_encoder__categories=category_lists)
+
+            # 2. Fit the structure on a tiny frame that contains every category once
+            n_seed = max(len(categories) for categories in category_lists)
+            seed = pd.DataFrame({
+                **{col: [categories[i % len(categories)] for i in range(n_seed)]
+                   for col, categories in zip(stats.categorical_columns, category_lists)},
+                **{col: np.arange(n_seed, dtype=np.float64) for col in stats.numerical_columns},
+            })
+            preprocessor.fit(seed)
+
+            # 3. Overwrite the fitted statistics with the streaming ones
+            num_pipeline = preprocessor.named_transformers_["num_pipeline"]
+            num_pipeline.named_steps["imputer"].statistics_ = np.array(
+                [stats.median(col) for col in stats.numerical_columns]
+            )
+            moments = [stats.numerical_moments(col) for col in stats.numerical_columns]
+            _set_scaler_statistics(
+                num_pipeline.named_steps["scaler"],
+                mean=[m for m, _ in moments], var=[v for _, v in moments], n_samples=stats.n_rows
+            )
+
+            cat_pipeline = preprocessor.named_transformers_["cat_pipeline"]
+            cat_pipeline.named_steps["imputer"].statistics_ = np.array(
+                [stats.most_frequent(col) for col in stats.categorical_columns], dtype=object
+            )
+            # One-hot indicators: mean p, variance p(1-p)
+            frequencies = np.concatenate([stats.category_frequencies(col)[1] for col in stats.categorical_columns])
+            _set_scaler_statistics(
+                cat_pipeline.named_steps["scaler"],
+                mean=frequencies, var=frequencies * (1 - frequencies), n_samples=stats.n_rows
+            )
+
+            return preprocessor
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _transform_to_file(self, preprocessor, data_path, n_rows, features_path, target_path, drift_reference=None):
+        # Preallocate the outputs on disk; only one chunk is ever held in memory.
+        # drift_reference, if given, is fitted on the same chunks
+        config = self.data_transformation_config
+        n_features = sum(s.stop - s.start for s in preprocessor.output_indices_.values())
+        os.makedirs(os.path.dirname(features_path), exist_ok=True)
+        features = np.lib.format.open_memmap(features_path, mode="w+", dtype=config.feature_dtype, shape=(n_rows, n_features))
+        target = np.lib.format.open_memmap(target_path, mode="w+", dtype=np.float64, shape=(n_rows,))
+
+        row = 0
+        for chunk in pd.read_csv(data_path, chunksize=config.chunk_size):
+            chunk_features = preprocessor.transform(chunk.drop(columns=[config.target_column_name]))
+            if drift_reference is not None:
+                drift_reference.partial_fit(chunk)
+            if hasattr(chunk_features, "toarray"):
+                chunk_features = chunk_features.toarray()
+            features[row:row + len(chunk)] = chunk_features
+            target[row:row + len(chunk)] = chunk[config.target_column_name].to_numpy()
+            row += len(chunk)
+
+        features.flush()
+        target.flush()
+        del features, target
+        return load_array(features_path), load_array(target_path)
+
+    def _count_rows(self, data_path):
+        return sum(len(chunk) for chunk in pd.read_csv(data_path, chunksize=self.data_transformation_config.chunk_size))
+
+    @stage("streaming_data_transformation")
+    def initiate_data_transformation(self, train_path, test_path, n_train=None, n_test=None):
+        """
+        Input: the train/test CSVs and their row counts (as returned by StreamingDataIngestion)
+        Output: (X_train, y_train, X_test, y_test, preprocessor_path); the arrays are read-only memory maps
+        If partial_fit was not called during ingestion, an extra pass over train_path fits the statistics.
+        """
+        try:
+            config = self.data_transformation_config
+
+            if self.statistics.n_rows == 0:
+                logging.info("No statistics collected during ingestion, fitting them in a separate pass")
+                for chunk in pd.read_csv(train_path, chunksize=config.chunk_size):
+                    self.partial_fit(chunk.drop(columns=[config.target_column_name]))
+
+            preprocessing_obj = self.build_preprocessor()
+
+            n_train = self._count_rows(train_path) if n_train is None else n_train
+            n_test = self._count_rows(test_path) if n_test is None else n_test
+            record_rows(n_train + n_test)
+
+            logging.info("Applying preprocessing on training and testing files chunk by chunk")
+            drift_reference = DriftReference.from_preprocessor(preprocessing_obj)
+            X_train, y_train = self._transform_to_file(
+                preprocessing_obj, train_path, n_train, config.X_train_file_path, config.y_train_file_path,
+                drift_reference=drift_reference,
+            )
+            X_test, y_test = self._transform_to_file(
+                preprocessing_obj, test_path, n_test, config.X_test_file_path, config.y_test_file_path
+            )
+
+            logging.info("Saving preprocessing object")
+            save_object(
+                file_path = config.preprocessor_obj_file_path,
+                obj = preprocessing_obj
+            )
+            drift_reference.save(config.drift_reference_file_path)
+
+            return (
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                config.preprocessor_obj_file_path,
+            )
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,366 @@
+import contextvars
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+
+from src.logger import logging
+
+
+@dataclass
+class InstrumentationConfig:
+    """
+    Where the per-run stage measurements are written.
+    INSTRUMENTATION=0 turns recording off, INSTRUMENTATION_PROMETHEUS=1 also writes the
+    metrics in Prometheus text format (e.g. for node_exporter's textfile collector),
+    INSTRUMENTATION_TRACE_MEMORY=1 adds exact Python/NumPy allocation peaks (tracemalloc, slower).
+    """
+    report_file_path: str = os.path.join('artifacts', "run_report.json")
+    prometheus_file_path: str = os.path.join('artifacts', "run_metrics.prom")
+    enabled: bool = os.environ.get("INSTRUMENTATION", "1") == "1"
+    export_prometheus: bool = os.environ.get("INSTRUMENTATION_PROMETHEUS", "0") == "1"
+    trace_memory: bool = os.environ.get("INSTRUMENTATION_TRACE_MEMORY", "0") == "1"
+    # Seconds between two RSS samples while a stage is running
+    sample_interval: float = 0.01
+
+
+def _max_rss_mb():
+    # Process high-water mark; ru_maxrss is in KB on Linux (bytes on macOS)
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 ** 2
+
+
+def _current_rss_mb():
+    # Current resident set size (Linux); None where /proc is not available
+    try:
+        with open("/proc/self/statm") as file_obj:
+            return int(file_obj.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        return None
+
+
+class _RssSampler:
+    """
+    One daemon thread per process that samples the RSS while at least one stage is open
+    and keeps the maximum seen by each open stage.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self._reset()
+        # A forked worker inherits neither the thread nor (safely) the lock: start over there
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._condition = threading.Condition()
+        self._open = []
+        self._started = False
+
+    def add(self, timer):
+        with self._condition:
+            self._open.append(timer)
+            if not self._started:
+                self._started = True
+                threading.Thread(target=self._run, name="rss-sampler", daemon=True).start()
+            self._condition.notify()
+
+    def remove(self, timer):
+        with self._condition:
+            if timer in self._open:
+                self._open.remove(timer)
+
+    def _run(self):
+        condition = self._condition
+        while True:
+            # Sleep until a stage is open, then sample every interval
+            with condition:
+                while not self._open:
+                    condition.wait()
+            time.sleep(self.interval)
+            rss = _current_rss_mb()
+            if rss is None:
+                return
+            with condition:
+                for timer in self._open:
+                    timer.sampled_peak_rss_mb = max(timer.sampled_peak_rss_mb, rss)
+
+
+class StageTimer:
+    """
+    Measures one block of code: wall time, CPU time of the process, peak RSS during
+    the block and, with trace_memory, the peak of traced allocations above the start.
+    Records nothing by itself; see stage() for the recording version.
+    CPU time and traced memory are process-wide, so with the "thread" backend of
+    evaluate_models the fits running at the same time share them.
+    """
+    _sampler = None
+    # Open timers measuring traced memory, outermost first (tracemalloc is process-wide)
+    _traced_open = []
+
+    def __init__(self, config: InstrumentationConfig = None):
+        self.config = config or get_run_recorder().config
+        self.result = None
+        self.rows = None
+        self.extra = {}
+
+    def __enter__(self):
+        if StageTimer._sampler is None:
+            StageTimer._sampler = _RssSampler(self.config.sample_interval)
+
+        self.sampled_peak_rss_mb = _current_rss_mb() or 0.0
+        self._start_max_rss_mb = _max_rss_mb()
+        if self.config.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak counter is process-wide: hand the enclosing stage its peak so far, then reset it
+            if StageTimer._traced_open:
+                parent = StageTimer._traced_open[-1]
+                parent._traced_peak = max(parent._traced_peak, peak)
+            tracemalloc.reset_peak()
+            self._traced_start = self._traced_peak = current
+            StageTimer._traced_open.append(self)
+        StageTimer._sampler.add(self)
+
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._start_wall
+        cpu = time.process_time() - self._start_cpu
+        StageTimer._sampler.remove(self)
+
+        # If the block raised the process high-water mark, ru_maxrss is its exact peak;
+        # otherwise the sampled maximum is the best estimate
+        end_max_rss_mb = _max_rss_mb()
+        peak_rss_mb = end_max_rss_mb if end_max_rss_mb > self._start_max_rss_mb else self.sampled_peak_rss_mb
+
+        self.result = {
+            "wall_seconds": wall,
+            "cpu_seconds": cpu,
+            "peak_rss_mb": peak_rss_mb,
+            "rows": self.rows,
+            "rows_per_second": self.rows / wall if self.rows and wall > 0 else None,
+            **self.extra,
+        }
+
+        if self in StageTimer._traced_open:
+            self._traced_peak = max(self._traced_peak, tracemalloc.get_traced_memory()[1])
+            self.result["traced_peak_mb"] = (self._traced_peak - self._traced_start) / 1024 ** 2
+            StageTimer._traced_open.remove(self)
+            # Whatever this stage allocated also counts towards the enclosing stage's peak
+            if StageTimer._traced_open:
+                parent = StageTimer._traced_open[-1]
+                parent._traced_peak = max(parent._traced_peak, self._traced_peak)
+            tracemalloc.reset_peak()
+        return False
+
+
+# Names of the stages currently open in this context, outermost first
+_stage_path = contextvars.ContextVar("stage_path", default=())
+# Labels of the open stages (inner ones override outer ones); child records inherit them
+_stage_labels = contextvars.ContextVar("stage_labels", default={})
+# StageTimer of the innermost open stage, for record_rows()
+_current_timer = contextvars.ContextVar("current_timer", default=None)
+
+
+class RunRecorder:
+    """
+    Collects the stage measurements of one pipeline run (one process) and writes them as
+    a JSON report, plus Prometheus text metrics when enabled. The report is rewritten each
+    time a top-level stage finishes, so a run that fails half-way still leaves its numbers.
+    """
+    def __init__(self, config: InstrumentationConfig = None):
+        self.config = config or InstrumentationConfig()
+        self._lock = threading.Lock()
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.started_at = time.time()
+        self.records = []
+
+    def record(self, name, measurements, path=(), **labels):
+        entry = {
+            "stage": name,
+            "path": "/".join(path + (name,)),
+            "labels": labels,
+            **measurements,
+        }
+        with self._lock:
+            self.records.append(entry)
+        return entry
+
+    def summary(self):
+        """
+        Totals per (path, labels): count, total / max wall and CPU time, max peak RSS, rows.
+        """
+        groups = {}
+        with self._lock:
+            records = list(self.records)
+        for entry in records:
+            key = (entry["path"], tuple(sorted(entry["labels"].items())))
+            group = groups.setdefault(key, {
+                "path": entry["path"], "labels": entry["labels"], "count": 0,
+                "wall_seconds": 0.0, "max_wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "peak_rss_mb": 0.0, "rows": 0,
+            })
+            group["count"] += 1
+            group["wall_seconds"] += entry["wall_seconds"]
+            group["max_wall_seconds"] = max(group["max_wall_seconds"], entry["wall_seconds"])
+            group["cpu_seconds"] += entry["cpu_seconds"]
+            group["peak_rss_mb"] = max(group["peak_rss_mb"], entry["peak_rss_mb"])
+            group["rows"] += entry["rows"] or 0
+        for group in groups.values():
+            group["rows_per_second"] = group["rows"] / group["wall_seconds"] if group["rows"] and group["wall_seconds"] > 0 else None
+        return list(groups.values())
+
+    def prometheus_text(self):
+        lines = []
+        metrics = [
+            ("pipeline_stage_runs_total", "count", "Number of times the stage ran"),
+            ("pipeline_stage_wall_seconds_total", "wall_seconds", "Wall-clock time spent in the stage"),
+            ("pipeline_stage_cpu_seconds_total", "cpu_seconds", "Process CPU time spent in the stage"),
+            ("pipeline_stage_peak_rss_bytes", "peak_rss_mb", "Peak resident memory during the stage"),
+            ("pipeline_stage_rows_per_second", "rows_per_second", "Rows processed per second"),
+        ]
+        summary = self.summary()
+        for metric, field, help_text in metrics:
+            kind = "counter" if metric.endswith("_total") else "gauge"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            for group in summary:
+                value = group[field]
+                if value is None:
+                    continue
+                if field == "peak_rss_mb":
+                    value = value * 1024 ** 2
+                labels = {"stage": group["path"], "run_id": self.run_id, **group["labels"]}
+                label_text = ",".join(f'{key}="{str(val)}"' for key, val in labels.items())
+                lines.append(f"{metric}{{{label_text}}} {value:.6g}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self):
+        """
+        Writes the JSON report (and the Prometheus file) atomically next to the artifacts.
+        """
+        try:
+            with self._lock:
+                records = list(self.records)
+            report = {
+                "run_id": self.run_id,
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+                "pid": os.getpid(),
+                "process_peak_rss_mb": _max_rss_mb(),
+                "summary": self.summary(),
+                "stages": records,
+            }
+            outputs = [(self.config.report_file_path, json.dumps(report, indent=2, default=str))]
+            if self.config.export_prometheus:
+                outputs.append((self.config.prometheus_file_path, self.prometheus_text()))
+
+            for file_path, content in outputs:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                tmp_path = f"{file_path}.tmp"
+                with open(tmp_path, "w") as file_obj:
+                    file_obj.write(content)
+                os.replace(tmp_path, file_path)
+
+        except Exception as e:
+            # Instrumentation must never fail the pipeline it measures
+            logging.warning(f"Could not write the run report: {e}")
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_run_recorder() -> RunRecorder:
+    """
+    Returns the recorder of this process's run, creating it on first use.
+    """
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = RunRecorder()
+    return _recorder
+
+
+class stage:
+    """
+    Records one pipeline stage, as a context manager or a decorator:
+
+        with stage("data_transformation"):
+            ...
+            record_rows(len(train_df))
+
+        @stage("save_object")
+        def save_object(...): ...
+
+    Stages nest: a stage opened inside another is reported under "outer/inner"
+    and inherits its labels.
+    """
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(self.name, **self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        recorder = get_run_recorder()
+        self._enabled = recorder.config.enabled
+        if not self._enabled:
+            return None
+        self._path = _stage_path.get()
+        self._path_token = _stage_path.set(self._path + (self.name,))
+        self._all_labels = {**_stage_labels.get(), **self.labels}
+        self._labels_token = _stage_labels.set(self._all_labels)
+        self._timer = StageTimer(recorder.config)
+        self._timer_token = _current_timer.set(self._timer)
+        self._timer.__enter__()
+        return self._timer
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._enabled:
+            return False
+        self._timer.__exit__(exc_type, exc, tb)
+        _current_timer.reset(self._timer_token)
+        _stage_labels.reset(self._labels_token)
+        _stage_path.reset(self._path_token)
+
+        recorder = get_run_recorder()
+        measurements = dict(self._timer.result, failed=exc_type is not None)
+        recorder.record(self.name, measurements, path=self._path, **self._all_labels)
+        if not self._path:
+            recorder.write_report()
+        return False
+
+
+def record_rows(n_rows, **extra):
+    """
+    Sets the number of rows processed by the innermost open stage (for rows/sec),
+    plus any extra fields to report with it.
+    """
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.rows = int(n_rows)
+        timer.extra.update(extra)
+
+
+def record_measurements(name, measurements, **labels):
+    """
+    Records a measurement taken elsewhere (e.g. a StageTimer result returned by a worker
+    process) as a child of the stage currently open in this process.
+    """
+    recorder = get_run_recorder()
+    if recorder.config.enabled:
+        recorder.record(name, measurements, path=_stage_path.get(), **{**_stage_labels.get(), **labels})
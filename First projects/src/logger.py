@@ -1,5 +1,14 @@
+import atexit
+import glob
+import json
 import logging
 import os
+import queue
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
 
 # 1. Create a unique log file name based on the current timestamp (Month_Day_Year_Hour_Minute_Second)
@@ -9,22 +18,284 @@ LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 # It creates a subfolder for each log session based on the filename above
 logs_path = os.path.join(os.getcwd(), "logs", LOG_FILE)
 
-# 3. Create the directory if it doesn't exist. 
-# exist_ok=True prevents the code from crashing if the folder is already there.
-os.makedirs(logs_path, exist_ok=True)
-
-# 4. Define the full path for the log file (inside the new directory)
+# 3. Define the full path for the log file (inside the new directory)
 LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
 
-# 5. Configure the logging settings
+
+@dataclass
+class LoggingConfig:
+    """
+    How log records are written, from the environment.
+    LOG_BACKEND=async (default) queues records for a background writer that appends them in
+    batches to one file per process (logs/<session>/<pid>.jsonl), rotated by size and age;
+    LOG_BACKEND=file keeps the synchronous FileHandler. LOG_FORMAT is "json" or "text".
+    LOG_REQUEST_SAMPLE_RATE is the fraction of per-request records (logger "src.requests") kept.
+    """
+    backend: str = os.environ.get("LOG_BACKEND", "async")
+    log_format: str = os.environ.get("LOG_FORMAT", "json")
+    level: str = os.environ.get("LOG_LEVEL", "INFO")
+    request_level: str = os.environ.get("LOG_REQUEST_LEVEL", "INFO")
+    request_sample_rate: float = float(os.environ.get("LOG_REQUEST_SAMPLE_RATE", "0.01"))
+    # Rotate a process's file once it reaches max_bytes or is rotate_seconds old, keeping backup_count old files
+    max_bytes: int = int(os.environ.get("LOG_MAX_BYTES", str(50 * 1024 ** 2)))
+    rotate_seconds: float = float(os.environ.get("LOG_ROTATE_SECONDS", str(24 * 3600)))
+    backup_count: int = int(os.environ.get("LOG_BACKUP_COUNT", "7"))
+    # Most records written per batch, and most records waiting; beyond that new records are dropped
+    # (and counted) instead of blocking the caller
+    batch_size: int = 512
+    queue_size: int = 100_000
+
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, source line, process,
+    the fields passed with extra={...} and the traceback, if any.
+    """
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random fraction of the records below WARNING; warnings and errors always pass.
+    Below the logger's level a call is skipped before any LogRecord is built; above it,
+    a sampled-out record costs one random() call.
+    """
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class LazyFileHandler(logging.FileHandler):
+    """
+    FileHandler that creates the log directory and opens the file on the first record,
+    so importing this module (e.g. in a serving worker) has no side effect on disk.
+    """
+    def __init__(self, filename):
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        # exist_ok=True prevents the code from crashing if the folder is already there.
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class RotatingSink:
+    """
+    Append-only file of one process, opened on the first write and rotated when it
+    exceeds max_bytes or is older than rotate_seconds: the current file is renamed to
+    <name>.<timestamp> and only the newest backup_count of those are kept.
+    Used by the writer thread only, so it needs no locking.
+    """
+    def __init__(self, file_path, config: LoggingConfig):
+        self.file_path = file_path
+        self.config = config
+        self._file = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        self._file = open(self.file_path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        self._opened_at = time.monotonic()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        suffix = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        os.replace(self.file_path, f"{self.file_path}.{suffix}")
+        backups = sorted(glob.glob(f"{glob.escape(self.file_path)}.*"))
+        for old_path in backups[:max(0, len(backups) - self.config.backup_count)]:
+            os.remove(old_path)
+
+    def write(self, text):
+        if self._file is None:
+            self._open()
+        elif self._size > 0 and (
+            self._size + len(text) > self.config.max_bytes
+            or time.monotonic() - self._opened_at >= self.config.rotate_seconds
+        ):
+            self._rotate()
+            self._open()
+        self._file.write(text)
+        # One flush per batch: the lines reach the OS together
+        self._file.flush()
+        self._size += len(text)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class AsyncBatchingHandler(logging.Handler):
+    """
+    Non-blocking handler: the calling thread only resolves the message and puts the record
+    on a queue; a daemon writer thread formats whatever has queued up and appends it to
+    this process's RotatingSink with a single write. If the queue is full the record is
+    dropped and counted rather than making the caller wait.
+
+    Every process writes its own file: a forked child (e.g. a gunicorn worker) starts a fresh
+    queue and writer on its first record and writes to <directory>/<its pid>.jsonl.
+    """
+    def __init__(self, directory, config: LoggingConfig):
+        super().__init__()
+        self.directory = directory
+        self.config = config
+        self.extension = "jsonl" if config.log_format == "json" else "log"
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.close)
+
+    def _reset(self):
+        # Nothing inherited across a fork is usable: the parent's writer thread does not exist
+        # here and its queue/lock may have been held by it
+        self._queue = queue.SimpleQueue()
+        self._start_lock = threading.Lock()
+        self._writer = None
+        # Incremented by every logging thread whose record didn't fit in the queue
+        self._dropped_lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def file_path(self):
+        return os.path.join(self.directory, f"{os.getpid()}.{self.extension}")
+
+    def _start_writer(self):
+        with self._start_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._run, args=(self._queue, RotatingSink(self.file_path, self.config)),
+                    name="log-writer", daemon=True,
+                )
+                self._writer.start()
+
+    def emit(self, record):
+        try:
+            # Resolve the message now: args may be mutated once the call returns
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            if self._writer is None:
+                self._start_writer()
+            if self._queue.qsize() >= self.config.queue_size:
+                with self._dropped_lock:
+                    self.dropped += 1
+                return
+            self._queue.put(record)
+        except Exception:
+            self.handleError(record)
+
+    def _run(self, records, sink):
+        # Queue items: a LogRecord, a threading.Event to set once everything before it is
+        # written (flush), or None to write what is left and stop
+        reported_drops = 0
+        while True:
+            batch = [records.get()]
+            while batch[-1] is not None and len(batch) < self.config.batch_size:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for item in batch:
+                if isinstance(item, logging.LogRecord):
+                    try:
+                        lines.append(self.format(item) + "\n")
+                    except Exception:
+                        self.handleError(item)
+            dropped = self.dropped
+            if dropped > reported_drops:
+                lines.append(self.format(logging.makeLogRecord({
+                    "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"Log queue full: dropped {dropped - reported_drops} records",
+                })) + "\n")
+                reported_drops = dropped
+            if lines:
+                try:
+                    sink.write("".join(lines))
+                except Exception as e:
+                    # Nowhere to log this to: report it on stderr like logging does for handler errors
+                    print(f"--- Logging error: could not write to {sink.file_path}: {e}", file=sys.stderr)
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if batch[-1] is None:
+                sink.close()
+                return
+
+    def flush(self, timeout=5):
+        """
+        Waits until every record queued so far has been written.
+        """
+        if self._writer is None or not self._writer.is_alive():
+            return
+        written = threading.Event()
+        self._queue.put(written)
+        written.wait(timeout)
+
+    def close(self):
+        # Write what is still queued, then stop the writer (at exit)
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+        self._writer = None
+        super().close()
+
+
+# 4. Configure the logging settings
+config = LoggingConfig()
+if config.backend == "async":
+    handler = AsyncBatchingHandler(logs_path, config)
+elif config.backend == "file":
+    handler = LazyFileHandler(LOG_FILE_PATH)
+else:
+    raise ValueError(f"Unknown LOG_BACKEND '{config.backend}', expected 'async' or 'file'")
+
+if config.log_format == "json":
+    handler.setFormatter(JsonFormatter())
+else:
+    handler.setFormatter(logging.Formatter(
+        # Format: [Time] Line_Number Name - Level - Message
+        "[%(asctime)s] %(lineno)d %(name)s - %(levelname)s - %(message)s"
+    ))
 logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    # Format: [Time] Line_Number Name - Level - Message
-    format="[%(asctime)s] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    # Set the minimum logging level to INFO (ignores DEBUG messages)
-    level=logging.INFO,
+    handlers=[handler],
+    # Minimum logging level (INFO by default, so DEBUG messages are ignored)
+    level=config.level.upper(),
 )
 
+# Per-request records from the serving path: a level switch and a sample, so that a skipped
+# request costs a level check or one random() call
+request_logger = logging.getLogger("src.requests")
+request_logger.setLevel(config.request_level.upper())
+request_logger.addFilter(SamplingFilter(config.request_sample_rate))
+
 if __name__ == "__main__":
     # Test message to ensure the logger is working properly
-    logging.info("Logging has started")
\ No newline at end of file
+    logging.info("Logging has started")
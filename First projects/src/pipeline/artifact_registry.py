@@ -0,0 +1,330 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from src.exception import CustomException
+from src.logger import logging
+from src.pipeline.drift_monitor import DriftReference
+from src.pipeline.fast_encoder import FastFeatureEncoder
+from src.pipeline.inference_bundle import InferenceBundle
+from src.pipeline.input_schema import InputSchema
+
+
+def artifact_version(*file_paths):
+    """
+    Short content hash of the given files, used as the model version.
+    Anything derived from model.pkl + preprocessor.pkl (bundle, prediction table) records
+    this value so it can be matched with the artifacts it was built from.
+    """
+    digest = hashlib.sha256()
+    for path in file_paths:
+        with open(path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+@dataclass
+class ArtifactRegistryConfig:
+    """
+    Configuration for the process-wide artifact registry.
+    The served paths, to which publish_artifacts copies what training staged.
+    """
+    model_file_path: str = os.path.join("artifacts", "model.pkl")
+    preprocessor_file_path: str = os.path.join("artifacts", "preprocessor.pkl")
+    # Training-time bin counts for the drift monitor, stamped with the version they were published with
+    drift_reference_file_path: str = os.path.join("artifacts", "drift_reference.json")
+    # Version marker of the pickles, written by publish_artifacts once both are in place
+    version_file_path: str = os.path.join("artifacts", "model_version.json")
+    # Fused NumPy-only artifact written by ModelExporter; served instead of the pickles when use_bundle is set
+    bundle_file_path: str = os.path.join("artifacts", "model_bundle.npz")
+    use_bundle: bool = os.environ.get("USE_INFERENCE_BUNDLE", "0") == "1"
+    # Minimum number of seconds between two freshness checks on disk.
+    # A stat() per request is cheap, but there is no need to do it thousands of times a second.
+    check_interval: float = 1.0
+
+
+def _replace_with_copy(source_path, file_path):
+    # Copy next to the target, then rename over it: readers see the old file or the new one
+    if os.path.abspath(source_path) == os.path.abspath(file_path):
+        return
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    shutil.copyfile(source_path, tmp_path)
+    os.replace(tmp_path, file_path)
+
+
+def published_version(config: ArtifactRegistryConfig = None):
+    """
+    The version named by the marker, i.e. the one being served
+    """
+    config = config or ArtifactRegistryConfig()
+    if not os.path.exists(config.version_file_path):
+        raise FileNotFoundError(
+            f"No published model version at {os.path.abspath(config.version_file_path)}: "
+            f"train a model (or call publish_artifacts) first"
+        )
+    with open(config.version_file_path) as file_obj:
+        return json.load(file_obj)["version"]
+
+
+def publish_artifacts(staged_model_path, staged_preprocessor_path, staged_drift_reference_path=None,
+                      config: ArtifactRegistryConfig = None):
+    """
+    Makes a newly trained pair the served one. Training writes model.pkl and preprocessor.pkl
+    to a staging directory (see ModelTrainerConfig / DataTransformationConfig); only once both
+    exist are they copied over the served pickles, one right after the other, and the version
+    marker is written last. The registry only reloads when the marker changes, so neither a
+    half-published pair nor a retrain that fails halfway is ever served.
+    The staged drift reference, if any, is published stamped with the new version; without one,
+    the served reference keeps its old version and is ignored by the registry.
+    Output: the published version
+    """
+    try:
+        config = config or ArtifactRegistryConfig()
+        for path in (staged_model_path, staged_preprocessor_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Nothing to publish: {os.path.abspath(path)} was not written")
+
+        _replace_with_copy(staged_model_path, config.model_file_path)
+        _replace_with_copy(staged_preprocessor_path, config.preprocessor_file_path)
+        version = artifact_version(config.model_file_path, config.preprocessor_file_path)
+        if staged_drift_reference_path is not None and os.path.exists(staged_drift_reference_path):
+            DriftReference.stamp(staged_drift_reference_path, config.drift_reference_file_path, version)
+        else:
+            logging.warning(f"No drift reference staged for version {version}: drift checks are off until the next retrain")
+
+        tmp_path = f"{config.version_file_path}.tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump({"version": version, "published_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, file_obj)
+        os.replace(tmp_path, config.version_file_path)
+        logging.info(f"Published model artifacts version {version}")
+        return version
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+@dataclass(frozen=True)
+class LoadedArtifacts:
+    """
+    An immutable snapshot of the model and the preprocessor that were loaded together.
+    Callers grab one snapshot per prediction so both objects always come from the same training run.
+    """
+    model: object
+    preprocessor: object
+    version: str
+    loaded_at: float
+    # Compiled single-row encoder, or None if the preprocessor could not be compiled
+    encoder: FastFeatureEncoder = None
+    # Inputs the preprocessor can encode, or None if they could not be read from it
+    schema: InputSchema = None
+    # {column: bin counts} of the training rows for the drift monitor, or None if there are none
+    drift_reference: dict = None
+
+
+class ArtifactRegistry:
+    """
+    Loads model.pkl and preprocessor.pkl (or, with use_bundle, model_bundle.npz) once and
+    shares them across requests and threads.
+    The version marker (model_version.json, written after both pickles) says which version is
+    served: when it changes on disk (new mtime/size AND new version) the pair is reloaded and
+    swapped in atomically, so a retrain can replace the model without a restart. With use_bundle
+    the bundle is also watched, and only served while it was exported from the published version;
+    a missing or stale bundle falls back to the pickles.
+    """
+    def __init__(self, config: ArtifactRegistryConfig = None):
+        self.config = config or ArtifactRegistryConfig()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._fingerprint = None
+        self._last_check = float("-inf")
+        self._reload_listeners = []
+
+    def add_reload_listener(self, callback):
+        """
+        Registers callback(snapshot), called every time a new model version is published
+        (e.g. to drop caches that hold predictions of the previous model).
+        """
+        self._reload_listeners.append(callback)
+
+    def artifact_paths(self):
+        """
+        The files whose change triggers a reload: the version marker, and the bundle with use_bundle.
+        """
+        if self.config.use_bundle:
+            return (self.config.version_file_path, self.config.bundle_file_path)
+        return (self.config.version_file_path,)
+
+    def _stat_fingerprint(self):
+        # (mtime, size) of the watched files; changes whenever a new version is published.
+        # The marker must exist; the bundle may not (a model type it can't hold)
+        fingerprint = []
+        for path in self.artifact_paths():
+            if path != self.config.version_file_path and not os.path.exists(path):
+                fingerprint.append(None)
+                continue
+            stat = os.stat(path)
+            fingerprint.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def _published_bundle(self, version):
+        """
+        The inference bundle if it was exported from the published version, otherwise None.
+        """
+        if not os.path.exists(self.config.bundle_file_path):
+            logging.warning(f"No inference bundle for version {version}, serving the pickles")
+            return None
+        try:
+            bundle = InferenceBundle.load(self.config.bundle_file_path)
+        except Exception as e:
+            logging.warning(f"Inference bundle unreadable, serving the pickles of version {version}: {e}")
+            return None
+        if bundle.version != version:
+            logging.warning(
+                f"Inference bundle is of version {bundle.version}, not the published {version}: serving the pickles"
+            )
+            return None
+        return bundle
+
+    def _read_pickles(self, version):
+        """
+        Deserializes model.pkl and preprocessor.pkl from the bytes they were hashed from, so the
+        pair is exactly the one the marker names; a pair that doesn't match it is refused.
+        """
+        contents = []
+        for path in (self.config.model_file_path, self.config.preprocessor_file_path):
+            with open(path, "rb") as file_obj:
+                contents.append(file_obj.read())
+        digest = hashlib.sha256()
+        for content in contents:
+            digest.update(content)
+        if digest.hexdigest()[:12] != version:
+            raise ValueError(
+                f"model.pkl and preprocessor.pkl don't match the published version {version} "
+                f"(being rewritten by a retrain?)"
+            )
+        import dill
+        return dill.loads(contents[0]), dill.loads(contents[1])
+
+    def _load(self, fingerprint):
+        # Must be called with self._lock held
+        version = published_version(self.config)
+
+        # Same bytes (e.g. a 'touch' or an identical re-save): keep the objects we already have
+        if self._snapshot is not None and version == self._snapshot.version:
+            self._fingerprint = fingerprint
+            return self._snapshot
+
+        # The bundle is small and carries the version of the pickles it was exported from
+        bundle = self._published_bundle(version) if self.config.use_bundle else None
+        if bundle is not None:
+            # 1-2. The bundle already holds the compiled encoder and a NumPy model
+            model, preprocessor, encoder = bundle.model, bundle.preprocessor, bundle.encoder
+        else:
+            # 1. Deserialize into locals first, so readers never see a half-loaded pair
+            model, preprocessor = self._read_pickles(version)
+
+            # 2. Compile the single-row fast path; fall back to the preprocessor if it can't be compiled
+            try:
+                encoder = FastFeatureEncoder.from_preprocessor(preprocessor)
+            except CustomException as e:
+                logging.warning(f"Fast feature encoder disabled for version {version}: {e}")
+                encoder = None
+
+        # 3. Read the categories and columns requests are validated against
+        try:
+            schema = InputSchema.from_preprocessor(preprocessor)
+        except CustomException as e:
+            logging.warning(f"Input schema unavailable for version {version}: {e}")
+            schema = None
+
+        # 4. The training rows' drift counts: a small file, never the training data itself.
+        # Only those published with this version (not a previous model's, after a failed retrain)
+        try:
+            drift_reference = DriftReference.load(self.config.drift_reference_file_path, version=version)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Drift reference unavailable for version {version}: {e}")
+            drift_reference = None
+
+        # 5. Publish the new pair with a single reference assignment
+        self._snapshot = LoadedArtifacts(
+            model=model,
+            preprocessor=preprocessor,
+            version=version,
+            loaded_at=time.time(),
+            encoder=encoder,
+            schema=schema,
+            drift_reference=drift_reference,
+        )
+        self._fingerprint = fingerprint
+        logging.info(f"Loaded model artifacts version {version}")
+
+        # 6. Tell dependents about the new version; a failing listener must not block the reload
+        for callback in self._reload_listeners:
+            try:
+                callback(self._snapshot)
+            except Exception as e:
+                logging.warning(f"Reload listener {callback!r} failed: {e}")
+        return self._snapshot
+
+    def get(self) -> LoadedArtifacts:
+        """
+        Returns the current snapshot, loading it on first use and reloading it
+        if the artifact files changed since the last check.
+        """
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._last_check < self.config.check_interval:
+            return snapshot
+
+        with self._lock:
+            # Another thread may have refreshed while we were waiting for the lock
+            if self._snapshot is not None and now - self._last_check < self.config.check_interval:
+                return self._snapshot
+            self._last_check = now
+
+            try:
+                fingerprint = self._stat_fingerprint()
+                if self._snapshot is not None and fingerprint == self._fingerprint:
+                    return self._snapshot
+                return self._load(fingerprint)
+
+            except Exception as e:
+                # The marker may name pickles that are being replaced again: keep serving the old pair
+                if self._snapshot is not None:
+                    logging.warning(f"Artifact reload failed, keeping version {self._snapshot.version}: {e}")
+                    return self._snapshot
+                raise CustomException(e, sys)
+
+    def reload(self) -> LoadedArtifacts:
+        """
+        Forces a freshness check on the next call, ignoring check_interval.
+        """
+        self._last_check = float("-inf")
+        return self.get()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._snapshot is not None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_artifact_registry() -> ArtifactRegistry:
+    """
+    Returns the process-wide registry, creating it on first use.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ArtifactRegistry()
+    return _registry
@@ -0,0 +1,357 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.exception import CustomException
+from src.logger import logging
+from src.pipeline.input_schema import InputSchema
+
+
+@dataclass
+class DriftMonitorConfig:
+    """
+    Input drift monitoring of the served traffic.
+    DRIFT_MONITOR=0 turns it off. The traffic of the last DRIFT_WINDOW_SECONDS is compared
+    with the training rows, feature by feature; a population stability index above
+    DRIFT_PSI_THRESHOLD (0.2 is the usual 'significant shift') is reported as drift.
+    """
+    enabled: bool = os.environ.get("DRIFT_MONITOR", "1") == "1"
+    # Counts are kept for the last window_seconds, as window_slices sub-counts
+    window_seconds: float = float(os.environ.get("DRIFT_WINDOW_SECONDS", "3600"))
+    window_slices: int = 12
+    # Equal-width bins over the allowed score range (plus below / above / missing)
+    n_bins: int = 10
+    psi_threshold: float = float(os.environ.get("DRIFT_PSI_THRESHOLD", "0.2"))
+    # Fewer rows in the window: no PSI, the sample is too small to tell drift from noise
+    min_rows: int = 500
+    # Minimum number of seconds between two drift checks on the recording path
+    check_interval: float = 60.0
+
+
+def population_stability_index(expected, actual, eps=1e-4):
+    """
+    PSI between two distributions given as aligned count arrays:
+    sum((a - e) * ln(a / e)) over the bins, on proportions floored at eps.
+    """
+    expected = np.maximum(np.asarray(expected, dtype=np.float64) / max(np.sum(expected), 1), eps)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64) / max(np.sum(actual), 1), eps)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def _bin_rows(schema, result, n_bins):
+    """
+    {column: bin index per row} of a ValidationResult, and {column: number of bins}.
+    Categories: their index, then unknown, then missing. Scores: below the range,
+    n_bins equal-width bins, above the range, then missing / not a number.
+    """
+    bins, sizes = {}, {}
+    for col, categories in schema.categories.items():
+        if categories is not None:
+            bins[col] = result.codes[col]
+            sizes[col] = len(categories) + 2
+    # side="right" puts a value equal to an edge in the bin above it, so the last edge is
+    # nudged up to keep the maximum score in the last bin; NaN sorts after everything
+    low, high = schema.config.score_min, schema.config.score_max
+    edges = np.linspace(low, high, n_bins + 1)
+    edges[-1] = np.nextafter(high, np.inf)
+    for col in schema.numerical_columns:
+        values = result.codes[col]
+        bins[col] = np.searchsorted(edges, values, side="right") + np.isnan(values)
+        sizes[col] = n_bins + 3
+    return bins, sizes
+
+
+class DriftReference:
+    """
+    The training rows binned like the served traffic, built at training time (next to the
+    preprocessor, see DataTransformation) so that serving compares against a small file of
+    counts instead of reading the training data.
+    partial_fit takes the rows in as many chunks as needed.
+    Training saves it to staging; publish_artifacts stamps it with the version of the model it
+    is published with, and serving ignores a reference stamped with another version.
+    """
+    def __init__(self, schema, config: DriftMonitorConfig = None):
+        self.schema = schema
+        self.config = config or DriftMonitorConfig()
+        self.n_rows = 0
+        self.counts = {}
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor, config: DriftMonitorConfig = None):
+        return cls(InputSchema.from_preprocessor(preprocessor), config)
+
+    def partial_fit(self, frame):
+        # frame: a DataFrame (or {column: sequence}) of raw feature columns
+        columns = {col: list(frame[col]) for col in self.schema.columns if col in frame}
+        bins, sizes = _bin_rows(self.schema, self.schema.validate(columns), self.config.n_bins)
+        for col, index in bins.items():
+            counts = np.bincount(index, minlength=sizes[col])
+            self.counts[col] = self.counts[col] + counts if col in self.counts else counts
+        self.n_rows += len(next(iter(columns.values()), []))
+        return self
+
+    def save(self, file_path):
+        """
+        Writes {"rows", "n_bins", "counts": {column: [count per bin]}} as JSON (temporary file + rename).
+        """
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, "w") as file_obj:
+                json.dump({
+                    "rows": self.n_rows,
+                    "n_bins": self.config.n_bins,
+                    "counts": {col: counts.tolist() for col, counts in self.counts.items()},
+                }, file_obj)
+            os.replace(tmp_path, file_path)
+            logging.info(f"Drift reference of {self.n_rows} training rows written to {file_path}")
+            return file_path
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def _read(file_path, version=None):
+        with open(file_path) as file_obj:
+            saved = json.load(file_obj)
+        if version is not None and saved.get("version") != version:
+            raise ValueError(f"{file_path} is the drift reference of version {saved.get('version')}, not {version}")
+        return saved
+
+    @staticmethod
+    def stamp(source_path, file_path, version):
+        """
+        Copies a saved reference to file_path with the model version it is published with
+        (temporary file + rename).
+        """
+        saved = DriftReference._read(source_path)
+        saved["version"] = version
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(saved, file_obj)
+        os.replace(tmp_path, file_path)
+        return file_path
+
+    @staticmethod
+    def load(file_path, version=None):
+        """
+        {column: counts} saved by save()
+        version: only accept a reference stamped with this model version (ValueError otherwise)
+        """
+        saved = DriftReference._read(file_path, version)
+        return {col: np.asarray(counts, dtype=np.int64) for col, counts in saved["counts"].items()}
+
+    @classmethod
+    def from_file(cls, preprocessor, file_path, version=None, config: DriftMonitorConfig = None):
+        """
+        A reference saved by save(), to be extended with more rows (see IncrementalTrainer)
+        """
+        reference = cls.from_preprocessor(preprocessor, config)
+        saved = cls._read(file_path, version)
+        if saved["n_bins"] != reference.config.n_bins:
+            raise ValueError(f"{file_path} has {saved['n_bins']} bins per score, not {reference.config.n_bins}")
+        reference.n_rows = saved["rows"]
+        reference.counts = {col: np.asarray(counts, dtype=np.int64) for col, counts in saved["counts"].items()}
+        return reference
+
+
+class DriftMonitor:
+    """
+    Constant-memory sketches of the inputs the model is asked about: a count per category
+    (+ unknown, + missing) of every categorical column and a histogram of every score,
+    over a sliding time window. No request is stored.
+    The window is split into slices like the latency histograms of the request tracer:
+    recording adds to the newest slice and a whole slice is dropped once it is too old.
+    The training rows were binned the same way when the model was trained (DriftReference,
+    loaded by the artifact registry with the model), and each feature's window counts are
+    compared with those by PSI.
+    """
+    def __init__(self, config: DriftMonitorConfig = None):
+        self.config = config or DriftMonitorConfig()
+        self.slice_seconds = self.config.window_seconds / self.config.window_slices
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._reset(None, None)
+
+    def _reset(self, schema, reference):
+        # Sketches only make sense for one schema (bins follow its categories): a new model starts over
+        self._schema = schema
+        # {column: counts} of the training rows of that model, or None if it has none
+        self._reference = reference
+        # (slice id, {column: counts}), oldest first
+        self._slices = deque()
+        self._last_check = time.monotonic()
+        self.rows_total = 0
+        self.psi = {}
+        self.drifted = []
+
+    def bin_labels(self, schema):
+        # Names of the bins of every monitored column, in bin order
+        low, high, n_bins = schema.config.score_min, schema.config.score_max, self.config.n_bins
+        edges = np.linspace(low, high, n_bins + 1)
+        labels = {
+            col: categories + ["<unknown>", "<missing>"]
+            for col, categories in schema.categories.items() if categories is not None
+        }
+        for col in schema.numerical_columns:
+            labels[col] = (
+                [f"<{low:g}"] + [f"{edges[i]:g}-{edges[i + 1]:g}" for i in range(n_bins)]
+                + [f">{high:g}", "<missing>"]
+            )
+        return labels
+
+    def record(self, schema, result, reference=None, now=None):
+        """
+        Adds the rows of a ValidationResult (valid or not) to the current window.
+        reference: the DriftReference counts of the model the schema belongs to
+        """
+        if not self.config.enabled or len(result.valid) == 0:
+            return
+        bins, sizes = _bin_rows(schema, result, self.config.n_bins)
+        now = time.monotonic() if now is None else now
+        slice_id = int(now // self.slice_seconds)
+
+        with self._lock:
+            if schema is not self._schema:
+                self._reset(schema, reference)
+            if not self._slices or self._slices[-1][0] != slice_id:
+                self._prune(slice_id)
+                self._slices.append((slice_id, {col: np.zeros(size, dtype=np.int64) for col, size in sizes.items()}))
+            counts = self._slices[-1][1]
+            for col, index in bins.items():
+                if len(index) == 1:
+                    counts[col][index[0]] += 1
+                else:
+                    counts[col] += np.bincount(index, minlength=sizes[col])
+            self.rows_total += len(result.valid)
+            due = now - self._last_check >= self.config.check_interval
+
+        # One thread runs the periodic check, the others carry on
+        if due and self._check_lock.acquire(blocking=False):
+            try:
+                self._last_check = now
+                self.check(now)
+            except Exception as e:
+                logging.warning(f"Drift check failed: {e}")
+            finally:
+                self._check_lock.release()
+
+    def _prune(self, slice_id):
+        # Must be called with self._lock held
+        while self._slices and self._slices[0][0] <= slice_id - self.config.window_slices:
+            self._slices.popleft()
+
+    def _window(self, now=None):
+        # (schema, reference counts, {column: counts over the window}), read together under the lock
+        slice_id = int((time.monotonic() if now is None else now) // self.slice_seconds)
+        with self._lock:
+            self._prune(slice_id)
+            merged = {}
+            for _, counts in self._slices:
+                for col, column_counts in counts.items():
+                    merged[col] = merged[col] + column_counts if col in merged else column_counts.copy()
+            return self._schema, self._reference, merged
+
+    def window_counts(self, now=None):
+        """
+        (schema, {column: counts over the window}); (None, {}) before the first record.
+        """
+        schema, _, merged = self._window(now)
+        return schema, merged
+
+    def check(self, now=None):
+        """
+        Compares the window with the training rows and logs the features that drifted.
+        Output: {column: PSI}, empty while the window holds fewer than min_rows rows
+        """
+        schema, reference, window = self._window(now)
+        n_rows = int(next(iter(window.values())).sum()) if window else 0
+        if schema is None or n_rows < self.config.min_rows:
+            return {}
+        if reference is None:
+            logging.warning("Drift check skipped: the served model has no drift reference")
+            return {}
+
+        # A reference binned differently (other categories or n_bins) can't be compared
+        psi = {
+            col: population_stability_index(reference[col], window[col])
+            for col in window if col in reference and len(reference[col]) == len(window[col])
+        }
+        drifted = sorted(col for col, value in psi.items() if value > self.config.psi_threshold)
+        for col in drifted:
+            if col not in self.drifted:
+                logging.warning(
+                    f"Input drift on {col}: PSI {psi[col]:.3f} > {self.config.psi_threshold} "
+                    f"over the last {n_rows} rows"
+                )
+        if self.drifted and not drifted:
+            logging.info("Input drift cleared")
+        self.psi, self.drifted = psi, drifted
+        return psi
+
+    def stats(self):
+        """
+        Totals for /metrics; PSI values are those of the last check.
+        """
+        return {
+            "enabled": self.config.enabled,
+            "rows_total": self.rows_total,
+            "psi": dict(self.psi),
+            "max_psi": max(self.psi.values(), default=0.0),
+            "drifted_features": len(self.drifted),
+        }
+
+    def report(self, now=None):
+        """
+        Per feature: PSI, drift flag, the bin labels and the proportion of each bin in the
+        window and in the training rows.
+        Runs a check first, so the values are current.
+        """
+        psi = self.check(now)
+        schema, reference, window = self._window(now)
+        if schema is None:
+            return {"window_rows": 0, "features": {}}
+        reference = reference if psi else {}
+        labels = self.bin_labels(schema)
+
+        def proportions(counts):
+            return [round(int(count) / max(int(counts.sum()), 1), 4) for count in counts]
+
+        features = {}
+        for col, counts in window.items():
+            features[col] = {
+                "psi": psi.get(col),
+                "drifted": col in self.drifted,
+                "bins": labels[col],
+                "window": proportions(counts),
+                "reference": proportions(reference[col]) if col in reference else None,
+            }
+        return {
+            "window_seconds": self.config.window_seconds,
+            "window_rows": int(next(iter(window.values())).sum()) if window else 0,
+            "min_rows": self.config.min_rows,
+            "psi_threshold": self.config.psi_threshold,
+            "features": features,
+        }
+
+
+_drift_monitor = None
+_drift_monitor_lock = threading.Lock()
+
+
+def get_drift_monitor() -> DriftMonitor:
+    """
+    Returns the process-wide drift monitor, creating it on first use.
+    """
+    global _drift_monitor
+    if _drift_monitor is None:
+        with _drift_monitor_lock:
+            if _drift_monitor is None:
+                _drift_monitor = DriftMonitor()
+    return _drift_monitor
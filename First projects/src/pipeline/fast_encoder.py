@@ -0,0 +1,241 @@
+import math
+import sys
+
+import numpy as np
+
+from src.exception import CustomException
+
+
+class FastFeatureEncoder:
+    """
+    A compiled copy of the fitted preprocessor for single-row inference.
+
+    DataTransformation builds a ColumnTransformer of
+        num_pipeline: SimpleImputer(median) -> StandardScaler
+        cat_pipeline: SimpleImputer(most_frequent) -> OneHotEncoder -> StandardScaler(with_mean=False)
+    Going through pandas + ColumnTransformer for one row costs far more than the model itself.
+    This class reads the fitted statistics out of that preprocessor once and then maps a
+    dict of raw fields straight into a NumPy row with plain dict lookups and arithmetic.
+    """
+    def __init__(self, numerical, categorical, n_features):
+        # numerical:   [(column, output_index, fill_value, mean, scale), ...]
+        # categorical: [(column, fill_value, {category: output_index}), ...]
+        self.numerical = numerical
+        self.categorical = categorical
+        self.n_features = n_features
+
+        # Preallocated template row: every one-hot slot starts "cold".
+        # encode() copies it and only writes the slots that change.
+        self._template = np.zeros((1, n_features), dtype=np.float64)
+        self._hot_values = np.zeros(n_features, dtype=np.float64)
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor, verify: bool = True):
+        """
+        Compiles the fitted ColumnTransformer into a FastFeatureEncoder.
+        With verify=True the result is checked against preprocessor.transform
+        on rows covering every category and the imputation paths.
+        """
+        try:
+            numerical, categorical = [], []
+            cold_values, hot_values = {}, {}
+
+            for name, pipeline, columns in preprocessor.transformers_:
+                if name == "remainder":
+                    if len(columns) and pipeline != "drop":
+                        raise ValueError("Passthrough remainder columns are not supported")
+                    continue
+
+                steps = dict(pipeline.steps)
+                out_slice = preprocessor.output_indices_[name]
+                imputer = steps.get("imputer")
+
+                if "one_hot_encoder" in steps:
+                    encoder = steps["one_hot_encoder"]
+                    if encoder.drop is not None:
+                        raise ValueError("OneHotEncoder(drop=...) is not supported")
+                    scaler = steps.get("scaler")
+
+                    offset = out_slice.start
+                    for i, column in enumerate(columns):
+                        fill_value = imputer.statistics_[i] if imputer is not None else None
+                        lookup = {}
+                        for category in encoder.categories_[i]:
+                            lookup[category] = offset
+                            offset += 1
+                        categorical.append((column, fill_value, lookup))
+
+                    # One-hot output is 0 or 1 before scaling; precompute both scaled values
+                    n_out = out_slice.stop - out_slice.start
+                    mean = scaler.mean_ if scaler is not None and scaler.with_mean else np.zeros(n_out)
+                    scale = scaler.scale_ if scaler is not None and scaler.with_std else np.ones(n_out)
+                    for j in range(n_out):
+                        cold_values[out_slice.start + j] = (0.0 - mean[j]) / scale[j]
+                        hot_values[out_slice.start + j] = (1.0 - mean[j]) / scale[j]
+                else:
+                    scaler = steps.get("scaler")
+                    for i, column in enumerate(columns):
+                        fill_value = float(imputer.statistics_[i]) if imputer is not None else math.nan
+                        mean = float(scaler.mean_[i]) if scaler is not None and scaler.with_mean else 0.0
+                        scale = float(scaler.scale_[i]) if scaler is not None and scaler.with_std else 1.0
+                        numerical.append((column, out_slice.start + i, fill_value, mean, scale))
+
+            n_features = sum(s.stop - s.start for s in preprocessor.output_indices_.values())
+            fast_encoder = cls(numerical, categorical, n_features)
+            for index, value in cold_values.items():
+                fast_encoder._template[0, index] = value
+            for index, value in hot_values.items():
+                fast_encoder._hot_values[index] = value
+
+            if verify:
+                # The encoder runs the same float operations as the preprocessor: anything but an
+                # exact match is a bug, not rounding
+                max_error = check_parity(fast_encoder, preprocessor)
+                if max_error != 0.0:
+                    raise ValueError(f"Fast encoder does not match the preprocessor (max error {max_error})")
+
+            return fast_encoder
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def to_dict(self):
+        """
+        JSON-serializable description of the encoder plus its two arrays,
+        so it can be stored in an inference bundle and rebuilt with from_dict.
+        """
+        meta = {
+            "n_features": self.n_features,
+            "numerical": [
+                [column, index, fill_value, mean, scale]
+                for column, index, fill_value, mean, scale in self.numerical
+            ],
+            "categorical": [
+                [column, None if fill_value is None else str(fill_value), [str(c) for c in lookup], list(lookup.values())]
+                for column, fill_value, lookup in self.categorical
+            ],
+        }
+        arrays = {"template": self._template, "hot_values": self._hot_values}
+        return meta, arrays
+
+    @classmethod
+    def from_dict(cls, meta, arrays):
+        numerical = [tuple(entry) for entry in meta["numerical"]]
+        categorical = [
+            (column, fill_value, dict(zip(categories, indices)))
+            for column, fill_value, categories, indices in meta["categorical"]
+        ]
+        fast_encoder = cls(numerical, categorical, meta["n_features"])
+        fast_encoder._template[...] = arrays["template"]
+        fast_encoder._hot_values[...] = arrays["hot_values"]
+        return fast_encoder
+
+    @property
+    def columns(self):
+        return [column for column, *_ in self.categorical] + [column for column, *_ in self.numerical]
+
+    def encode(self, record: dict, out: np.ndarray = None) -> np.ndarray:
+        """
+        Input: a dict of raw fields, e.g. CustomData.get_data_as_dict()
+        Output: a (1, n_features) array equal to preprocessor.transform on the same row
+        Pass a preallocated `out` row to avoid the allocation entirely.
+        """
+        if out is None:
+            out = self._template.copy()
+        else:
+            out[...] = self._template
+
+        row = out[0]
+        for column, index, fill_value, mean, scale in self.numerical:
+            value = record.get(column)
+            value = fill_value if value is None or value != value else float(value)
+            row[index] = (value - mean) / scale
+
+        for column, fill_value, lookup in self.categorical:
+            value = record.get(column)
+            if value is None or value != value:
+                value = fill_value
+            index = lookup.get(value)
+            if index is None:
+                # Same failure the OneHotEncoder(handle_unknown="error") would raise
+                raise ValueError(f"Found unknown category {value!r} in column {column}")
+            row[index] = self._hot_values[index]
+
+        return out
+
+    def encode_batch(self, columns) -> np.ndarray:
+        """
+        Vectorized encode for many rows.
+        Input: a mapping of column name -> sequence of raw values (a dict of lists or a DataFrame)
+        Output: a (n_rows, n_features) array equal to preprocessor.transform on the same rows
+        """
+        n_rows = len(columns[self.numerical[0][0]] if self.numerical else columns[self.categorical[0][0]])
+        out = np.repeat(self._template, n_rows, axis=0)
+        rows = np.arange(n_rows)
+
+        for column, index, fill_value, mean, scale in self.numerical:
+            values = np.asarray(columns[column], dtype=np.float64)
+            values = np.where(np.isnan(values), fill_value, values)
+            out[:, index] = (values - mean) / scale
+
+        for column, fill_value, lookup in self.categorical:
+            values = np.asarray(columns[column], dtype=object)
+            is_missing = np.fromiter((v is None or v != v for v in values), dtype=bool, count=n_rows)
+            if is_missing.any():
+                values = values.copy()
+                values[is_missing] = fill_value
+            values = values.astype(str)
+
+            # Sorted-array lookup of every value's output slot
+            categories = np.array(list(lookup), dtype=str)
+            slots = np.array(list(lookup.values()))
+            order = np.argsort(categories)
+            categories, slots = categories[order], slots[order]
+            positions = np.clip(np.searchsorted(categories, values), 0, len(categories) - 1)
+            is_known = categories[positions] == values
+            if not is_known.all():
+                unknown = sorted(set(values[~is_known]))
+                raise ValueError(f"Found unknown categories {unknown} in column {column}")
+
+            index = slots[positions]
+            out[rows, index] = self._hot_values[index]
+
+        return out
+
+
+def check_parity(fast_encoder: FastFeatureEncoder, preprocessor, records=None) -> float:
+    """
+    Returns the largest absolute difference between preprocessor.transform and both
+    fast_encoder.encode (row by row) and fast_encoder.encode_batch; 0.0 only if they are
+    exactly equal (np.array_equal). By default the rows cover every category of every
+    column plus a row of missing values, so each output slot is exercised.
+    """
+    import pandas as pd
+
+    if records is None:
+        records = []
+        longest = max(len(lookup) for _, _, lookup in fast_encoder.categorical)
+        for i in range(longest):
+            record = {}
+            for column, _, lookup in fast_encoder.categorical:
+                categories = list(lookup)
+                record[column] = categories[i % len(categories)]
+            for j, (column, *_) in enumerate(fast_encoder.numerical):
+                record[column] = float(10 * i + j)
+            records.append(record)
+        records.append({column: np.nan for column in fast_encoder.columns})
+
+    expected = preprocessor.transform(pd.DataFrame.from_records(records, columns=fast_encoder.columns))
+    if hasattr(expected, "toarray"):
+        expected = expected.toarray()
+
+    max_error = 0.0
+    for actual in (
+        np.vstack([fast_encoder.encode(record) for record in records]),
+        fast_encoder.encode_batch({column: [record.get(column) for record in records] for column in fast_encoder.columns}),
+    ):
+        if not np.array_equal(actual, expected):
+            # NaN in either output counts as an infinite difference
+            difference = np.nan_to_num(np.abs(actual - expected), nan=np.inf)
+            max_error = max(max_error, float(np.max(difference)), np.finfo(np.float64).tiny)
+    return max_error
@@ -0,0 +1,157 @@
+import json
+import sys
+
+import numpy as np
+
+from src.exception import CustomException
+from src.pipeline.fast_encoder import FastFeatureEncoder
+
+# Bumped whenever the layout of the .npz file changes
+BUNDLE_FORMAT_VERSION = 1
+
+
+class BundlePreprocessor:
+    """
+    Stand-in for the sklearn ColumnTransformer: transform() runs the compiled FastFeatureEncoder.
+    """
+    def __init__(self, encoder: FastFeatureEncoder):
+        self.encoder = encoder
+
+    def transform(self, features):
+        return self.encoder.encode_batch(features)
+
+
+class LinearBundleModel:
+    """
+    Linear models (LinearRegression / Ridge / Lasso) as a coefficient vector and an intercept.
+    """
+    def __init__(self, coef, intercept):
+        self.coef = coef
+        self.intercept = float(intercept)
+
+    def predict(self, X):
+        if hasattr(X, "toarray"):
+            X = X.toarray()
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+
+class TreeEnsembleBundleModel:
+    """
+    Tree ensembles flattened into node arrays (all trees concatenated):
+        feature[node]   split feature, -1 for a leaf
+        threshold[node] split threshold
+        left/right      absolute index of the children
+        value[node]     leaf value
+        roots[t]        index of the root of tree t
+    Prediction walks every (row, tree) pair down one level per step with NumPy indexing,
+    then combines the leaf values according to `aggregation`.
+    """
+    def __init__(self, arrays, meta):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.tree_weights = arrays["tree_weights"]
+
+        self.max_depth = int(meta["max_depth"])
+        self.aggregation = meta["aggregation"]
+        # "le": go left when x <= threshold (sklearn, catboost); "lt": when x < threshold (xgboost)
+        self.split_rule = meta["split_rule"]
+        self.base_score = float(meta.get("base_score", 0.0))
+        self.scale = float(meta.get("scale", 1.0))
+        # Bounds the (rows x trees) index matrices to roughly 8M entries per chunk
+        self.chunk_rows = max(1, 8_000_000 // len(self.roots))
+
+    def leaf_values(self, X):
+        """
+        Returns the (n_rows, n_trees) matrix of leaf values reached by each row in each tree.
+        """
+        if hasattr(X, "toarray"):
+            X = X.toarray()
+        # All the supported libraries compare float32 feature values
+        X = np.asarray(X, dtype=np.float32)
+        go_left = np.less_equal if self.split_rule == "le" else np.less
+
+        values = np.empty((len(X), len(self.roots)), dtype=np.float64)
+        for start in range(0, len(X), self.chunk_rows):
+            X_chunk = X[start:start + self.chunk_rows]
+            rows = np.arange(len(X_chunk))[:, None]
+            node = np.repeat(self.roots[None, :], len(X_chunk), axis=0)
+
+            for _ in range(self.max_depth):
+                feature = self.feature[node]
+                is_split = feature >= 0
+                if not is_split.any():
+                    break
+                x = X_chunk[rows, np.where(is_split, feature, 0)]
+                child = np.where(go_left(x, self.threshold[node]), self.left[node], self.right[node])
+                node = np.where(is_split, child, node)
+
+            values[start:start + len(X_chunk)] = self.value[node]
+        return values
+
+    def predict(self, X):
+        values = self.leaf_values(X)
+
+        if self.aggregation == "mean":
+            return values.mean(axis=1)
+        if self.aggregation == "sum":
+            return self.base_score + self.scale * values.sum(axis=1)
+        if self.aggregation == "weighted_median":
+            # AdaBoostRegressor: weighted median of the tree predictions
+            order = np.argsort(values, axis=1)
+            weight_cdf = np.cumsum(self.tree_weights[order], axis=1)
+            median_or_above = weight_cdf >= 0.5 * weight_cdf[:, -1:]
+            median_position = median_or_above.argmax(axis=1)
+            median_tree = order[np.arange(len(values)), median_position]
+            return values[np.arange(len(values)), median_tree]
+
+        raise ValueError(f"Unknown aggregation '{self.aggregation}'")
+
+
+class InferenceBundle:
+    """
+    A fused, versioned preprocessor + model artifact written by ModelExporter.
+    Loading it needs NumPy only, so the serving path does not import sklearn, xgboost or catboost.
+    """
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.encoder = FastFeatureEncoder.from_dict(
+            meta["encoder"], {"template": arrays["encoder_template"], "hot_values": arrays["encoder_hot_values"]}
+        )
+        self.preprocessor = BundlePreprocessor(self.encoder)
+
+        if meta["model_type"] == "linear":
+            self.model = LinearBundleModel(arrays["coef"], meta["intercept"])
+        elif meta["model_type"] == "trees":
+            self.model = TreeEnsembleBundleModel(arrays, meta)
+        else:
+            raise ValueError(f"Unknown bundle model type '{meta['model_type']}'")
+
+    @property
+    def version(self):
+        return self.meta["source_version"]
+
+    @classmethod
+    def load(cls, file_path):
+        try:
+            with np.load(file_path, allow_pickle=False) as data:
+                arrays = {key: data[key] for key in data.files}
+            meta = json.loads(arrays.pop("meta").tobytes().decode("utf-8"))
+            if meta["format_version"] != BUNDLE_FORMAT_VERSION:
+                raise ValueError(
+                    f"Bundle format {meta['format_version']} is not supported (expected {BUNDLE_FORMAT_VERSION})"
+                )
+            return cls(meta, arrays)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict(self, features):
+        """
+        Input: raw features (a DataFrame or a dict of columns)
+        Output: predictions, same as model.predict(preprocessor.transform(features))
+        """
+        return self.model.predict(self.preprocessor.transform(features))
@@ -0,0 +1,218 @@
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.exception import CustomException
+
+
+@dataclass
+class InputSchemaConfig:
+    """
+    Range of the numerical inputs; the allowed categories come from the fitted preprocessor.
+    """
+    # Reading / writing scores (same domain as PredictionTableConfig)
+    score_min: float = 0.0
+    score_max: float = 100.0
+
+
+class ValidationResult:
+    """
+    Outcome of InputSchema.validate for a batch of rows:
+    - valid: boolean mask of the rows that can be scored,
+    - errors: {row: "reason; reason"} for the others,
+    - values: {column: array}, categories as given and scores converted to float64,
+    - codes: {column: array} per row, for the drift monitor: the category index
+      (len(categories) = unknown, + 1 = missing), or the score itself (NaN = missing / not a number).
+      Categorical columns without a known list of categories have no codes.
+    """
+    def __init__(self, valid, errors, values, codes):
+        self.valid = valid
+        self.errors = errors
+        self.values = values
+        self.codes = codes
+
+    def records(self):
+        """
+        The valid rows as dicts of plain Python values (the predict_one / predict_many input).
+        """
+        columns = {col: values[self.valid].tolist() for col, values in self.values.items()}
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+    def error_message(self, row=0):
+        return self.errors.get(row)
+
+
+class InputSchema:
+    """
+    What the fitted preprocessor can encode: the categories its OneHotEncoder was fitted on,
+    per categorical column, and the numerical columns with their allowed range.
+    validate() checks a whole batch column by column, so bad rows are rejected with a
+    readable reason before any encoding or model work is spent on them.
+    """
+    def __init__(self, categories, numerical_columns, config: InputSchemaConfig = None):
+        # categories: {column: allowed values, or None to only require a value}
+        self.config = config or InputSchemaConfig()
+        self.categories = {
+            col: sorted(values) if values is not None else None for col, values in categories.items()
+        }
+        self.numerical_columns = list(numerical_columns)
+
+        # {value: code} per categorical column, the empty values mapping to the 'missing' code
+        self._codes = {}
+        for col, values in self.categories.items():
+            lookup = {value: code for code, value in enumerate(values or [])}
+            lookup.update({None: len(lookup) + 1, "": len(lookup) + 1})
+            self._codes[col] = lookup
+        # Reasons are formatted once, not per request
+        self._reasons = {col: f"must be one of {values}" for col, values in self.categories.items()}
+        self._range_reason = f"must be between {self.config.score_min:g} and {self.config.score_max:g}"
+
+    @classmethod
+    def required_only(cls, categorical_columns, numerical_columns, config: InputSchemaConfig = None):
+        """
+        Schema that only checks presence and numbers, for a preprocessor whose categories can't be read.
+        """
+        return cls({col: None for col in categorical_columns}, numerical_columns, config)
+
+    @property
+    def columns(self):
+        return list(self.categories) + self.numerical_columns
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor, config: InputSchemaConfig = None):
+        """
+        Reads the schema out of the fitted ColumnTransformer (or out of the compiled
+        FastFeatureEncoder of an inference bundle's preprocessor).
+        """
+        try:
+            encoder = getattr(preprocessor, "encoder", None)
+            if encoder is not None:
+                categories = {col: list(lookup) for col, _, lookup in encoder.categorical}
+                numerical_columns = [entry[0] for entry in encoder.numerical]
+                return cls(categories, numerical_columns, config)
+
+            categories, numerical_columns = {}, []
+            for name, transformer, columns in preprocessor.transformers_:
+                if name == "remainder" or transformer == "drop":
+                    continue
+                # The categorical pipeline is the one with a fitted encoder (categories_)
+                steps = transformer.steps if hasattr(transformer, "steps") else [(name, transformer)]
+                encoders = [step for _, step in steps if hasattr(step, "categories_")]
+                if encoders:
+                    for col, values in zip(columns, encoders[0].categories_):
+                        categories[col] = [str(value) for value in values]
+                else:
+                    numerical_columns.extend(columns)
+            return cls(categories, numerical_columns, config)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def to_dict(self):
+        return {
+            "categorical": self.categories,
+            "numerical": {
+                col: {"min": self.config.score_min, "max": self.config.score_max} for col in self.numerical_columns
+            },
+        }
+
+    def validate_records(self, records):
+        """
+        Input: a list of dicts of raw fields
+        """
+        return self.validate({col: [record.get(col) for record in records] for col in self.columns})
+
+    def validate(self, columns):
+        """
+        Input: {column: sequence of raw values}, every column the same length
+               (a missing column counts as missing in every row)
+        Output: ValidationResult
+        """
+        try:
+            n_rows = len(next(iter(columns.values()))) if columns else 0
+            problems = []  # (column, mask of bad rows, reason)
+            values, codes = {}, {}
+
+            # 1. Categorical columns: one hash lookup per value (like pandas factorize), then array checks
+            for col, allowed in self.categories.items():
+                raw = columns.get(col, [None] * n_rows)
+                lookup = self._codes[col]
+                unknown_code = len(lookup) - 2
+                column_codes = np.fromiter(
+                    (lookup.get(value, unknown_code) if isinstance(value, str) or value is None else unknown_code
+                     for value in raw),
+                    dtype=np.intp, count=n_rows,
+                )
+                values[col] = np.asarray(raw, dtype=object)
+                if allowed is not None:
+                    codes[col] = column_codes
+                # One comparison tells whether anything is wrong; the reasons are only worked out if so
+                if not (column_codes >= unknown_code).any():
+                    continue
+                unknown = column_codes == unknown_code
+                # NaN (pandas' missing value) isn't a dict key: it is told apart here, on the unknown rows only
+                for row in np.flatnonzero(unknown):
+                    if raw[row] != raw[row]:
+                        column_codes[row] = unknown_code + 1
+                        unknown[row] = False
+                problems.append((col, column_codes == unknown_code + 1, "is required"))
+                if allowed is not None:
+                    problems.append((col, unknown, self._reasons[col]))
+
+            # 2. Numerical columns: one float conversion (None -> NaN), element-wise only if some value doesn't parse
+            low, high = self.config.score_min, self.config.score_max
+            for col in self.numerical_columns:
+                raw = columns.get(col, [None] * n_rows)
+                try:
+                    numbers = np.asarray(raw, dtype=np.float64)
+                    parsed = True
+                except (TypeError, ValueError):
+                    parsed = False
+                    missing = np.fromiter((_is_missing(value) for value in raw), dtype=bool, count=n_rows)
+                    numbers = np.fromiter(
+                        (np.nan if is_missing else _to_float(value) for value, is_missing in zip(raw, missing)),
+                        dtype=np.float64, count=n_rows,
+                    )
+
+                values[col] = numbers
+                codes[col] = numbers
+                # NaN fails both comparisons, so this also catches missing values and non-numbers
+                in_range = (numbers >= low) & (numbers <= high)
+                if in_range.all():
+                    continue
+                is_nan = np.isnan(numbers)
+                if parsed:
+                    missing, not_number = is_nan, np.zeros(n_rows, dtype=bool)
+                else:
+                    not_number = is_nan & ~missing
+                problems.append((col, missing, "is required"))
+                problems.append((col, not_number, "must be a number"))
+                problems.append((col, ~in_range & ~is_nan, self._range_reason))
+
+            # 3. Reasons are only assembled for the rows that failed
+            valid = np.ones(n_rows, dtype=bool)
+            errors = {}
+            for col, bad, reason in problems:
+                if not bad.any():
+                    continue
+                valid &= ~bad
+                for row in np.flatnonzero(bad).tolist():
+                    errors[row] = f"{errors[row]}; {col} {reason}" if row in errors else f"{col} {reason}"
+
+            return ValidationResult(valid, errors, values, codes)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def _is_missing(value):
+    # None, NaN and "" (an empty form field)
+    return value is None or value != value or (isinstance(value, str) and value == "")
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
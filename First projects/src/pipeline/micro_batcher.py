@@ -0,0 +1,204 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.logger import logging
+from src.pipeline.predict_pipeline import PredictPipeline
+from src.pipeline.request_tracing import get_request_tracer
+
+
+@dataclass
+class MicroBatcherConfig:
+    """
+    How long and how many single predictions are coalesced into one batch.
+    Read from MICRO_BATCHING / MICRO_BATCH_MAX_WAIT_MS / MICRO_BATCH_MAX_SIZE when set.
+    """
+    # MICRO_BATCHING=0 scores every request inline, as PredictPipeline.predict_one does
+    enabled: bool = os.environ.get("MICRO_BATCHING", "1") == "1"
+    # Longest time the first request of a batch waits for others to join it
+    max_wait_ms: float = float(os.environ.get("MICRO_BATCH_MAX_WAIT_MS", "2"))
+    # A batch is sent as soon as it has this many rows
+    max_batch_size: int = int(os.environ.get("MICRO_BATCH_MAX_SIZE", "64"))
+    # Longest time a request waits for its prediction (queue + batch) before giving up
+    request_timeout_s: float = float(os.environ.get("MICRO_BATCH_TIMEOUT_S", "10"))
+    # Queue waits kept for the percentiles in stats()
+    wait_window: int = 10_000
+
+
+class MicroBatcherMetrics:
+    """
+    Thread-safe counters for the batcher: batch sizes (count, mean, max, power-of-two
+    histogram) and queue waits (mean, max and percentiles over the last wait_window requests).
+    """
+    def __init__(self, wait_window):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.failed_batches = 0
+        self.max_batch_size = 0
+        self.batch_size_histogram = {}
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self._recent_waits_ms = deque(maxlen=wait_window)
+
+    def record_batch(self, batch_size, waits_ms, failed=False):
+        # Bucket = smallest power of two >= batch size: 1, 2, 4, 8, ...
+        bucket = 1 << (batch_size - 1).bit_length()
+        with self._lock:
+            self.batches += 1
+            self.requests += batch_size
+            self.failed_batches += int(failed)
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+            self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+            self.total_wait_ms += sum(waits_ms)
+            self.max_wait_ms = max(self.max_wait_ms, max(waits_ms))
+            self._recent_waits_ms.extend(waits_ms)
+
+    def snapshot(self):
+        with self._lock:
+            recent = np.array(self._recent_waits_ms) if self._recent_waits_ms else np.zeros(1)
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "failed_batches": self.failed_batches,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "batch_size_histogram": {f"<={k}": v for k, v in sorted(self.batch_size_histogram.items())},
+                "queue_wait_ms": {
+                    "mean": self.total_wait_ms / self.requests if self.requests else 0.0,
+                    "max": self.max_wait_ms,
+                    "p50": float(np.percentile(recent, 50)),
+                    "p95": float(np.percentile(recent, 95)),
+                    "p99": float(np.percentile(recent, 99)),
+                },
+            }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into batches.
+    Each request is queued with a Future; one background thread takes the first queued
+    request, waits up to max_wait_ms (or until max_batch_size rows) for more to arrive,
+    scores them all with one PredictPipeline.predict_many call and resolves every Future.
+    If the batch fails (e.g. one row has an unknown category) its rows are scored one by one,
+    so only the bad request gets the error. Whatever fails, the thread keeps running: a request
+    whose Future was cancelled (its caller gave up) is skipped.
+
+    The thread is started on first use in each process, so a batcher created before
+    gunicorn forks its workers gets its own thread and queue in every worker.
+    """
+    def __init__(self, pipeline: PredictPipeline, config: MicroBatcherConfig = None):
+        self.pipeline = pipeline
+        self.config = config or MicroBatcherConfig()
+        self.metrics = MicroBatcherMetrics(self.config.wait_window)
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # First use in this process (or first use after a fork): fresh queue and thread
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name="micro-batcher", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, record: dict) -> Future:
+        """
+        Queues one record (the PredictPipeline.predict_one input); the Future resolves to its prediction.
+        """
+        future = Future()
+        if not self.config.enabled:
+            try:
+                future.set_result(self.pipeline.predict_one(record))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._ensure_started()
+        self._queue.put((record, future, time.perf_counter()))
+        return future
+
+    def predict_one(self, record: dict, timeout: float = None) -> float:
+        """
+        Blocking drop-in for PredictPipeline.predict_one.
+        Raises TimeoutError after timeout seconds (default: config.request_timeout_s).
+        """
+        future = self.submit(record)
+        try:
+            return future.result(timeout=self.config.request_timeout_s if timeout is None else timeout)
+        except TimeoutError:
+            # Don't score a request nobody waits for any more (no-op if its batch already started)
+            future.cancel()
+            raise
+
+    def stats(self):
+        return {
+            "config": {
+                "enabled": self.config.enabled,
+                "max_wait_ms": self.config.max_wait_ms,
+                "max_batch_size": self.config.max_batch_size,
+                "request_timeout_s": self.config.request_timeout_s,
+            },
+            **self.metrics.snapshot(),
+        }
+
+    def _collect(self, request_queue):
+        # Block for the first request, then gather more until the batch is full or the wait is over
+        batch = [request_queue.get()]
+        deadline = batch[0][2] + self.config.max_wait_ms / 1000
+        while len(batch) < self.config.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(request_queue.get(timeout=remaining) if remaining > 0 else request_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, request_queue):
+        while True:
+            try:
+                self._run_batch(self._collect(request_queue))
+            except Exception as e:
+                # Never let one batch stop the only thread that serves the queue
+                logging.error(f"Micro-batcher error, continuing with the next batch: {e}")
+
+    def _run_batch(self, batch):
+        # Drop the requests whose caller already gave up; the others can no longer be cancelled
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        waits_ms = [(started - enqueued_at) * 1000 for _, _, enqueued_at in batch]
+
+        try:
+            # The batch's own trace: its encode / model_predict spans don't belong to one request
+            with get_request_tracer().trace("micro_batch"):
+                predictions = self.pipeline.predict_many([record for record, _, _ in batch])
+            for (_, future, _), prediction in zip(batch, predictions):
+                future.set_result(float(prediction))
+            self.metrics.record_batch(len(batch), waits_ms)
+
+        except Exception as e:
+            # Isolate the bad rows: score each request on its own. Futures the batch already
+            # resolved (e.g. the failure came after them) keep their result
+            logging.warning(f"Micro-batch of {len(batch)} failed, scoring the unresolved rows one by one: {e}")
+            for record, future, _ in batch:
+                if future.done():
+                    continue
+                try:
+                    future.set_result(self.pipeline.predict_one(record))
+                except Exception as row_error:
+                    future.set_exception(row_error)
+            self.metrics.record_batch(len(batch), waits_ms, failed=True)
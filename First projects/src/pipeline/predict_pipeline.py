@@ -1,8 +1,29 @@
-import os
 import sys
-import pandas as pd
+import numpy as np
 from src.exception import CustomException
-from src.utils import load_object
+from src.pipeline.artifact_registry import ArtifactRegistry, get_artifact_registry
+from src.pipeline.drift_monitor import DriftMonitor, get_drift_monitor
+from src.pipeline.input_schema import InputSchema, ValidationResult
+from src.pipeline.request_tracing import span
+
+# Raw input columns the preprocessor was fitted on (see DataTransformation.get_data_transformer_objects)
+NUMERICAL_COLUMNS = ["writing_score", "reading_score"]
+CATEGORICAL_COLUMNS = [
+    "gender",
+    "race_ethnicity",
+    "parental_level_of_education",
+    "lunch",
+    "test_preparation_course",
+]
+FEATURE_COLUMNS = CATEGORICAL_COLUMNS + NUMERICAL_COLUMNS
+
+
+class InvalidBatchError(ValueError):
+    """
+    A batch that can't be scored at all because of what was sent (a record that isn't an
+    object, a missing column), as opposed to a failure on the server side.
+    Raised as is by predict_batch, not wrapped in a CustomException.
+    """
 
 
 class PredictPipeline:
@@ -10,39 +31,169 @@ class PredictPipeline:
     This class is responsible for taking raw input, preprocessing it 
     using the saved pipeline, and returning a prediction.
     """
-    def __init__(self):
-        pass
+    def __init__(self, registry: ArtifactRegistry = None, drift_monitor: DriftMonitor = None):
+        # The registry loads model.pkl/preprocessor.pkl once per process and
+        # hot-reloads them when a retrain replaces the files
+        self.registry = registry or get_artifact_registry()
+        # Every validated row is counted in the drift sketches
+        self.drift_monitor = drift_monitor or get_drift_monitor()
+        self._fallback_schema = InputSchema.required_only(CATEGORICAL_COLUMNS, NUMERICAL_COLUMNS)
 
-    def predict(self, features):
+    def validate(self, records, artifacts=None) -> ValidationResult:
+        """
+        Input: a list of dicts of raw fields, or {column: sequence of raw values}
+               artifacts: the registry snapshot to validate against (default: the current one)
+        Output: ValidationResult against the schema of the model: which rows can be
+                scored, why the others can't, and their cleaned values (see result.records())
+        """
+        try:
+            with span("pipeline.validate"):
+                artifacts = artifacts or self.registry.get()
+                schema = artifacts.schema or self._fallback_schema
+                result = schema.validate(records) if isinstance(records, dict) else schema.validate_records(records)
+            self.drift_monitor.record(schema, result, artifacts.drift_reference)
+            return result
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict(self, features, artifacts=None):
         """
         Input: A pandas DataFrame of features
+               artifacts: the registry snapshot to score with (default: the current one)
         Output: Model prediction (e.g., a score or category)
         """
         try:
-            # 1. Define paths to the 'frozen' objects created during training
-            BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            model_path = os.path.join(BASE_DIR, 'artifacts', 'model.pkl')
-            preprocessor_path = os.path.join(BASE_DIR, 'artifacts', 'preprocessor.pkl')
-            model_path = os.path.join("artifacts", "model.pkl")
-            preprocessor_path = os.path.join("artifacts", "preprocessor.pkl")
-
-            # 2. Load the objects back into memory
-            # load_object is a helper function (usually using pickle or dill)
-            model = load_object(file_path=model_path)
-            preprocessor = load_object(file_path=preprocessor_path)
-
-            # 3. Transform the raw input features
+            # 1. Take one snapshot of the 'frozen' objects created during training
+            # (model and preprocessor always come from the same training run)
+            # Its span includes load_object when the pickles are (re)loaded
+            if artifacts is None:
+                with span("pipeline.get_artifacts"):
+                    artifacts = self.registry.get()
+
+            # 2. Transform the raw input features
             # It is crucial to use the SAME scaling/encoding used during training
-            data_scaled = preprocessor.transform(features)
+            with span("pipeline.transform"):
+                data_scaled = artifacts.preprocessor.transform(features)
 
-            # 4. Generate the prediction
-            preds = model.predict(data_scaled)
+            # 3. Generate the prediction
+            with span("pipeline.model_predict"):
+                preds = artifacts.model.predict(data_scaled)
             
             return preds
         
         except Exception as e:
             raise CustomException(e, sys)
 
+    def predict_one(self, record: dict) -> float:
+        """
+        Input: a dict of raw fields for one student (see CustomData.get_data_as_dict)
+        Output: the predicted score
+        Uses the compiled FastFeatureEncoder and skips pandas entirely when it is available.
+        """
+        try:
+            with span("pipeline.get_artifacts"):
+                artifacts = self.registry.get()
+            if artifacts.encoder is None:
+                import pandas as pd
+                return float(self.predict(pd.DataFrame([record], columns=FEATURE_COLUMNS))[0])
+
+            with span("pipeline.encode"):
+                data_scaled = artifacts.encoder.encode(record)
+            with span("pipeline.model_predict"):
+                return float(artifacts.model.predict(data_scaled)[0])
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict_many(self, records: list) -> np.ndarray:
+        """
+        Input: a list of dicts of raw fields (the predict_one input), e.g. a micro-batch
+        Output: one prediction per record, from a single encode + predict call
+        Fails as a whole if any record is bad; see predict_batch for per-row errors.
+        """
+        try:
+            with span("pipeline.get_artifacts"):
+                artifacts = self.registry.get()
+            if artifacts.encoder is None:
+                import pandas as pd
+                return self.predict(pd.DataFrame.from_records(records, columns=FEATURE_COLUMNS))
+
+            with span("pipeline.encode"):
+                columns = {col: [record.get(col) for record in records] for col in FEATURE_COLUMNS}
+                data_scaled = artifacts.encoder.encode_batch(columns)
+            with span("pipeline.model_predict"):
+                return artifacts.model.predict(data_scaled)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict_batch(self, records, chunk_size: int = 4096, artifacts=None):
+        """
+        Input: a pandas DataFrame (or a list of dicts) with one student per row
+               artifacts: the registry snapshot to use (default: the current one); the whole
+                          batch is validated and scored by this one model, even across a reload
+        Output: one result per row, in input order:
+                {"row": i, "prediction": float} or {"row": i, "error": "..."}
+        Rows are validated column-wise against the model's schema (required fields, known
+        categories, scores in range), then scored with one vectorized transform + predict
+        per chunk instead of one call per row.
+        Raises InvalidBatchError when the batch itself is malformed.
+        """
+        try:
+            # pandas is only needed on this path; the single-row path never imports it
+            import pandas as pd
+
+            if len(records) == 0:
+                return []
+            if not isinstance(records, pd.DataFrame):
+                for row, record in enumerate(records):
+                    if not isinstance(record, dict):
+                        raise InvalidBatchError(f"Record {row} is not an object of fields: {record!r}")
+            df = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+
+            # 1. Column-level validation: a missing column fails the whole batch
+            missing_columns = [col for col in FEATURE_COLUMNS if col not in df.columns]
+            if missing_columns:
+                raise InvalidBatchError(f"Missing required columns: {missing_columns}")
+
+            # 2. Row-level validation, done once per column for the whole batch
+            with span("pipeline.get_artifacts"):
+                artifacts = artifacts or self.registry.get()
+            validation = self.validate({col: df[col].to_numpy(dtype=object) for col in FEATURE_COLUMNS}, artifacts)
+            df = pd.DataFrame({col: validation.values[col] for col in FEATURE_COLUMNS})
+
+            results = [None] * len(df)
+            for row, error in validation.errors.items():
+                results[row] = {"row": row, "error": error}
+
+            # 3. Score the valid rows chunk by chunk
+            valid_rows = np.flatnonzero(validation.valid)
+            for start in range(0, len(valid_rows), chunk_size):
+                chunk_rows = valid_rows[start:start + chunk_size]
+                for row, outcome in zip(chunk_rows, self._predict_chunk(df.iloc[chunk_rows], artifacts)):
+                    results[row] = {"row": int(row), **outcome}
+
+            return results
+
+        except InvalidBatchError:
+            raise
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _predict_chunk(self, chunk, artifacts):
+        # Fast path: the whole chunk in one transform + predict call
+        try:
+            return [{"prediction": float(pred)} for pred in self.predict(chunk, artifacts)]
+        except CustomException as e:
+            if len(chunk) == 1:
+                return [{"error": str(e.__context__ or e)}]
+
+        # Something in the chunk passed validation but still fails in the preprocessor/model:
+        # split it in half and retry, so a few bad rows cost O(log n) extra calls, not O(n)
+        middle = len(chunk) // 2
+        return self._predict_chunk(chunk.iloc[:middle], artifacts) + self._predict_chunk(chunk.iloc[middle:], artifacts)
+
 
 class CustomData:
     """
@@ -67,12 +218,28 @@ class CustomData:
         self.reading_score = reading_score
         self.writing_score = writing_score
 
+    def get_data_as_dict(self):
+        """
+        Returns the raw fields as a flat dict, the input of PredictPipeline.predict_one.
+        """
+        return {
+            "gender": self.gender,
+            "race_ethnicity": self.race_ethnicity,
+            "parental_level_of_education": self.parental_level_of_education,
+            "lunch": self.lunch,
+            "test_preparation_course": self.test_preparation_course,
+            "reading_score": self.reading_score,
+            "writing_score": self.writing_score,
+        }
+
     def get_data_as_data_frame(self):
         """
         Converts the class variables into a dictionary and then a DataFrame.
         This ensures column names match exactly what the model was trained on.
         """
         try:
+            import pandas as pd
+
             custom_data_input_dict = {
                 "gender": [self.gender],
                 "race_ethnicity": [self.race_ethnicity],
@@ -83,7 +250,8 @@ class CustomData:
                 "writing_score": [self.writing_score],
             }
 
-            return pd.DataFrame(custom_data_input_dict)
+            with span("custom_data.to_frame"):
+                return pd.DataFrame(custom_data_input_dict)
 
         except Exception as e:
             raise CustomException(e, sys)
\ No newline at end of file
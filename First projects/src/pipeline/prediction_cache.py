@@ -0,0 +1,129 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from src.logger import logging
+from src.pipeline.artifact_registry import ArtifactRegistry
+from src.pipeline.predict_pipeline import CATEGORICAL_COLUMNS, NUMERICAL_COLUMNS
+
+
+@dataclass
+class PredictionCacheConfig:
+    """
+    Size and lifetime of cached predictions. Read from PREDICTION_CACHE_SIZE /
+    PREDICTION_CACHE_TTL when set; a size of 0 disables the cache.
+    """
+    # Maximum number of cached predictions; the least recently used one is evicted first
+    max_size: int = int(os.environ.get("PREDICTION_CACHE_SIZE", "50000"))
+    # Seconds a prediction stays valid (0 = until evicted or the model changes)
+    ttl_seconds: float = float(os.environ.get("PREDICTION_CACHE_TTL", "3600"))
+
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache of single-record predictions.
+    The key is (model version, normalized feature tuple), so a prediction is only ever
+    reused for the model that produced it; the whole cache is also dropped when the
+    registry publishes a new version, to free the stale entries right away.
+    """
+    def __init__(self, registry: ArtifactRegistry, config: PredictionCacheConfig = None):
+        self.registry = registry
+        self.config = config or PredictionCacheConfig()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        registry.add_reload_listener(self._on_reload)
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.max_size > 0
+
+    def make_key(self, record: dict):
+        """
+        Returns the cache key of a raw record, or None if it should not be cached
+        (cache disabled, missing field, non-numeric score, non-string category).
+        Scores are normalized to float so 70, 70.0 and "70" share an entry, exactly
+        as they produce the same features.
+        """
+        if not self.enabled:
+            return None
+        try:
+            categories = tuple(record[col] for col in CATEGORICAL_COLUMNS)
+            scores = tuple(float(record[col]) for col in NUMERICAL_COLUMNS)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not all(isinstance(value, str) for value in categories):
+            return None
+        if not all(math.isfinite(value) for value in scores):
+            return None
+        return (self.registry.get().version, categories + scores)
+
+    def get(self, key):
+        """
+        Returns the cached prediction for key, or None on a miss.
+        """
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: float):
+        if key is None:
+            return
+        expires_at = time.monotonic() + self.config.ttl_seconds if self.config.ttl_seconds > 0 else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _on_reload(self, snapshot):
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self.invalidations += 1
+        if dropped:
+            logging.info(f"Prediction cache cleared ({dropped} entries) for model version {snapshot.version}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.config.max_size,
+                "ttl_seconds": self.config.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,168 @@
+import json
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.logger import logging
+from src.pipeline.artifact_registry import ArtifactRegistry
+
+
+@dataclass
+class PredictionTableLookupConfig:
+    """
+    Location of the table written by PredictionTableBuilder (src/components/prediction_table.py).
+    PREDICTION_TABLE=0 disables the lookup.
+    """
+    table_file_path: str = os.path.join("artifacts", "prediction_table.npy")
+    meta_file_path: str = os.path.join("artifacts", "prediction_table.json")
+    enabled: bool = os.environ.get("PREDICTION_TABLE", "1") == "1"
+    # Seconds between two attempts to find a table for the current model version
+    check_interval: float = 30.0
+
+
+class PredictionTable:
+    """
+    A memory-mapped, read-only table of predictions for every in-domain record.
+    index() turns a record into its mixed-radix position; anything outside the grid
+    (unknown category, non-integer or out-of-range score) has no position.
+    """
+    def __init__(self, values, meta):
+        self.values = values
+        self.meta = meta
+        self.version = meta["model_version"]
+
+        # Column -> {value: digit} for categories, (min, max) for scores
+        self.columns = []
+        for column in meta["columns"]:
+            if "values" in column:
+                self.columns.append((column["name"], {value: i for i, value in enumerate(column["values"])}))
+            else:
+                self.columns.append((column["name"], (column["min"], column["max"])))
+
+        # Mixed-radix place values, last column fastest
+        shape = meta["shape"]
+        self.strides = [math.prod(shape[i + 1:]) for i in range(len(shape))]
+        if math.prod(shape) != len(values):
+            raise ValueError(f"Prediction table has {len(values)} cells, metadata expects {math.prod(shape)}")
+
+    @classmethod
+    def load(cls, table_file_path, meta_file_path):
+        with open(meta_file_path) as file_obj:
+            meta = json.load(file_obj)
+        # Pages are shared between processes and read from disk only when touched
+        return cls(np.load(table_file_path, mmap_mode="r"), meta)
+
+    def index(self, record: dict):
+        position = 0
+        for (name, domain), stride in zip(self.columns, self.strides):
+            value = record.get(name)
+            if isinstance(domain, dict):
+                digit = domain.get(value) if isinstance(value, str) else None
+                if digit is None:
+                    return None
+            else:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    return None
+                low, high = domain
+                if not value.is_integer() or not low <= value <= high:
+                    return None
+                digit = int(value) - low
+            position += digit * stride
+        return position
+
+    def lookup(self, record: dict):
+        position = self.index(record)
+        return None if position is None else float(self.values[position])
+
+
+class PredictionTableLookup:
+    """
+    Serves predictions from the table that matches the registry's current model version.
+    lookup() returns None when there is no matching table or the record is out of domain,
+    and the caller falls back to the model.
+    """
+    def __init__(self, registry: ArtifactRegistry, config: PredictionTableLookupConfig = None):
+        self.registry = registry
+        self.config = config or PredictionTableLookupConfig()
+        self._lock = threading.Lock()
+        self._table = None
+        self._next_check = float("-inf")
+
+        self.hits = 0
+        self.out_of_domain = 0
+
+        registry.add_reload_listener(self._on_reload)
+
+    def _current_table(self):
+        version = self.registry.get().version
+        table = self._table
+        if table is not None and table.version == version:
+            return table
+
+        now = time.monotonic()
+        if now < self._next_check:
+            return None
+        with self._lock:
+            if now < self._next_check:
+                return self._table if self._table is not None and self._table.version == version else None
+            self._next_check = now + self.config.check_interval
+            self._table = None
+            try:
+                table = PredictionTable.load(self.config.table_file_path, self.config.meta_file_path)
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                logging.warning(f"Could not load the prediction table: {e}")
+                return None
+
+            if table.version != version:
+                logging.info(f"Prediction table is for model {table.version}, serving {version}: not used")
+                return None
+            self._table = table
+            logging.info(f"Prediction table loaded for model version {version}")
+            return table
+
+    def refresh(self):
+        """
+        Loads the table for the current model now (e.g. before gunicorn forks its workers).
+        """
+        self._next_check = float("-inf")
+        return self._current_table() is not None
+
+    def lookup(self, record: dict):
+        """
+        Returns the precomputed prediction for record, or None if the model must be used.
+        """
+        if not self.config.enabled:
+            return None
+        table = self._current_table()
+        if table is None:
+            return None
+
+        prediction = table.lookup(record)
+        # Plain counters: an occasional lost increment under threads is acceptable here
+        if prediction is None:
+            self.out_of_domain += 1
+        else:
+            self.hits += 1
+        return prediction
+
+    def _on_reload(self, snapshot):
+        # New model: look for its table on the next lookup
+        self._next_check = float("-inf")
+
+    def stats(self):
+        table = self._table
+        return {
+            "enabled": self.config.enabled,
+            "loaded_version": table.version if table is not None else None,
+            "cells": len(table.values) if table is not None else 0,
+            "hits": self.hits,
+            "out_of_domain": self.out_of_domain,
+        }
@@ -0,0 +1,422 @@
+import contextvars
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+
+from src.logger import logging
+
+
+@dataclass
+class RequestTracingConfig:
+    """
+    Request tracing settings for the serving path.
+    REQUEST_TRACING=0 turns spans and latency histograms off, SLOW_REQUEST_MS sets the
+    slow-request threshold (0 = never slow), PROFILE_SAMPLE_RATE runs that fraction of the
+    requests under the sampling profiler (0 = off).
+    """
+    enabled: bool = os.environ.get("REQUEST_TRACING", "1") == "1"
+    # Percentiles are computed over the last window_seconds, kept as window_slices sub-histograms
+    window_seconds: float = float(os.environ.get("REQUEST_METRICS_WINDOW", "300"))
+    window_slices: int = 10
+    # Slower requests are logged with their spans and handed to the slow-request hooks
+    slow_request_ms: float = float(os.environ.get("SLOW_REQUEST_MS", "1000"))
+    # Fraction of requests sampled by the profiler; only the profiles of slow ones are kept
+    profile_sample_rate: float = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+    profile_interval_ms: float = 5.0
+    # Slow requests kept in memory for /metrics/slow
+    slow_request_history: int = 20
+
+
+class RollingHistogram:
+    """
+    Latency histogram over a sliding time window, with log-spaced buckets (each bucket
+    ~9% wider than the previous one, so percentiles are within ~9%).
+    The window is split into slices; recording touches only the newest slice and a whole
+    slice is dropped once it is older than the window.
+    """
+    # Bucket i holds values in (MIN_MS * GROWTH**(i-1), MIN_MS * GROWTH**i]
+    MIN_MS = 0.001
+    GROWTH = 2 ** 0.125
+
+    def __init__(self, window_seconds, window_slices):
+        self.slice_seconds = window_seconds / window_slices
+        self.window_slices = window_slices
+        self._lock = threading.Lock()
+        # (slice id, {bucket: count}), oldest first
+        self._slices = deque()
+        # Lifetime totals (Prometheus summary _count / _sum)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def _bucket(self, value_ms):
+        if value_ms <= self.MIN_MS:
+            return 0
+        return math.ceil(math.log(value_ms / self.MIN_MS) / math.log(self.GROWTH))
+
+    def _prune(self, slice_id):
+        while self._slices and self._slices[0][0] <= slice_id - self.window_slices:
+            self._slices.popleft()
+
+    def record(self, value_ms, now=None):
+        slice_id = int((time.monotonic() if now is None else now) // self.slice_seconds)
+        bucket = self._bucket(value_ms)
+        with self._lock:
+            if not self._slices or self._slices[-1][0] != slice_id:
+                self._prune(slice_id)
+                self._slices.append((slice_id, Counter()))
+            self._slices[-1][1][bucket] += 1
+            self.count += 1
+            self.total_ms += value_ms
+
+    def snapshot(self, now=None):
+        """
+        {"count", "p50_ms", "p95_ms", "p99_ms", "max_ms"} over the window; the
+        percentiles are bucket upper bounds. None when the window is empty.
+        """
+        slice_id = int((time.monotonic() if now is None else now) // self.slice_seconds)
+        with self._lock:
+            self._prune(slice_id)
+            merged = Counter()
+            for _, counts in self._slices:
+                merged.update(counts)
+        n = sum(merged.values())
+        if n == 0:
+            return None
+
+        buckets = sorted(merged.items())
+        result = {"count": n}
+        for name, quantile in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            rank, seen = quantile * n, 0
+            for bucket, count in buckets:
+                seen += count
+                if seen >= rank:
+                    result[name] = self.MIN_MS * self.GROWTH ** bucket
+                    break
+        result["max_ms"] = self.MIN_MS * self.GROWTH ** buckets[-1][0]
+        return result
+
+
+class RequestTrace:
+    """
+    The spans of one request (or one background unit of work, e.g. a micro-batch).
+    spans: list of (path, start offset ms, duration ms), path being the nested span names.
+    """
+    def __init__(self, name, method=None, url_path=None):
+        self.name = name
+        self.method = method
+        self.url_path = url_path
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.thread_id = threading.get_ident()
+        self.spans = []
+        self.status = None
+        self.error = None
+        self.duration_ms = None
+        self.profile = None
+        self._token = None
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "method": self.method,
+            "path": self.url_path,
+            "started_at": self.started_at,
+            "status": self.status,
+            "error": self.error,
+            "duration_ms": self.duration_ms,
+            "spans": [
+                {"span": path, "start_ms": round(start_ms, 3), "duration_ms": round(duration_ms, 3)}
+                for path, start_ms, duration_ms in self.spans
+            ],
+            # Folded stacks ("outer;inner count"), the input format of flamegraph tools
+            "profile": [f"{stack} {count}" for stack, count in self.profile.most_common()] if self.profile else None,
+        }
+
+
+class SamplingProfiler:
+    """
+    One daemon thread per process that, while at least one sampled request is running,
+    records the Python stack of each sampled request's thread every interval_ms.
+    Async views run their coroutine on another thread, so their profile shows the
+    request thread waiting for it.
+    """
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._condition = threading.Condition()
+        self._watched = {}
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._condition:
+            self._watched[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def stop(self, thread_id) -> Counter:
+        with self._condition:
+            return self._watched.pop(thread_id, Counter())
+
+    @staticmethod
+    def _fold(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Sleep until a sampled request starts
+                while not self._watched:
+                    self._condition.wait()
+                frames = sys._current_frames()
+                for thread_id, stacks in self._watched.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._fold(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+# Trace of the request being handled and the names of the spans open in it
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_span_path = contextvars.ContextVar("span_path", default=())
+
+
+class RequestTracer:
+    """
+    Process-wide collector of request traces: one rolling histogram per (trace name, span path),
+    slow-request detection, optional sampling profiles and the hooks called for slow requests.
+    With gunicorn every worker has its own tracer; /metrics reports the worker that answered it.
+    """
+    def __init__(self, config: RequestTracingConfig = None):
+        self.config = config or RequestTracingConfig()
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._errors = Counter()
+        self.slow_requests = deque(maxlen=self.config.slow_request_history)
+        self.slow_request_count = 0
+        self._slow_request_hooks = [self._log_slow_request]
+        self._profiler = None
+
+    def add_slow_request_hook(self, callback):
+        """
+        Registers callback(trace), called with the RequestTrace of every slow request
+        (e.g. to ship its spans and profile to an APM).
+        """
+        self._slow_request_hooks.append(callback)
+
+    def _histogram(self, name, path):
+        key = (name, path)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    key, RollingHistogram(self.config.window_seconds, self.config.window_slices)
+                )
+        return histogram
+
+    def start_trace(self, name, method=None, url_path=None) -> RequestTrace:
+        """
+        Starts a trace and makes it the current one; must be ended with finish_trace
+        in the same context.
+        """
+        if not self.config.enabled:
+            return None
+        trace = RequestTrace(name, method, url_path)
+        trace._token = _current_trace.set(trace)
+        if self.config.profile_sample_rate > 0 and random.random() < self.config.profile_sample_rate:
+            if self._profiler is None:
+                self._profiler = SamplingProfiler(self.config.profile_interval_ms)
+            self._profiler.start(trace.thread_id)
+            trace.profile = Counter()
+        return trace
+
+    def finish_trace(self, trace: RequestTrace, status=None, error=None):
+        if trace is None:
+            return
+        trace.duration_ms = (time.perf_counter() - trace.started) * 1000
+        trace.status = status if status is not None else trace.status
+        trace.error = str(error) if error is not None else None
+        try:
+            _current_trace.reset(trace._token)
+        except ValueError:
+            # Finished from another context than the one it was started in
+            _current_trace.set(None)
+        if trace.profile is not None:
+            trace.profile = self._profiler.stop(trace.thread_id)
+
+        self._histogram(trace.name, "request").record(trace.duration_ms)
+        # Plain counters: an occasional lost increment under threads is acceptable here
+        if error is not None or (trace.status or 0) >= 500:
+            self._errors[trace.name] += 1
+
+        if 0 < self.config.slow_request_ms <= trace.duration_ms:
+            self.slow_request_count += 1
+            self.slow_requests.append(trace)
+            for callback in self._slow_request_hooks:
+                try:
+                    callback(trace)
+                except Exception as e:
+                    logging.warning(f"Slow request hook {callback!r} failed: {e}")
+
+    def trace(self, name):
+        """
+        Context manager tracing a unit of work outside a web request (e.g. a micro-batch).
+        """
+        return _Trace(self, name)
+
+    def record_span(self, path, start, duration_ms):
+        trace = _current_trace.get()
+        name = trace.name if trace is not None else "untraced"
+        self._histogram(name, "/".join(path)).record(duration_ms)
+        if trace is not None:
+            trace.spans.append(("/".join(path), (start - trace.started) * 1000, duration_ms))
+
+    def _log_slow_request(self, trace):
+        spans = ", ".join(f"{path}={duration_ms:.1f}ms" for path, _, duration_ms in trace.spans)
+        logging.warning(
+            f"Slow request {trace.method or ''} {trace.url_path or trace.name}: "
+            f"{trace.duration_ms:.1f} ms ({spans or 'no spans'})"
+        )
+
+    def snapshot(self):
+        """
+        Rolling latency percentiles per trace name, with its spans nested under it.
+        """
+        with self._lock:
+            keys = sorted(self._histograms)
+        traces = {}
+        for name, path in keys:
+            stats = self._histograms[(name, path)].snapshot()
+            if stats is None:
+                continue
+            entry = traces.setdefault(name, {"request": None, "errors": self._errors[name], "spans": {}})
+            if path == "request":
+                entry["request"] = stats
+            else:
+                entry["spans"][path] = stats
+        return {
+            "enabled": self.config.enabled,
+            "pid": os.getpid(),
+            "window_seconds": self.config.window_seconds,
+            "slow_request_ms": self.config.slow_request_ms,
+            "slow_requests": self.slow_request_count,
+            "traces": traces,
+        }
+
+    def prometheus_text(self, extra_stats=None):
+        """
+        The latency histograms as Prometheus summaries (quantiles over the window,
+        _count/_sum over the process lifetime), plus every numeric value of
+        extra_stats ({component: stats dict}) as a gauge.
+        """
+        lines = [
+            "# HELP request_latency_ms Request and span latency in milliseconds",
+            "# TYPE request_latency_ms summary",
+        ]
+        with self._lock:
+            items = sorted(self._histograms.items())
+        for (name, path), histogram in items:
+            labels = f'trace="{name}",span="{path}"'
+            stats = histogram.snapshot()
+            if stats is not None:
+                for quantile in ("p50", "p95", "p99"):
+                    lines.append(f'request_latency_ms{{{labels},quantile="{int(quantile[1:]) / 100:g}"}} {stats[quantile + "_ms"]:.6g}')
+            lines.append(f"request_latency_ms_count{{{labels}}} {histogram.count}")
+            lines.append(f"request_latency_ms_sum{{{labels}}} {histogram.total_ms:.6g}")
+
+        lines += ["# TYPE request_errors_total counter"]
+        lines += [f'request_errors_total{{trace="{name}"}} {count}' for name, count in sorted(self._errors.items())]
+        lines += ["# TYPE slow_requests_total counter", f"slow_requests_total {self.slow_request_count}"]
+
+        if extra_stats:
+            lines.append("# TYPE serving_stat gauge")
+            for component, stats in extra_stats.items():
+                for key, value in _flatten(stats):
+                    lines.append(f'serving_stat{{component="{component}",name="{key}"}} {float(value):.6g}')
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(stats, prefix=""):
+    # Numeric leaves of a nested stats dict as ("a_b_c", value)
+    for key, value in stats.items():
+        name = f"{prefix}{key}".replace("<=", "le_").replace(".", "_")
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}_")
+        elif isinstance(value, (bool, int, float)):
+            yield name, value
+
+
+class _Trace:
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.trace = self.tracer.start_trace(self.name)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.finish_trace(self.trace, error=exc)
+        return False
+
+
+class span:
+    """
+    Times a block as a span of the current request:
+
+        with span("preprocessor.transform"):
+            ...
+
+    Spans nest ("predict/pipeline.model_predict"). Outside a request the time still goes to
+    the histograms, under the "untraced" trace name.
+    """
+    __slots__ = ("name", "_tracer", "_start", "_path", "_token")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._tracer = get_request_tracer()
+        if self._tracer.config.enabled:
+            self._path = _span_path.get() + (self.name,)
+            self._token = _span_path.set(self._path)
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._tracer.config.enabled:
+            duration_ms = (time.perf_counter() - self._start) * 1000
+            _span_path.reset(self._token)
+            self._tracer.record_span(self._path, self._start, duration_ms)
+        return False
+
+
+_request_tracer = None
+_request_tracer_lock = threading.Lock()
+
+
+def get_request_tracer() -> RequestTracer:
+    """
+    Returns the process-wide tracer, creating it on first use.
+    """
+    global _request_tracer
+    if _request_tracer is None:
+        with _request_tracer_lock:
+            if _request_tracer is None:
+                _request_tracer = RequestTracer()
+    return _request_tracer
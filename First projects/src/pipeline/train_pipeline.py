@@ -0,0 +1,580 @@
+"""
+End-to-end training as a graph of stages with checkpoints.
+
+    data_ingestion -> data_transformation -> search:<model> -> fit:<model> -> model_selection
+                                                                                  |-> export_bundle ----.
+                                                                                  |-> prediction_table -+-> publish
+                                                                                  '-> evaluation
+
+Training writes its pickles (and drift reference) to artifacts/staging/; "publish" makes them
+the served pair only after the bundle and table built from them are written.
+
+Independent stages (the per-model searches and fits, the steps after model_selection) run
+at the same time on a thread pool. Every finished stage is checkpointed under
+artifacts/pipeline/, so a run that fails part-way resumes from the stages that completed.
+
+Run from the project root:
+    python -m src.pipeline.train_pipeline                      # run, reusing valid checkpoints
+    python -m src.pipeline.train_pipeline --list               # stages, their inputs and status
+    python -m src.pipeline.train_pipeline --from fit:ridge     # rerun a stage and everything after it
+    python -m src.pipeline.train_pipeline --until data_transformation
+    python -m src.pipeline.train_pipeline --force --workers 2
+"""
+import argparse
+import contextvars
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+from src.exception import CustomException
+from src.logger import logging
+from src.instrumentation import stage
+from src.stage_cache import StageCache, hash_estimator, hash_file
+from src.utils import load_object, save_object
+
+
+@dataclass
+class TrainPipelineConfig:
+    """
+    Where the training graph keeps its checkpoints.
+    PIPELINE_WORKERS sets how many independent stages run at the same time.
+    """
+    checkpoint_dir: str = os.path.join('artifacts', "pipeline")
+    state_file_path: str = os.path.join('artifacts', "pipeline", "state.json")
+    max_workers: int = int(os.environ.get("PIPELINE_WORKERS", os.cpu_count() or 1))
+
+
+@dataclass
+class PipelineStage:
+    """
+    One node of the training graph. func receives {upstream stage name: its output}
+    and returns the stage's output, which is checkpointed for the stages after it.
+    """
+    name: str
+    func: Callable
+    # Upstream stages whose outputs this stage reads
+    inputs: tuple = ()
+    # Files read directly (e.g. the source CSV); their content is part of the stage key
+    input_files: tuple = ()
+    # Files this stage writes; a checkpoint is only reused while they are unchanged on disk
+    output_files: tuple = ()
+    # Settings the output depends on (hyperparameters, config values); part of the stage key
+    params: tuple = ()
+
+
+def _slug(name):
+    # "Random Forest Regressor" -> "random_forest_regressor", for stage names typed on the command line
+    return re.sub(r"\W+", "_", name.lower()).strip("_")
+
+
+class StageGraph:
+    """
+    Runs PipelineStages in dependency order, with checkpoints.
+
+    A stage's key is built from its name, params, input file hashes and the keys of its
+    upstream stages. A stage is skipped when state.json holds a completed entry with the same
+    key, its checkpoint exists and its output files still have the recorded hashes. When a
+    stage does run, the entries of everything downstream are dropped first, so they rerun too.
+    """
+    def __init__(self, stages, config: TrainPipelineConfig = None):
+        self.pipeline_config = config or TrainPipelineConfig()
+        self.stages = {}
+        for pipeline_stage in stages:
+            if pipeline_stage.name in self.stages:
+                raise ValueError(f"Duplicate stage '{pipeline_stage.name}'")
+            self.stages[pipeline_stage.name] = pipeline_stage
+        self.order = self._topological_order()
+        self.state = self._load_state()
+
+    def _topological_order(self):
+        for pipeline_stage in self.stages.values():
+            for upstream in pipeline_stage.inputs:
+                if upstream not in self.stages:
+                    raise ValueError(f"Stage '{pipeline_stage.name}' reads unknown stage '{upstream}'")
+
+        order, placed = [], set()
+        while len(order) < len(self.stages):
+            ready = [
+                name for name, pipeline_stage in self.stages.items()
+                if name not in placed and all(upstream in placed for upstream in pipeline_stage.inputs)
+            ]
+            if not ready:
+                raise ValueError(f"Stage graph has a cycle among {sorted(set(self.stages) - placed)}")
+            order.extend(ready)
+            placed.update(ready)
+        return order
+
+    def _load_state(self):
+        if not os.path.exists(self.pipeline_config.state_file_path):
+            return {}
+        with open(self.pipeline_config.state_file_path) as file_obj:
+            return json.load(file_obj)
+
+    def _save_state(self):
+        # Written after every stage; the temporary file keeps it readable if we crash mid-write
+        os.makedirs(os.path.dirname(self.pipeline_config.state_file_path), exist_ok=True)
+        tmp_path = f"{self.pipeline_config.state_file_path}.tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(self.state, file_obj, indent=2)
+        os.replace(tmp_path, self.pipeline_config.state_file_path)
+
+    def checkpoint_path(self, name):
+        file_name = re.sub(r"[^\w.-]+", "_", name)
+        return os.path.join(self.pipeline_config.checkpoint_dir, f"{file_name}.pkl")
+
+    def downstream(self, names):
+        """
+        The given stages and every stage that depends on them, directly or not.
+        """
+        selected = set(names)
+        for name in self.order:
+            if any(upstream in selected for upstream in self.stages[name].inputs):
+                selected.add(name)
+        return selected
+
+    def upstream(self, names):
+        """
+        The given stages and every stage they depend on.
+        """
+        selected, todo = set(), list(names)
+        while todo:
+            name = todo.pop()
+            if name not in selected:
+                selected.add(name)
+                todo.extend(self.stages[name].inputs)
+        return selected
+
+    def stage_key(self, name, keys):
+        pipeline_stage = self.stages[name]
+        return StageCache.key(
+            name,
+            pipeline_stage.params,
+            tuple(keys[upstream] for upstream in pipeline_stage.inputs),
+            tuple(hash_file(file_path) for file_path in pipeline_stage.input_files),
+        )
+
+    def is_complete(self, name, key):
+        """
+        True if the checkpoint of `name` for `key` can be reused.
+        """
+        entry = self.state.get(name)
+        if not entry or entry["status"] != "completed" or entry["key"] != key:
+            return False
+        if not os.path.exists(self.checkpoint_path(name)):
+            return False
+        return all(
+            os.path.exists(file_path) and hash_file(file_path) == file_hash
+            for file_path, file_hash in entry["output_files"].items()
+        )
+
+    def status(self):
+        """
+        {stage name: "complete" | "failed" | "pending"} as of the last run, in run order.
+        """
+        keys, status = {}, {}
+        for name in self.order:
+            pipeline_stage = self.stages[name]
+            missing_input = any(not os.path.exists(file_path) for file_path in pipeline_stage.input_files)
+            if missing_input or any(keys.get(upstream) is None for upstream in pipeline_stage.inputs):
+                keys[name] = None
+                status[name] = "pending"
+                continue
+            keys[name] = self.stage_key(name, keys)
+            if self.is_complete(name, keys[name]):
+                status[name] = "complete"
+            elif self.state.get(name, {}).get("status") == "failed":
+                status[name] = "failed"
+            else:
+                status[name] = "pending"
+        return status
+
+    def _execute(self, pipeline_stage, inputs):
+        """
+        Runs one stage (in a worker thread) and checkpoints its output.
+        Returns (output, {output file: hash}, seconds).
+        """
+        started = time.perf_counter()
+        with stage("pipeline_stage", step=pipeline_stage.name):
+            output = pipeline_stage.func(inputs)
+        save_object(file_path=self.checkpoint_path(pipeline_stage.name), obj=output)
+        output_hashes = {
+            file_path: hash_file(file_path)
+            for file_path in pipeline_stage.output_files if os.path.exists(file_path)
+        }
+        return output, output_hashes, time.perf_counter() - started
+
+    def run(self, targets=None, rerun=(), max_workers=None):
+        """
+        Input: targets: stages to produce (default: all); only they and their upstream stages run
+               rerun: stages to run again even if checkpointed, along with everything after them
+        Output: {stage name: output} of every stage needed for the targets
+        """
+        try:
+            for name in list(targets or []) + list(rerun):
+                if name not in self.stages:
+                    raise ValueError(f"Unknown stage '{name}', expected one of {self.order}")
+
+            needed = self.upstream(targets) if targets else set(self.order)
+            forced = self.downstream(rerun)
+            pending = [name for name in self.order if name in needed]
+            keys, outputs, running, failures = {}, {}, {}, []
+            ran, reused = [], []
+
+            with stage("train_pipeline"), ThreadPoolExecutor(
+                max_workers=max_workers or self.pipeline_config.max_workers
+            ) as executor:
+                while pending or running:
+                    # 1. Start (or skip) every stage whose inputs are ready; stop starting after a failure
+                    progress = True
+                    while progress and not failures:
+                        progress = False
+                        for name in list(pending):
+                            pipeline_stage = self.stages[name]
+                            if any(upstream not in outputs for upstream in pipeline_stage.inputs):
+                                continue
+                            pending.remove(name)
+                            progress = True
+                            keys[name] = self.stage_key(name, keys)
+
+                            if name not in forced and self.is_complete(name, keys[name]):
+                                outputs[name] = load_object(self.checkpoint_path(name))
+                                reused.append(name)
+                                logging.info(f"Pipeline stage {name}: reusing checkpoint")
+                                continue
+
+                            # Whatever was computed from this stage's previous output is stale now
+                            for stale in self.downstream([name]):
+                                self.state.pop(stale, None)
+                            self._save_state()
+
+                            logging.info(f"Pipeline stage {name}: started")
+                            inputs = {upstream: outputs[upstream] for upstream in pipeline_stage.inputs}
+                            # Copy the context so the stage is recorded under train_pipeline
+                            future = executor.submit(
+                                contextvars.copy_context().run, self._execute, pipeline_stage, inputs
+                            )
+                            running[future] = name
+
+                    if not running:
+                        break
+
+                    # 2. Record whatever finished
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name = running.pop(future)
+                        try:
+                            outputs[name], output_hashes, seconds = future.result()
+                        except Exception as e:
+                            failures.append((name, e))
+                            self.state[name] = {"key": keys[name], "status": "failed", "error": str(e)}
+                            logging.error(f"Pipeline stage {name}: failed: {e}")
+                        else:
+                            ran.append(name)
+                            self.state[name] = {
+                                "key": keys[name],
+                                "status": "completed",
+                                "output_files": output_hashes,
+                                "seconds": round(seconds, 3),
+                                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                            }
+                            logging.info(f"Pipeline stage {name}: completed in {seconds:.2f}s")
+                        self._save_state()
+
+            if failures:
+                name, error = failures[0]
+                raise RuntimeError(
+                    f"Stage '{name}' failed ({error}); rerun to resume after the "
+                    f"{len(ran) + len(reused)} completed stage(s)"
+                )
+
+            logging.info(f"Pipeline finished: ran {ran}, reused {reused}")
+            return outputs
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+class TrainPipeline:
+    """
+    Builds the training stage graph from the component configs and runs it.
+    In "full" model selection every candidate has its own search and fit stage; in "budgeted"
+    mode the fits compare learning curves across candidates, so they are one stage; in "cv"
+    mode one stage cross-validates every candidate over a shared pool of (model, fold) fits,
+    and only the winner is fitted on all training rows.
+    """
+    def __init__(self, config: TrainPipelineConfig = None):
+        self.pipeline_config = config or TrainPipelineConfig()
+
+    def build_stages(self):
+        from sklearn.base import clone
+
+        from src.components.budgeted_selection import BudgetedModelSelection, BudgetedSelectionConfig
+        from src.components.cross_validation import CrossValidation, CrossValidationConfig
+        from src.components.data_ingestion import DataIngestion, DataIngestionConfig
+        from src.components.data_transformation import DataTransformation
+        from src.components.hyperparameter_search import HyperparameterSearch, HyperparameterSearchConfig
+        from src.components.model_exporter import ModelExporter
+        from src.components.model_trainer import ModelTrainer
+        from src.components.prediction_table import PredictionTableBuilder
+        from src.pipeline.artifact_registry import ArtifactRegistryConfig, publish_artifacts
+        from src.utils import evaluate_models
+
+        ingestion_config = DataIngestionConfig()
+        data_transformation = DataTransformation()
+        transformation_config = data_transformation.data_transformation_config
+        model_trainer = ModelTrainer()
+        trainer_config = model_trainer.model_trainer_config
+        # The graph already runs the models side by side: one worker per search
+        search_config = HyperparameterSearchConfig(n_jobs=1)
+        models, params = model_trainer.get_models(), model_trainer.get_params()
+
+        def transformed(inputs):
+            # (X_train, y_train, X_test, y_test)
+            return inputs["data_transformation"][:4]
+
+        stages = [
+            PipelineStage(
+                name="data_ingestion",
+                func=lambda inputs: DataIngestion().initiate_data_ingestion(),
+                input_files=(ingestion_config.source_data_path,),
+                output_files=(
+                    ingestion_config.raw_data_path, ingestion_config.train_data_path, ingestion_config.test_data_path
+                ),
+                params=(ingestion_config.test_size, ingestion_config.random_state, ingestion_config.artifact_format),
+            ),
+            PipelineStage(
+                name="data_transformation",
+                func=lambda inputs: DataTransformation().initiate_data_transformation(*inputs["data_ingestion"]),
+                inputs=("data_ingestion",),
+                output_files=(transformation_config.preprocessor_obj_file_path, transformation_config.drift_reference_file_path),
+                params=(
+                    hash_estimator(data_transformation.get_data_transformer_objects()),
+                    transformation_config.feature_dtype, transformation_config.sparse_threshold,
+                    transformation_config.array_format,
+                ),
+            ),
+        ]
+
+        # 1. One search stage per tunable model
+        search_stages = {}
+        for model_name, model_obj in models.items():
+            if not (trainer_config.enable_hyperparameter_search and params.get(model_name)):
+                continue
+            search_stages[model_name] = f"search:{_slug(model_name)}"
+
+            def search(inputs, model_obj=model_obj, param_space=params[model_name]):
+                X_train, y_train, _, _ = transformed(inputs)
+                return HyperparameterSearch(search_config).search(model_obj, param_space, X_train, y_train)
+
+            stages.append(PipelineStage(
+                name=search_stages[model_name],
+                func=search,
+                inputs=("data_transformation",),
+                params=(
+                    hash_estimator(model_obj), sorted(params[model_name].items()),
+                    search_config.n_candidates, search_config.eta, search_config.min_resource_fraction,
+                    search_config.validation_size, search_config.random_state,
+                ),
+            ))
+
+        def configured(model_name, inputs):
+            # Unfitted estimator with the best parameters of its search, if it had one
+            model_obj = clone(models[model_name])
+            if model_name in search_stages:
+                model_obj.set_params(**inputs[search_stages[model_name]][0])
+            return model_obj
+
+        # 2. Fits: one stage per model, or one budgeted selection / cross-validation over all of them
+        # Each produces {model_name: (fitted model, test R2)}, cross-validation
+        # {model_name: (unfitted model, {"mean_r2", "std_r2", "fold_r2"})}
+        if trainer_config.model_selection == "cv":
+            cv_config = CrossValidationConfig(
+                n_jobs=trainer_config.n_jobs, parallel_backend=trainer_config.parallel_backend
+            )
+
+            def cross_validation(inputs):
+                X_train, y_train, _, _ = transformed(inputs)
+                candidates = {model_name: configured(model_name, inputs) for model_name in models}
+                report = CrossValidation(cv_config).initiate_cross_validation(candidates, X_train, y_train)
+                return {model_name: (candidates[model_name], result) for model_name, result in report.items()}
+
+            stages.append(PipelineStage(
+                name="cross_validation",
+                func=cross_validation,
+                inputs=("data_transformation", *search_stages.values()),
+                params=(
+                    tuple(hash_estimator(model_obj) for model_obj in models.values()),
+                    cv_config.n_splits, cv_config.random_state,
+                ),
+            ))
+            fit_stages = ("cross_validation",)
+        elif trainer_config.model_selection == "budgeted":
+            def budgeted_selection(inputs):
+                X_train, y_train, X_test, y_test = transformed(inputs)
+                candidates = {model_name: configured(model_name, inputs) for model_name in models}
+                report = BudgetedModelSelection(BudgetedSelectionConfig(
+                    n_jobs=trainer_config.n_jobs, parallel_backend=trainer_config.parallel_backend
+                )).initiate_budgeted_selection(candidates, X_train, y_train, X_test, y_test)
+                return {model_name: (candidates[model_name], score) for model_name, score in report.items()}
+
+            budgeted_config = BudgetedSelectionConfig()
+            stages.append(PipelineStage(
+                name="budgeted_selection",
+                func=budgeted_selection,
+                inputs=("data_transformation", *search_stages.values()),
+                params=(
+                    tuple(hash_estimator(model_obj) for model_obj in models.values()),
+                    budgeted_config.curve_fractions, budgeted_config.time_budget_seconds,
+                    budgeted_config.max_boosting_rounds, budgeted_config.early_stopping_rounds,
+                    budgeted_config.prune_tolerance, budgeted_config.validation_size,
+                ),
+            ))
+            fit_stages = ("budgeted_selection",)
+        elif trainer_config.model_selection == "full":
+            fit_stages = []
+            for model_name, model_obj in models.items():
+                def fit(inputs, model_name=model_name):
+                    X_train, y_train, X_test, y_test = transformed(inputs)
+                    candidate = {model_name: configured(model_name, inputs)}
+                    report = evaluate_models(X_train, y_train, X_test, y_test, candidate, n_jobs=1)
+                    return {model_name: (candidate[model_name], report[model_name])}
+
+                fit_stages.append(f"fit:{_slug(model_name)}")
+                stages.append(PipelineStage(
+                    name=fit_stages[-1],
+                    func=fit,
+                    inputs=("data_transformation",) + ((search_stages[model_name],) if model_name in search_stages else ()),
+                    params=(hash_estimator(model_obj),),
+                ))
+        else:
+            raise ValueError(
+                f"Unknown model_selection '{trainer_config.model_selection}', expected 'full', 'budgeted' or 'cv'"
+            )
+
+        # 3. Pick and save the best model
+        def model_selection(inputs):
+            fitted = {}
+            for fit_stage in fit_stages:
+                fitted.update(inputs[fit_stage])
+            # Same order as ModelTrainer, so ties are broken the same way
+            fitted = {model_name: fitted[model_name] for model_name in models if model_name in fitted}
+            if trainer_config.model_selection == "cv":
+                scores = {model_name: result["mean_r2"] for model_name, (_, result) in fitted.items()}
+                models_std = {model_name: result["std_r2"] for model_name, (_, result) in fitted.items()}
+            else:
+                scores = {model_name: score for model_name, (_, score) in fitted.items()}
+                models_std = None
+            best_model_name, best_model, best_model_score = model_trainer.select_best_model(
+                scores, {model_name: model_obj for model_name, (model_obj, _) in fitted.items()}, models_std
+            )
+            if trainer_config.model_selection == "cv":
+                # Only the winner is fitted on every training row
+                X_train, y_train, X_test, y_test = transformed(inputs)
+                evaluate_models(X_train, y_train, X_test, y_test, {best_model_name: best_model}, n_jobs=1)
+            # Staged: the "publish" stage makes it the served model once the bundle / table are built
+            save_object(file_path=trainer_config.trained_model_file_path, obj=best_model)
+            return best_model_name, best_model, best_model_score
+
+        stages.append(PipelineStage(
+            name="model_selection",
+            func=model_selection,
+            # Cross-validation leaves the refit of the winner to this stage
+            inputs=tuple(fit_stages) + (("data_transformation",) if trainer_config.model_selection == "cv" else ()),
+            output_files=(trainer_config.trained_model_file_path,),
+        ))
+
+        # 4. Independent steps on the staged model
+        if trainer_config.export_inference_bundle:
+            exporter_config = ModelExporter().model_exporter_config
+            stages.append(PipelineStage(
+                name="export_bundle",
+                # Verified against the model on the test rows before it is written
+                func=lambda inputs: ModelExporter().initiate_model_export(
+                    inputs["model_selection"][1], X_check=transformed(inputs)[2]
+                ),
+                inputs=("model_selection", "data_transformation"),
+                output_files=(exporter_config.bundle_file_path,),
+            ))
+
+        if trainer_config.build_prediction_table:
+            table_builder = PredictionTableBuilder()
+            stages.append(PipelineStage(
+                name="prediction_table",
+                func=lambda inputs: table_builder.initiate_prediction_table(inputs["model_selection"][1]),
+                # Also reads the saved preprocessor
+                inputs=("model_selection", "data_transformation"),
+                output_files=(
+                    table_builder.prediction_table_config.table_file_path,
+                    table_builder.prediction_table_config.meta_file_path,
+                ),
+            ))
+
+        # 5. Make the staged pair the served one, after everything built from it succeeded
+        derived_stages = tuple(
+            stage_obj.name for stage_obj in stages if stage_obj.name in ("export_bundle", "prediction_table")
+        )
+        stages.append(PipelineStage(
+            name="publish",
+            func=lambda inputs: publish_artifacts(
+                trainer_config.trained_model_file_path,
+                trainer_config.preprocessor_obj_file_path,
+                trainer_config.drift_reference_file_path,
+            ),
+            inputs=("model_selection", "data_transformation") + derived_stages,
+            output_files=(ArtifactRegistryConfig().version_file_path,),
+        ))
+
+        def evaluation(inputs):
+            from sklearn.metrics import r2_score
+            _, _, X_test, y_test = transformed(inputs)
+            return r2_score(y_test, inputs["model_selection"][1].predict(X_test))
+
+        stages.append(PipelineStage(
+            name="evaluation",
+            func=evaluation,
+            inputs=("model_selection", "data_transformation"),
+        ))
+        return stages
+
+    def initiate_training(self, targets=None, rerun=(), max_workers=None):
+        """
+        Output: {stage name: output}; "evaluation" holds the test R2 of the saved model
+        """
+        graph = StageGraph(self.build_stages(), self.pipeline_config)
+        return graph.run(targets=targets, rerun=rerun, max_workers=max_workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true", help="show the stages, their inputs and status, and exit")
+    parser.add_argument("--until", nargs="+", default=None, metavar="STAGE",
+                        help="only run these stages and the ones they depend on")
+    parser.add_argument("--from", dest="rerun", nargs="+", default=[], metavar="STAGE",
+                        help="rerun these stages and everything after them, even if checkpointed")
+    parser.add_argument("--force", action="store_true", help="ignore every checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="stages run at the same time (PIPELINE_WORKERS)")
+    args = parser.parse_args()
+
+    pipeline = TrainPipeline()
+    graph = StageGraph(pipeline.build_stages(), pipeline.pipeline_config)
+    if args.list:
+        status = graph.status()
+        for name in graph.order:
+            inputs = ", ".join(graph.stages[name].inputs) or "-"
+            print(f"{name:<34} {status[name]:<9} <- {inputs}")
+        return
+
+    rerun = graph.order if args.force else args.rerun
+    outputs = graph.run(targets=args.until, rerun=rerun, max_workers=args.workers)
+    if "evaluation" in outputs:
+        best_model_name, _, _ = outputs["model_selection"]
+        print(f"{best_model_name}: test R2 {outputs['evaluation']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
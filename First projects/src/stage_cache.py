@@ -0,0 +1,110 @@
+import hashlib
+import os
+import sys
+from dataclasses import dataclass
+
+import dill
+import numpy as np
+from scipy import sparse
+
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass
+class StageCacheConfig:
+    # Cached stage outputs live under artifacts/cache/<stage>/<key>.pkl
+    cache_dir: str = os.path.join("artifacts", "cache")
+
+
+def hash_file(file_path):
+    """
+    SHA-256 of a file's content, read in 1 MB blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_array(array):
+    """
+    SHA-256 of a NumPy array's shape, dtype and bytes (or of a sparse matrix's CSR components).
+    """
+    if sparse.issparse(array):
+        csr = array.tocsr()
+        return hashlib.sha256(repr(
+            ("csr", csr.shape, hash_array(csr.data), hash_array(csr.indices), hash_array(csr.indptr))
+        ).encode()).hexdigest()
+
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha256()
+    digest.update(repr((array.shape, array.dtype.str)).encode())
+    digest.update(array.data)
+    return digest.hexdigest()
+
+
+def hash_estimator(model_obj):
+    """
+    Hash of an estimator's class and constructor parameters (its 'config').
+    Two estimators with the same hash fit to the same result on the same data.
+    """
+    model_class = f"{type(model_obj).__module__}.{type(model_obj).__qualname__}"
+    params = sorted(model_obj.get_params().items())
+    return hashlib.sha256(repr((model_class, params)).encode()).hexdigest()
+
+
+class StageCache:
+    """
+    Content-addressed cache for pipeline stage outputs.
+    A stage computes a key from everything its output depends on (input file hashes,
+    array hashes, config values); if an entry with that key exists the stage is skipped
+    and the stored output is reused, otherwise the stage runs and stores its output.
+    """
+    def __init__(self, config: StageCacheConfig = None):
+        self.config = config or StageCacheConfig()
+
+    @staticmethod
+    def key(*parts):
+        """
+        Builds a cache key from strings/numbers/tuples describing a stage's inputs and config.
+        """
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def _entry_path(self, stage, key):
+        return os.path.join(self.config.cache_dir, stage, f"{key}.pkl")
+
+    def get(self, stage, key):
+        """
+        Returns the cached output of `stage` for `key`, or None on a miss.
+        """
+        entry_path = self._entry_path(stage, key)
+        if not os.path.exists(entry_path):
+            return None
+
+        try:
+            with open(entry_path, "rb") as file_obj:
+                value = dill.load(file_obj)
+            logging.info(f"Stage cache hit: {stage} [{key[:12]}]")
+            return value
+        except Exception as e:
+            # A corrupt entry is just a miss; the stage will run and overwrite it
+            logging.warning(f"Ignoring unreadable cache entry {entry_path}: {e}")
+            return None
+
+    def put(self, stage, key, value):
+        """
+        Stores the output of `stage` under `key`.
+        """
+        try:
+            entry_path = self._entry_path(stage, key)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+            tmp_path = f"{entry_path}.tmp"
+            with open(tmp_path, "wb") as file_obj:
+                dill.dump(value, file_obj)
+            os.replace(tmp_path, entry_path)
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -1,12 +1,14 @@
 import os
 import sys
-import pickle # Used for serializing Python objects (saving models/preprocessors to disk)
-import dill   # Similar to pickle, but better at serializing complex objects like lambdas
-import pandas as pd 
 import numpy as np    
-from sklearn.metrics import r2_score
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from src.exception import CustomException
+from src.instrumentation import StageTimer, record_measurements, stage
 
+# dill, pandas and sklearn are imported inside the functions that need them:
+# the serving path imports this module too and should not pay for training-only dependencies
+
+@stage("save_object")
 def save_object(file_path, obj):
     """
     Saves a Python object (like a trained model or scaler) to a physical file.
@@ -19,51 +21,282 @@ def save_object(file_path, obj):
         # 2. Create the folder if it doesn't exist
         os.makedirs(dir_path, exist_ok=True)
 
-        # 3. Open file in 'wb' (Write Binary) and dump the object
-        with open(file_path, "wb") as file_obj:
+        # 3. Dump the object into a temporary file next to the target (Write Binary)
+        # dill is similar to pickle, but better at serializing complex objects like lambdas
+        import dill
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "wb") as file_obj:
             dill.dump(obj, file_obj)
 
+        # 4. Atomically swap it in, so a running server never reads a half-written pickle
+        os.replace(tmp_path, file_path)
+
     except Exception as e:
         raise CustomException(e, sys)
     
-def evaluate_models(X_train, y_train, X_test, y_test, models):
+# Constructor parameters estimators use to size their own thread pools
+# (sklearn / xgboost / lightgbm use n_jobs, catboost uses thread_count)
+THREAD_PARAMS = ("n_jobs", "thread_count")
+
+
+def _limit_estimator_threads(model_obj, max_threads):
+    """
+    Caps an estimator's own thread pool so parallel fits don't oversubscribe the CPU.
+    An explicit positive n_jobs/thread_count set by the caller is respected as is;
+    only 'use every core' settings (None / -1) are lowered to max_threads.
+    """
+    params = model_obj.get_params()
+    for key in THREAD_PARAMS:
+        if key in params:
+            value = params[key]
+        elif key == "thread_count" and hasattr(model_obj, "get_param"):
+            # CatBoost only lists explicitly set params; unset means all cores
+            value = None
+        else:
+            continue
+
+        if value is None or value < 0:
+            model_obj.set_params(**{key: max_threads})
+
+
+def _fit_and_score(model_obj, X_train, y_train, X_test, y_test, max_threads=None, fit_params=None):
+    """
+    Fits one candidate and returns (fitted_model, r2 on the test set, timings).
+    timings holds the StageTimer measurements of the fit and of the predict; they are
+    taken where the work runs (possibly a worker process) and recorded by the caller.
+    fit_params are extra keyword arguments for fit (e.g. an eval_set for early stopping).
+    Module-level so it can be sent to a worker process.
+    """
+    from sklearn.metrics import r2_score
+
+    fit_params = fit_params or {}
+    with StageTimer() as fit_timer:
+        fit_timer.rows = len(y_train)
+        if max_threads is None:
+            model_obj.fit(X_train, y_train, **fit_params)
+        else:
+            # Also cap BLAS/OpenMP pools used inside numpy/scipy for this fit
+            from threadpoolctl import threadpool_limits
+            with threadpool_limits(limits=max_threads):
+                model_obj.fit(X_train, y_train, **fit_params)
+
+    with StageTimer() as predict_timer:
+        predict_timer.rows = len(y_test)
+        y_test_pred = model_obj.predict(X_test)
+
+    timings = {"fit": fit_timer.result, "predict": predict_timer.result}
+    return model_obj, r2_score(y_test, y_test_pred), timings
+
+
+def _record_fit_timings(model_name, timings):
+    # Per-model fit / predict measurements, under the stage that called evaluate_models
+    for name, measurements in timings.items():
+        record_measurements(name, measurements, model=model_name)
+
+
+def evaluate_models(X_train, y_train, X_test, y_test, models, n_jobs=1, backend="process", cache=None,
+                    fit_params=None, timings=None):
     """
     This function automates the training and testing of multiple models.
     Input: Training/Testing data and a dictionary of model objects.
-    Output: A dictionary containing the R2 score for each model.
+           n_jobs: number of candidates fitted at the same time (1 = serial, -1 or None = one per core)
+           backend: "process" or "thread" pool used when n_jobs != 1
+           cache: optional StageCache; a model whose data and hyperparameters are unchanged
+                  since a previous run is not refitted (not used together with fit_params)
+           fit_params: optional {model_name: {keyword: value}} passed to that model's fit
+           timings: optional dict that receives {model_name: {"fit": ..., "predict": ...}}
+                    StageTimer measurements of every model fitted by this call
+    Output: A dictionary containing the R2 score for each model, in the order of `models`.
+    The fitted estimators are written back into `models`.
     """
     try:
+        # fit_params may hold arrays (eval sets) that are not part of the cache key
+        if cache is not None and not fit_params:
+            return _evaluate_models_cached(X_train, y_train, X_test, y_test, models, n_jobs, backend, cache, timings)
+
+        fit_params = fit_params or {}
+
         report = {}
 
-        # Loop through the 'models' dictionary
-        # models.items() gives us both the name (key) and the algorithm (value)
-        for model_name, model_obj in models.items():
-            
-            # 1. Train the model using the training data
-            model_obj.fit(X_train, y_train)
-            
-            # 2. Make predictions on both datasets to check for overfitting
-            # y_train_pred = model_obj.predict(X_train) # Optional: check train score
-            y_test_pred = model_obj.predict(X_test)
-            
-            # 3. Calculate the R2 Score (Accuracy metric for regression)
-            # Higher is better (1.0 is a perfect fit)
-            test_model_score = r2_score(y_test, y_test_pred)
-            
-            # 4. Store the result in the report dictionary
-            report[model_name] = test_model_score
-            
+        n_cpus = os.cpu_count() or 1
+        n_workers = min(len(models), n_cpus if n_jobs is None or n_jobs < 0 else n_jobs)
+
+        if n_workers <= 1:
+            # Loop through the 'models' dictionary
+            # models.items() gives us both the name (key) and the algorithm (value)
+            for model_name, model_obj in models.items():
+                
+                # 1. Train the model using the training data
+                # 2. Make predictions on the test set
+                # 3. Calculate the R2 Score (Accuracy metric for regression)
+                # Higher is better (1.0 is a perfect fit)
+                model_obj, test_model_score, model_timings = _fit_and_score(
+                    model_obj, X_train, y_train, X_test, y_test, fit_params=fit_params.get(model_name)
+                )
+                _record_fit_timings(model_name, model_timings)
+                if timings is not None:
+                    timings[model_name] = model_timings
+                
+                # 4. Store the result in the report dictionary
+                report[model_name] = test_model_score
+                
+            return report
+
+        # Parallel mode: split the cores between the workers so that
+        # n_workers * threads_per_model never exceeds the machine
+        threads_per_model = max(1, n_cpus // n_workers)
+
+        if backend == "process":
+            executor_class = ProcessPoolExecutor
+        elif backend == "thread":
+            executor_class = ThreadPoolExecutor
+        else:
+            raise ValueError(f"Unknown backend '{backend}', expected 'process' or 'thread'")
+
+        with executor_class(max_workers=n_workers) as executor:
+            futures = {}
+            for model_name, model_obj in models.items():
+                _limit_estimator_threads(model_obj, threads_per_model)
+                futures[model_name] = executor.submit(
+                    _fit_and_score, model_obj, X_train, y_train, X_test, y_test, threads_per_model,
+                    fit_params.get(model_name)
+                )
+
+            # Collect in the original order so the report is deterministic
+            for model_name, future in futures.items():
+                # Worker processes return a fitted copy: put it back so callers can use it
+                models[model_name], report[model_name], model_timings = future.result()
+                _record_fit_timings(model_name, model_timings)
+                if timings is not None:
+                    timings[model_name] = model_timings
+
         return report
         
     except Exception as e:
         raise CustomException(e, sys)
     
+def _evaluate_models_cached(X_train, y_train, X_test, y_test, models, n_jobs, backend, cache, timings=None):
+    """
+    evaluate_models with a per-model StageCache entry keyed by the data and the model's config.
+    """
+    from src.stage_cache import StageCache, hash_array, hash_estimator
+
+    data_key = tuple(hash_array(array) for array in (X_train, y_train, X_test, y_test))
+    cache_keys = {
+        model_name: StageCache.key(data_key, hash_estimator(model_obj))
+        for model_name, model_obj in models.items()
+    }
+
+    # 1. Reuse every model whose (data, hyperparameters) pair was already fitted
+    cached_scores, to_fit = {}, {}
+    for model_name, model_obj in models.items():
+        cached = cache.get("model_fit", cache_keys[model_name])
+        if cached is None:
+            to_fit[model_name] = model_obj
+        else:
+            models[model_name], cached_scores[model_name] = cached
+
+    # 2. Fit the rest as usual and store them for the next run
+    fitted_scores = {}
+    if to_fit:
+        fitted_scores = evaluate_models(
+            X_train, y_train, X_test, y_test, to_fit, n_jobs=n_jobs, backend=backend, timings=timings
+        )
+        for model_name in to_fit:
+            models[model_name] = to_fit[model_name]
+            cache.put("model_fit", cache_keys[model_name], (to_fit[model_name], fitted_scores[model_name]))
+
+    # Same order as the input dictionary
+    return {
+        model_name: cached_scores[model_name] if model_name in cached_scores else fitted_scores[model_name]
+        for model_name in models
+    }
+
+
+# Intermediate dataset formats, picked from the file extension
+DATAFRAME_FORMATS = (".csv", ".parquet", ".feather")
+
+
+def save_dataframe(df, file_path):
+    """
+    Saves a DataFrame as CSV, Parquet or Feather depending on the file extension.
+    Parquet and Feather are binary and keep dtypes, including 'category' columns.
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        extension = os.path.splitext(file_path)[1]
+
+        if extension == ".csv":
+            df.to_csv(file_path, index=False, header=True)
+        elif extension == ".parquet":
+            df.to_parquet(file_path, index=False)
+        elif extension == ".feather":
+            # Uncompressed Arrow IPC so the file can be memory-mapped when read back
+            df.reset_index(drop=True).to_feather(file_path, compression="uncompressed")
+        else:
+            raise ValueError(f"Unsupported dataset format '{extension}', expected one of {DATAFRAME_FORMATS}")
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_dataframe(file_path):
+    """
+    Loads a DataFrame written by save_dataframe. Feather files are memory-mapped,
+    so numeric columns are read without copying the file into memory first.
+    """
+    try:
+        extension = os.path.splitext(file_path)[1]
+
+        if extension == ".csv":
+            import pandas as pd
+            return pd.read_csv(file_path)
+        if extension == ".parquet":
+            import pandas as pd
+            return pd.read_parquet(file_path)
+        if extension == ".feather":
+            from pyarrow import feather
+            table = feather.read_table(file_path, memory_map=True)
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+
+        raise ValueError(f"Unsupported dataset format '{extension}', expected one of {DATAFRAME_FORMATS}")
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def save_array(file_path, array):
+    """
+    Saves a NumPy array as .npy and reopens it memory-mapped (read-only),
+    so the caller continues with a zero-copy view of the file.
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        np.save(file_path, array)
+        return load_array(file_path)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_array(file_path):
+    """
+    Opens a .npy file memory-mapped: pages are read from disk only when touched.
+    """
+    try:
+        return np.load(file_path, mmap_mode="r")
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
 def load_object(file_path):
     try:
         # Check if the file actually exists
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"The file was not found at: {os.path.abspath(file_path)}")
             
+        import dill
         with open(file_path, "rb") as file_obj:
             return dill.load(file_obj)
             